@@ -0,0 +1,123 @@
+"""
+Net-worth analytics over FinancialStandingFS snapshots.
+
+net_worth_series() turns a user's snapshots into monthly series: one point on the first of
+every month from the first snapshot to the last, each balance interpolated linearly by date
+between the snapshots around it (points that fall on a snapshot date use it as is). From the
+balances it derives:
+
+    net_worth      total_assets - total_liabilities
+    current_ratio  current_assets / short_term_liabilities   (liquidity; None without liabilities)
+    debt_ratio     total_liabilities / total_assets          (leverage; None without assets)
+
+The result is a JSON-ready dict cached per user in the Django cache. Saving or deleting a
+snapshot drops the cached entry (invalidate()), so charts are served from the cache until
+the snapshots actually change.
+"""
+import logging
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from .firestore_models import FinancialStandingFS
+from .schedule import add_months
+
+logger = logging.getLogger(__name__)
+
+BALANCE_FIELDS = (
+    "total_assets",
+    "current_assets",
+    "fixed_assets",
+    "total_liabilities",
+    "short_term_liabilities",
+    "long_term_liabilities",
+)
+SERIES_FORMAT = 1  # bump when the cached structure changes
+
+
+def _cache_key(user_id):
+    return f"net_worth_series:v{SERIES_FORMAT}:{user_id}"
+
+
+def invalidate(user_id):
+    """Drop the cached series of a user (called when a snapshot is saved or deleted)."""
+    try:
+        cache.delete(_cache_key(user_id))
+    except Exception:
+        logger.exception("Could not drop net worth series of %s", user_id)
+
+
+def _ratio(numerator, denominator):
+    return round(float(numerator / denominator), 4) if denominator else None
+
+
+def _interpolate(before, after, day):
+    """Balances on `day` between two snapshots, {field: Decimal}."""
+    if after is None or after.snapshot_date == before.snapshot_date or day <= before.snapshot_date:
+        return {f: getattr(before, f) for f in BALANCE_FIELDS}
+    weight = Decimal((day - before.snapshot_date).days) / Decimal((after.snapshot_date - before.snapshot_date).days)
+    return {
+        f: getattr(before, f) + (getattr(after, f) - getattr(before, f)) * weight
+        for f in BALANCE_FIELDS
+    }
+
+
+def _point(day, balances, snapshot):
+    assets, liabilities = balances["total_assets"], balances["total_liabilities"]
+    point = {"date": day.isoformat(), "snapshot": snapshot}
+    for f in BALANCE_FIELDS:
+        point[f] = round(float(balances[f]), 2)
+    point["net_worth"] = round(float(assets - liabilities), 2)
+    point["current_ratio"] = _ratio(balances["current_assets"], balances["short_term_liabilities"])
+    point["debt_ratio"] = _ratio(liabilities, assets)
+    return point
+
+
+def build_series(snapshots):
+    """Monthly interpolated series from snapshots (any order); see the module docstring."""
+    by_date = {}
+    for s in snapshots:
+        if s.snapshot_date:
+            by_date[s.snapshot_date] = s  # several on one day: the last one listed wins
+    ordered = [by_date[d] for d in sorted(by_date)]
+    if not ordered:
+        return {"points": [], "snapshots": 0, "first": None, "last": None}
+    first, last = ordered[0].snapshot_date, ordered[-1].snapshot_date
+    days = []
+    day = date(first.year, first.month, 1)
+    if day < first:
+        day = add_months(day, 1)
+    while day <= last:
+        days.append(day)
+        day = add_months(day, 1)
+    days = sorted(set(days) | set(by_date))
+
+    points = []
+    idx = 0
+    for day in days:
+        while idx + 1 < len(ordered) and ordered[idx + 1].snapshot_date <= day:
+            idx += 1
+        after = ordered[idx + 1] if idx + 1 < len(ordered) else None
+        points.append(_point(day, _interpolate(ordered[idx], after, day), day in by_date))
+    return {"points": points, "snapshots": len(ordered), "first": first.isoformat(), "last": last.isoformat()}
+
+
+def net_worth_series(user):
+    """Cached build_series() over all of a user's snapshots."""
+    uid = str(user.pk) if hasattr(user, "pk") else str(user)
+    key = _cache_key(uid)
+    try:
+        cached = cache.get(key)
+    except Exception:
+        logger.exception("Could not read net worth series of %s", uid)
+        cached = None
+    if cached is not None:
+        return cached
+    snapshots = [s for page in FinancialStandingFS.iter_pages([("user_id", "==", uid)]) for s in page]
+    series = build_series(snapshots)
+    try:
+        cache.set(key, series, timeout=None)
+    except Exception:
+        logger.exception("Could not cache net worth series of %s", uid)
+    return series
@@ -0,0 +1,132 @@
+"""
+Bulk budget operations: copy one month's forecasts to a range of months, apply a saved
+BudgetTemplateFS, or scale existing forecasts by a percentage.
+
+Every operation builds a target {(category_id, year, month): forecast} map and hands it to
+apply_forecasts(), which prefetches the user's budgets for the affected years in one query,
+compares them with the targets and writes only the changed or missing ones in batched upserts
+(existing documents keep their id). A whole year of budgets is one read and one or two batch
+commits instead of a query and a save per category and month.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from firebase_client import get_firestore_client
+from finance_tracker.data_version import bump_data_version
+
+from .firestore_models import BudgetFS, BudgetTemplateFS
+
+CENT = Decimal("0.01")
+BATCH_SIZE = 500  # Firestore limit per write batch
+MAX_TARGET_MONTHS = 60
+
+
+def month_range(start: Tuple[int, int], end: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """
+    Inclusive list of (year, month) from start to end; empty when end is before start.
+    ValueError when the range spans more than MAX_TARGET_MONTHS months.
+    """
+    span = (end[0] - start[0]) * 12 + end[1] - start[1] + 1
+    if span > MAX_TARGET_MONTHS:
+        raise ValueError(f"At most {MAX_TARGET_MONTHS} months at once, got {span}.")
+    (y, m), out = start, []
+    while (y, m) <= end:
+        out.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return out
+
+
+def _scaled(amount: Decimal, percent) -> Decimal:
+    if not percent:
+        return amount
+    return (amount * (1 + Decimal(percent) / 100)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def apply_forecasts(user_id: str, targets: Dict[Tuple[str, int, int], Decimal], overwrite: bool = True) -> dict:
+    """
+    Upsert forecasts {(category_id, year, month): amount}. With overwrite=False existing budgets
+    are left alone and only missing ones are created. Returns counts of
+    created / updated / unchanged / skipped budgets.
+    """
+    uid = str(user_id)
+    counts = dict.fromkeys(("created", "updated", "unchanged", "skipped"), 0)
+    if not targets:
+        return counts
+    existing = {}
+    for b in BudgetFS.list_by_user_years(uid, {year for _, year, _ in targets}):
+        existing.setdefault((b.category_id, b.year, b.month), b)
+
+    writes = []
+    for key, forecast in sorted(targets.items()):
+        current = existing.get(key)
+        if current is None:
+            cid, year, month = key
+            writes.append(BudgetFS(user_id=uid, category_id=cid, year=year, month=month, forecast=forecast))
+            counts["created"] += 1
+        elif not overwrite:
+            counts["skipped"] += 1
+        elif current.forecast == forecast:
+            counts["unchanged"] += 1
+        else:
+            current.forecast = forecast
+            writes.append(current)
+            counts["updated"] += 1
+
+    if writes:
+        db = get_firestore_client()
+        col = db.collection(BudgetFS.collection_name)
+        for start in range(0, len(writes), BATCH_SIZE):
+            batch = db.batch()
+            for b in writes[start:start + BATCH_SIZE]:
+                ref = col.document(b.pk) if b.pk else col.document()
+                b.pk = ref.id
+                batch.set(ref, b.to_dict())
+            batch.commit()
+        bump_data_version(uid)
+    return counts
+
+
+def month_forecasts(user_id: str, year: int, month: int) -> Dict[str, Decimal]:
+    """category_id -> forecast for one month."""
+    return {b.category_id: b.forecast for b in BudgetFS.list_by_user(user_id, year=year, month=month)}
+
+
+def copy_month(user_id, source: Tuple[int, int], months: Iterable[Tuple[int, int]], percent=None, overwrite=True) -> dict:
+    """Copy source month's forecasts (optionally scaled by percent) to each target month."""
+    forecasts = month_forecasts(user_id, *source)
+    targets = {
+        (cid, y, m): _scaled(amount, percent)
+        for y, m in months if (y, m) != tuple(source)
+        for cid, amount in forecasts.items()
+    }
+    return apply_forecasts(user_id, targets, overwrite=overwrite)
+
+
+def apply_template(user_id, template: BudgetTemplateFS, months: Iterable[Tuple[int, int]], percent=None, overwrite=True) -> dict:
+    targets = {
+        (cid, y, m): _scaled(amount, percent)
+        for y, m in months
+        for cid, amount in template.forecasts.items()
+    }
+    return apply_forecasts(user_id, targets, overwrite=overwrite)
+
+
+def scale_months(user_id, months: Iterable[Tuple[int, int]], percent) -> dict:
+    """Scale the existing forecasts of the given months by percent (e.g. 5 or -10)."""
+    months = set(months)
+    targets = {
+        (b.category_id, b.year, b.month): _scaled(b.forecast, percent)
+        for b in BudgetFS.list_by_user_years(user_id, {y for y, _ in months})
+        if (b.year, b.month) in months
+    }
+    return apply_forecasts(user_id, targets)
+
+
+def save_template(user_id, name: str, source: Tuple[int, int]) -> BudgetTemplateFS:
+    """Store source month's forecasts as a named template, replacing one with the same name."""
+    uid = str(user_id)
+    template = next((t for t in BudgetTemplateFS.list_by_user(uid) if t.name.lower() == name.lower()), None)
+    template = template or BudgetTemplateFS(user_id=uid)
+    template.name = name
+    template.forecasts = month_forecasts(uid, *source)
+    return template.save()
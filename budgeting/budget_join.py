@@ -0,0 +1,122 @@
+"""
+Budget vs actual join shared by the dashboard and the budget list.
+
+join_budget_actuals() merges a month's BudgetFS rows with actual expense per category through
+dict indexes: one pass over the budgets, one over the actuals, so the cost is linear in the
+number of categories. Rows are small slotted objects; the template-facing attributes
+(row.category.id / .name / .group.name, row.category_id, forecast, actual, variance,
+utilization_pct) match what the views used to build as dicts.
+"""
+from decimal import Decimal
+
+from .services import budget_variance, utilization_pct
+
+UNCATEGORIZED = "_none_"
+
+
+class GroupRef:
+    __slots__ = ("id", "name")
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+class CategoryRef:
+    __slots__ = ("id", "name", "group", "include_in_reports")
+
+    def __init__(self, id, name, group, include_in_reports=True):
+        self.id = id
+        self.name = name
+        self.group = group
+        self.include_in_reports = include_in_reports
+
+
+class BudgetRow:
+    """Forecast vs actual of one category (or the subtotal of a group when category is None)."""
+
+    __slots__ = ("category", "group", "forecast", "actual")
+
+    def __init__(self, category, group, forecast=Decimal("0"), actual=Decimal("0")):
+        self.category = category
+        self.group = group
+        self.forecast = forecast
+        self.actual = actual
+
+    @property
+    def category_id(self):
+        return self.category.id if self.category else None
+
+    @property
+    def variance(self):
+        return budget_variance(self.actual, self.forecast)
+
+    @property
+    def utilization_pct(self):
+        return utilization_pct(self.actual, self.forecast)
+
+
+class BudgetJoin:
+    """Rows in budget order then actual-only categories, with group subtotals and totals."""
+
+    __slots__ = ("rows", "group_rows", "total")
+
+    def __init__(self, rows, group_rows, total):
+        self.rows = rows
+        self.group_rows = group_rows
+        self.total = total
+
+    @property
+    def highest(self):
+        return max(self.rows, key=lambda r: r.actual) if self.rows else None
+
+    def overspends(self, limit=5):
+        over = [r for r in self.rows if r.variance > 0]
+        over.sort(key=lambda r: r.variance, reverse=True)
+        return over[:limit]
+
+
+def join_budget_actuals(budgets, actuals, categories_by_id, groups):
+    """
+    budgets: BudgetFS of one month; actuals: {category_id: amount} (e.g. MonthlyLedger
+    expense_by_category); categories_by_id / groups as from categories_and_groups_for_user().
+    Categories missing or excluded from reports are left out, as are uncategorized expenses.
+    """
+    group_refs = {g.pk: GroupRef(g.pk, g.name) for g in groups}
+    no_group = GroupRef("", "")
+    by_category = {}
+
+    def row_for(category_id):
+        row = by_category.get(category_id)
+        if row is None:
+            cat = categories_by_id.get(category_id)
+            if cat is None or not cat.include_in_reports:
+                return None
+            group = group_refs.get(cat.group_id, no_group)
+            row = by_category[category_id] = BudgetRow(CategoryRef(cat.pk, cat.name, group, cat.include_in_reports), group)
+        return row
+
+    for b in budgets:
+        row = row_for(b.category_id)
+        if row is not None:
+            row.forecast += b.forecast
+    for category_id, amount in actuals.items():
+        if category_id != UNCATEGORIZED:
+            row = row_for(category_id)
+            if row is not None:
+                row.actual += amount
+
+    rows = list(by_category.values())
+    subtotals = {}
+    total = BudgetRow(None, None)
+    for row in rows:
+        sub = subtotals.get(row.group.id)
+        if sub is None:
+            sub = subtotals[row.group.id] = BudgetRow(None, row.group)
+        sub.forecast += row.forecast
+        sub.actual += row.actual
+        total.forecast += row.forecast
+        total.actual += row.actual
+    group_order = {g.pk: i for i, g in enumerate(groups)}
+    group_rows = sorted(subtotals.values(), key=lambda r: (group_order.get(r.group.id, len(group_order)), r.group.name))
+    return BudgetJoin(rows, group_rows, total)
@@ -0,0 +1,383 @@
+"""
+Keyword categorization of transaction descriptions.
+
+The user's merchant links and the global ones (MerchantCategoryLinkFS with no user_id) are
+compiled into one Aho-Corasick automaton, so a description is scanned once whatever the number
+of keywords. When several keywords occur in a description the winner is chosen by:
+
+    1. user links over global links
+    2. longer keyword over shorter
+    3. earlier position in the description
+    4. lower link id
+
+Compiled categorizers are kept per process and per user. Saving or deleting a link bumps a
+rules version in the Django cache (per user, or global for global links); get_categorizer()
+compares it with the version the categorizer was built from and recompiles on change, so
+classifying a whole statement costs no Firestore reads once the rules are compiled.
+
+Descriptions no keyword matches go to a second stage, LearnedCategorizer: multinomial naive
+Bayes over description tokens, the direction and an amount bucket, trained on the user's own
+categorized transactions. Categories the categorizer assigned itself (category_source "auto")
+are never learned from. Its counts are stored in one CategoryModelFS document per user,
+rebuilt by train_user_model() and updated incrementally (learn / unlearn, in a Firestore
+transaction) when the user sets a category by hand. categorize_many() runs both stages and only accepts a learned prediction
+whose posterior probability reaches MIN_CONFIDENCE.
+"""
+import logging
+import math
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from django.core.cache import cache
+
+from .firestore_models import (
+    CATEGORY_SOURCE_AUTO,
+    CategoryFS,
+    CategoryModelFS,
+    MerchantCategoryLinkFS,
+    TransactionFS,
+)
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = "_global_"
+MAX_CACHED_USERS = 256
+USER_TIER, GLOBAL_TIER = 0, 1
+MAX_TOKENS_PER_CATEGORY = 400  # keeps a user's model document well under the 1 MiB limit
+MIN_TRAINING_ROWS = 20
+MIN_CONFIDENCE = 0.6
+_WORD_RE = re.compile(r"[^\W\d_]{2,}")
+
+
+def _version_key(user_id):
+    return f"merchant_links_version:{user_id or GLOBAL_SCOPE}"
+
+
+def rules_version(user_id=None):
+    key = _version_key(user_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            version = time.time()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+        return version
+    except Exception:
+        logger.exception("Could not read merchant links version %s", key)
+        return None  # no shared cache: never trust a compiled categorizer
+
+
+def invalidate(user_id=None):
+    """Mark a user's merchant links (or the global ones when user_id is falsy) as changed."""
+    key = _version_key(user_id)
+    try:
+        cache.set(key, time.time(), timeout=None)
+    except Exception:
+        logger.exception("Could not bump merchant links version %s", key)
+    with _lock:
+        if user_id:
+            _compiled.pop(str(user_id), None)
+        else:
+            _compiled.clear()
+
+
+class KeywordAutomaton:
+    """Aho-Corasick automaton over lower-cased keywords; each keyword carries a payload."""
+
+    def __init__(self, keywords: Dict[str, object]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Per state: (keyword length, payload) for every keyword ending there, own and via suffix links.
+        self._out: List[list] = [[]]
+        for keyword, payload in keywords.items():
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = nxt
+            self._out[state].append((len(keyword), payload))
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self):
+        return len(self._goto)
+
+    def iter_matches(self, text: str):
+        """Yield (start, keyword length, payload) for every keyword occurrence in text."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for end, ch in enumerate(text, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for length, payload in out[state]:
+                yield end - length, length, payload
+
+
+class Categorizer:
+    """Compiled merchant link rules for one user: description -> category id."""
+
+    def __init__(self, user_links, global_links, category_ids=None, version=None):
+        self.version = version
+        rules = {}
+        for tier, links in ((USER_TIER, user_links), (GLOBAL_TIER, global_links)):
+            for link in links:
+                keyword = (link.keyword or "").strip().lower()
+                if not keyword or not link.category_id:
+                    continue
+                if category_ids is not None and link.category_id not in category_ids:
+                    continue  # the category was deleted
+                rank = (tier, link.pk or "")
+                current = rules.get(keyword)
+                if current is None or rank < current[0]:
+                    rules[keyword] = (rank, link.category_id)
+        self.rule_count = len(rules)
+        self._automaton = KeywordAutomaton(rules)
+
+    @classmethod
+    def load(cls, user_id=None, version=None):
+        """Compile from Firestore: the user's links, the global links and the category ids."""
+        user_links = MerchantCategoryLinkFS.list_by_user(user_id) if user_id else []
+        global_links = [link for link in MerchantCategoryLinkFS.list_all(limit=1000) if not link.user_id]
+        category_ids = {c.pk for c in CategoryFS.list_all(limit=1000)}
+        return cls(user_links, global_links, category_ids, version=version)
+
+    def classify(self, description: str) -> Optional[str]:
+        """Category id of the best matching keyword, or None."""
+        if not description or not self.rule_count:
+            return None
+        best = None
+        for start, length, (rank, category_id) in self._automaton.iter_matches(description.lower()):
+            key = (rank[0], -length, start, rank[1])
+            if best is None or key < best[0]:
+                best = (key, category_id)
+        return best[1] if best else None
+
+    def classify_many(self, descriptions: Iterable[str]) -> List[Optional[str]]:
+        """classify() for each description, in order; repeated descriptions are scanned once."""
+        seen = {}
+        out = []
+        for description in descriptions:
+            if description not in seen:
+                seen[description] = self.classify(description)
+            out.append(seen[description])
+        return out
+
+
+_compiled: "OrderedDict[str, Categorizer]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_categorizer(user=None) -> Categorizer:
+    """Compiled categorizer for a user (or for global links only), rebuilt when links changed."""
+    uid = (str(user.pk) if hasattr(user, "pk") else str(user)) if user else ""
+    version = (rules_version(uid), rules_version()) if uid else (rules_version(),)
+    if None in version:
+        return Categorizer.load(uid)
+    with _lock:
+        categorizer = _compiled.get(uid)
+        if categorizer is not None and categorizer.version == version:
+            _compiled.move_to_end(uid)
+            return categorizer
+    categorizer = Categorizer.load(uid, version=version)
+    with _lock:
+        _compiled[uid] = categorizer
+        _compiled.move_to_end(uid)
+        while len(_compiled) > MAX_CACHED_USERS:
+            _compiled.popitem(last=False)
+    return categorizer
+
+
+def classify_many(descriptions: Iterable[str], user=None) -> List[Optional[str]]:
+    """Category id (or None) for each description, using one compiled categorizer."""
+    return get_categorizer(user).classify_many(descriptions)
+
+
+def tokenize(description, amount=None, direction=None) -> List[str]:
+    """Lower-cased words (digits and 1-letter fragments dropped), plus direction and amount bucket."""
+    tokens = _WORD_RE.findall((description or "").lower())
+    if direction:
+        tokens.append(f"dir:{direction}")
+    if amount:
+        # Buckets double in width: 1-2, 2-4, 4-8, ... so similar amounts share a token.
+        tokens.append(f"amt:{max(0, int(math.log2(abs(float(amount)))))}")
+    return tokens
+
+
+class LearnedCategorizer:
+    """Naive Bayes over tokenize() with Laplace smoothing, backed by a CategoryModelFS."""
+
+    def __init__(self, model: CategoryModelFS):
+        self.model = model
+        self._tables = None
+
+    @property
+    def trained_rows(self):
+        return sum(self.model.doc_counts.values())
+
+    def _add(self, tokens, category_id, sign):
+        model = self.model
+        model.doc_counts[category_id] = max(0, model.doc_counts.get(category_id, 0) + sign)
+        counts = model.token_counts.setdefault(category_id, {})
+        for token in tokens:
+            n = counts.get(token, 0) + sign
+            if n > 0:
+                counts[token] = n
+            else:
+                counts.pop(token, None)
+        if not model.doc_counts[category_id]:
+            model.doc_counts.pop(category_id)
+            model.token_counts.pop(category_id, None)
+        self._tables = None
+
+    def learn(self, description, amount, direction, category_id):
+        if category_id:
+            self._add(tokenize(description, amount, direction), category_id, 1)
+
+    def unlearn(self, description, amount, direction, category_id):
+        if category_id and category_id in self.model.doc_counts:
+            self._add(tokenize(description, amount, direction), category_id, -1)
+
+    def prune(self, max_tokens=MAX_TOKENS_PER_CATEGORY):
+        """Keep the most frequent tokens per category."""
+        for category_id, counts in self.model.token_counts.items():
+            if len(counts) > max_tokens:
+                kept = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:max_tokens]
+                self.model.token_counts[category_id] = dict(kept)
+        self._tables = None
+
+    def _compile(self):
+        model = self.model
+        vocabulary = set()
+        for counts in model.token_counts.values():
+            vocabulary.update(counts)
+        size = len(vocabulary) or 1
+        total_docs = sum(model.doc_counts.values())
+        tables = []
+        for category_id, docs in model.doc_counts.items():
+            counts = model.token_counts.get(category_id, {})
+            denominator = math.log(sum(counts.values()) + size)
+            tables.append((
+                category_id,
+                math.log(docs / total_docs),
+                {t: math.log(n + 1) - denominator for t, n in counts.items()},
+                -denominator,  # log probability of a token never seen with this category
+            ))
+        self._tables = tables
+        return tables
+
+    def predict(self, description, amount=None, direction=None):
+        """(category_id, probability) of the most likely category, or (None, 0.0) when untrained."""
+        tables = self._tables if self._tables is not None else self._compile()
+        tokens = tokenize(description, amount, direction)
+        if not tables or not tokens:
+            return None, 0.0
+        scores = []
+        for category_id, prior, log_probs, unseen in tables:
+            scores.append((prior + sum(log_probs.get(t, unseen) for t in tokens), category_id))
+        best_score, best = max(scores)
+        total = sum(math.exp(score - best_score) for score, _ in scores)
+        return best, 1.0 / total
+
+    def predict_many(self, rows):
+        """predict() for each (description, amount, direction) row, in order."""
+        return [self.predict(*row) for row in rows]
+
+    def save(self):
+        self.prune()
+        self.model.save()
+        return self
+
+
+def get_learned_categorizer(user) -> LearnedCategorizer:
+    """The user's stored model (one document read); an empty one if never trained."""
+    uid = str(user.pk) if hasattr(user, "pk") else str(user)
+    return LearnedCategorizer(CategoryModelFS.get(uid) or CategoryModelFS(pk=uid, user_id=uid))
+
+
+def _learnable(t):
+    """Features learned from a transaction, or None for uncategorized and auto-categorized ones."""
+    if t is None or not t.category_id or t.category_source == CATEGORY_SOURCE_AUTO:
+        return None
+    return t.description, t.amount, t.direction, t.category_id
+
+
+def train_user_model(user) -> LearnedCategorizer:
+    """Rebuild the user's model from all of their hand-categorized transactions and store it."""
+    uid = str(user.pk) if hasattr(user, "pk") else str(user)
+    learned = LearnedCategorizer(CategoryModelFS(pk=uid, user_id=uid))
+    category_ids = {c.pk for c in CategoryFS.list_all(limit=1000)}
+    for page in TransactionFS.iter_pages([("user_id", "==", uid)]):
+        for t in page:
+            features = _learnable(t)
+            if features and t.category_id in category_ids:
+                learned.learn(*features)
+    return learned.save()
+
+
+def categorize_many(rows, user=None, min_confidence=MIN_CONFIDENCE):
+    """
+    Categorize (description, amount, direction) rows: keyword links first, then the learned
+    model. Returns one (category_id or None, confidence, source) per row, where source is
+    "keyword", "learned" or None.
+    """
+    rows = list(rows)
+    keyword_hits = get_categorizer(user).classify_many(description for description, _, _ in rows)
+    learned = get_learned_categorizer(user) if user and None in keyword_hits else None
+    if learned is not None and learned.trained_rows < MIN_TRAINING_ROWS:
+        learned = None
+    out = []
+    for row, category_id in zip(rows, keyword_hits):
+        if category_id:
+            out.append((category_id, 1.0, "keyword"))
+            continue
+        if learned is not None:
+            predicted, confidence = learned.predict(*row)
+            if predicted and confidence >= min_confidence:
+                out.append((predicted, confidence, "learned"))
+                continue
+        out.append((None, 0.0, None))
+    return out
+
+
+def learn_from_transaction(user, transaction, previous=None):
+    """
+    Incremental update after a transaction was saved: `previous` is the transaction as it was
+    before the edit, or None for a new one. What was learned from `previous` is unlearned and
+    `transaction` is learned, both only when categorized by hand. The model document is
+    read, updated and written in one Firestore transaction, so concurrent edits don't lose counts.
+    """
+    old, new = _learnable(previous), _learnable(transaction)
+    if old == new:
+        return None
+    uid = str(user.pk) if hasattr(user, "pk") else str(user)
+
+    def change(model):
+        learned = LearnedCategorizer(model or CategoryModelFS(pk=uid, user_id=uid))
+        if old:
+            learned.unlearn(*old)
+        if new:
+            learned.learn(*new)
+        learned.prune()
+        learned.model.updated_at = datetime.utcnow()
+        return learned.model
+
+    return LearnedCategorizer(CategoryModelFS.update_in_transaction(uid, change))
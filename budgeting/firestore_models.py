@@ -7,7 +7,20 @@ from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 from dataclasses import dataclass, field
 
+from firebase_admin import firestore
 from firebase_client import get_firestore_client
+from finance_tracker.data_version import bump_data_version
+from finance_tracker import search as search_index
+
+
+# Firestore accepts at most 30 values in an "in" filter.
+IN_QUERY_LIMIT = 30
+
+
+def _chunks(values, size=IN_QUERY_LIMIT):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
 
 
 def _as_decimal(value):
@@ -58,6 +71,10 @@ class BudgetingFirestoreModel:
     def from_dict(cls, doc_id: str, data: Dict[str, Any]):
         raise NotImplementedError
 
+    def owner_id(self) -> Optional[str]:
+        """User whose data version changes on write; None for shared reference data."""
+        return getattr(self, "user_id", None) or None
+
     def save(self):
         col = self._collection()
         data = self.to_dict()
@@ -67,12 +84,14 @@ class BudgetingFirestoreModel:
             doc_ref.set(data)
         else:
             col.document(self.pk).set(data)
+        bump_data_version(self.owner_id())
         return self
 
     def delete(self):
         if not self.pk:
             return
         self._collection().document(self.pk).delete()
+        bump_data_version(self.owner_id())
 
     @classmethod
     def get(cls, pk: str):
@@ -82,6 +101,31 @@ class BudgetingFirestoreModel:
             return None
         return cls.from_dict(doc.id, doc.to_dict())
 
+    @classmethod
+    def update_in_transaction(cls, pk: str, change):
+        """
+        Read-modify-write one document atomically. change(current) gets the stored object (None
+        when missing) and returns the object to store, or None to write nothing. Firestore
+        re-runs it when the document changes before the commit. Returns what was stored.
+        """
+        db = get_firestore_client()
+        ref = db.collection(cls.collection_name).document(pk)
+
+        @firestore.transactional
+        def run(transaction):
+            snapshot = ref.get(transaction=transaction)
+            current = cls.from_dict(snapshot.id, snapshot.to_dict()) if snapshot.exists else None
+            updated = change(current)
+            if updated is not None:
+                transaction.set(ref, updated.to_dict())
+            return updated
+
+        updated = run(db.transaction())
+        if updated is not None:
+            updated.pk = pk
+            bump_data_version(updated.owner_id())
+        return updated
+
     @classmethod
     def list_all(cls, limit: int = 500) -> List:
         db = get_firestore_client()
@@ -94,6 +138,36 @@ class BudgetingFirestoreModel:
         q = db.collection(cls.collection_name).where(field_name, op, value).limit(limit)
         return [cls.from_dict(d.id, d.to_dict()) for d in q.stream()]
 
+    @classmethod
+    def query_where(cls, filters, limit: Optional[int] = None) -> List:
+        """AND of (field, op, value) filters; keep them equality-only to avoid composite indexes."""
+        db = get_firestore_client()
+        q = db.collection(cls.collection_name)
+        for f, op, v in filters:
+            q = q.where(f, op, v)
+        if limit:
+            q = q.limit(limit)
+        return [cls.from_dict(d.id, d.to_dict()) for d in q.stream()]
+
+    @classmethod
+    def iter_pages(cls, filters=(), page_size: int = 500):
+        """Yield lists of instances matching equality filters, one page per RPC, ordered by document id."""
+        db = get_firestore_client()
+        q = db.collection(cls.collection_name)
+        for f, op, v in filters:
+            q = q.where(f, op, v)
+        q = q.order_by("__name__")
+        cursor = None
+        while True:
+            page_q = q.start_after(cursor) if cursor is not None else q
+            page = list(page_q.limit(page_size).stream())
+            if not page:
+                return
+            yield [cls.from_dict(d.id, d.to_dict()) for d in page]
+            if len(page) < page_size:
+                return
+            cursor = page[-1]
+
 
 # --- Group (no user_id; global reference) ---
 @dataclass
@@ -143,6 +217,10 @@ class CategoryFS(BudgetingFirestoreModel):
 
 
 # --- Transaction ---
+CATEGORY_SOURCE_MANUAL = "manual"  # picked by the user in the transaction form
+CATEGORY_SOURCE_AUTO = "auto"  # suggested by the categorizer; never learned from
+
+
 @dataclass
 class TransactionFS(BudgetingFirestoreModel):
     collection_name: str = field(init=False, default="budgeting_transactions")
@@ -152,6 +230,7 @@ class TransactionFS(BudgetingFirestoreModel):
     month: str = ""
     description: str = ""
     category_id: Optional[str] = None
+    category_source: str = ""  # CATEGORY_SOURCE_*; "" when uncategorized or stored before it existed
     classification: Optional[str] = None
     amount: Decimal = Decimal("0")
     direction: str = "expense"
@@ -167,6 +246,7 @@ class TransactionFS(BudgetingFirestoreModel):
             "month": self.month,
             "description": (self.description or "")[:500],
             "category_id": self.category_id,
+            "category_source": self.category_source or "",
             "classification": self.classification,
             "amount": str(self.amount),
             "direction": self.direction,
@@ -184,6 +264,7 @@ class TransactionFS(BudgetingFirestoreModel):
         o.month = data.get("month", "") or ""
         o.description = data.get("description", "") or ""
         o.category_id = data.get("category_id")
+        o.category_source = data.get("category_source", "") or ""
         o.classification = data.get("classification")
         o.amount = _as_decimal(data.get("amount", "0"))
         o.direction = data.get("direction", "expense")
@@ -198,7 +279,13 @@ class TransactionFS(BudgetingFirestoreModel):
         if not self.created_at:
             self.created_at = now
         self.updated_at = now
-        return super().save()
+        super().save()
+        search_index.index_transaction(self)
+        return self
+
+    def delete(self):
+        super().delete()
+        search_index.remove_document(self.user_id, search_index.KIND_TRANSACTION, self.pk)
 
     @classmethod
     def list_by_user(cls, user_id: str, month: Optional[str] = None, limit: int = 500) -> List:
@@ -211,6 +298,23 @@ class TransactionFS(BudgetingFirestoreModel):
         out.sort(key=lambda t: (t.date or date(1970, 1, 1)), reverse=True)
         return out[:limit]
 
+    @classmethod
+    def list_by_user_months(cls, user_id: str, months, fields=None) -> List:
+        """
+        All transactions of the given "YYYY-MM" months, unsorted. Equality on user_id plus `in`
+        on month (one query per 30 months) needs no composite index and, unlike list_by_user,
+        is not capped at 1000 documents. `fields` limits the fetched fields (others keep defaults).
+        """
+        db = get_firestore_client()
+        out = []
+        for chunk in _chunks(sorted(set(months))):
+            q = db.collection(cls.collection_name).where("user_id", "==", str(user_id))
+            q = q.where("month", "==", chunk[0]) if len(chunk) == 1 else q.where("month", "in", chunk)
+            if fields:
+                q = q.select(fields)
+            out.extend(cls.from_dict(d.id, d.to_dict()) for d in q.stream())
+        return out
+
     @classmethod
     def exists_by_external_id(cls, user_id: str, external_id: str) -> bool:
         db = get_firestore_client()
@@ -251,6 +355,58 @@ class MerchantCategoryLinkFS(BudgetingFirestoreModel):
     def list_by_user(cls, user_id: str, limit: int = 500) -> List:
         return cls.query_by_field("user_id", "==", str(user_id), limit=limit)
 
+    def save(self):
+        super().save()
+        from .categorizer import invalidate
+        invalidate(self.user_id)
+        return self
+
+    def delete(self):
+        super().delete()
+        from .categorizer import invalidate
+        invalidate(self.user_id)
+
+
+# --- Learned categorizer parameters (one document per user) ---
+@dataclass
+class CategoryModelFS(BudgetingFirestoreModel):
+    """
+    Multinomial naive Bayes counts learned from a user's categorized transactions (see
+    categorizer.LearnedCategorizer): doc_counts = {category_id: transactions},
+    token_counts = {category_id: {token: count}}. Document id = user id.
+    """
+    collection_name: str = field(init=False, default="budgeting_category_models")
+    pk: Optional[str] = None
+    user_id: str = ""
+    doc_counts: Dict[str, int] = field(default_factory=dict)
+    token_counts: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    updated_at: Optional[datetime] = None
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "doc_counts": self.doc_counts,
+            "token_counts": self.token_counts,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, doc_id: str, data: Dict[str, Any]):
+        o = cls(pk=doc_id)
+        o.user_id = data.get("user_id", "") or doc_id
+        o.doc_counts = {k: int(v or 0) for k, v in (data.get("doc_counts") or {}).items()}
+        o.token_counts = {
+            k: {t: int(n or 0) for t, n in (tokens or {}).items()}
+            for k, tokens in (data.get("token_counts") or {}).items()
+        }
+        o.updated_at = _as_datetime(data.get("updated_at"))
+        return o
+
+    def save(self):
+        self.pk = self.pk or str(self.user_id)
+        self.updated_at = datetime.utcnow()
+        return super().save()
+
 
 # --- Budget ---
 @dataclass
@@ -310,6 +466,54 @@ class BudgetFS(BudgetingFirestoreModel):
             return cls.from_dict(d.id, d.to_dict())
         return None
 
+    @classmethod
+    def list_by_user_years(cls, user_id: str, years) -> List:
+        """All budgets of a user in the given years, one query (year `in` up to 30 years)."""
+        db = get_firestore_client()
+        out = []
+        for chunk in _chunks(sorted({int(y) for y in years})):
+            q = db.collection(cls.collection_name).where("user_id", "==", str(user_id)).where("year", "in", chunk)
+            out.extend(cls.from_dict(d.id, d.to_dict()) for d in q.stream())
+        return out
+
+
+# --- Budget template (named category -> forecast set) ---
+@dataclass
+class BudgetTemplateFS(BudgetingFirestoreModel):
+    collection_name: str = field(init=False, default="budgeting_budget_templates")
+    pk: Optional[str] = None
+    user_id: str = ""
+    name: str = ""
+    forecasts: Dict[str, Decimal] = field(default_factory=dict)  # category_id -> forecast
+    updated_at: Optional[datetime] = None
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "name": self.name,
+            "forecasts": {cid: str(amount) for cid, amount in self.forecasts.items()},
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, doc_id: str, data: Dict[str, Any]):
+        o = cls(pk=doc_id)
+        o.user_id = data.get("user_id", "") or ""
+        o.name = data.get("name", "") or ""
+        o.forecasts = {cid: _as_decimal(v) for cid, v in (data.get("forecasts") or {}).items()}
+        o.updated_at = _as_datetime(data.get("updated_at"))
+        return o
+
+    def save(self):
+        self.updated_at = datetime.utcnow()
+        return super().save()
+
+    @classmethod
+    def list_by_user(cls, user_id: str, limit: int = 100) -> List:
+        out = cls.query_by_field("user_id", "==", str(user_id), limit=limit)
+        out.sort(key=lambda t: t.name.lower())
+        return out
+
 
 # --- Savings ---
 @dataclass
@@ -375,6 +579,8 @@ class CommitmentFS(BudgetingFirestoreModel):
     frequency: str = "monthly"
     payment_amount: Decimal = Decimal("0")
     balloon: Decimal = Decimal("0")
+    interest_rate: Decimal = Decimal("0")  # annual, in percent
+    payment_manual: Optional[bool] = None  # payment_amount typed in, not computed; None on older documents
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -387,7 +593,9 @@ class CommitmentFS(BudgetingFirestoreModel):
             "term_months": self.term_months,
             "frequency": self.frequency,
             "payment_amount": str(self.payment_amount),
+            "payment_manual": self.payment_manual,
             "balloon": str(self.balloon),
+            "interest_rate": str(self.interest_rate),
             "created_at": self.created_at,
             "updated_at": self.updated_at,
         }
@@ -403,6 +611,8 @@ class CommitmentFS(BudgetingFirestoreModel):
         o.frequency = data.get("frequency", "monthly") or "monthly"
         o.payment_amount = _as_decimal(data.get("payment_amount", "0"))
         o.balloon = _as_decimal(data.get("balloon", "0"))
+        o.interest_rate = _as_decimal(data.get("interest_rate", "0"))
+        o.payment_manual = data.get("payment_manual")
         o.created_at = _as_datetime(data.get("created_at"))
         o.updated_at = _as_datetime(data.get("updated_at"))
         return o
@@ -429,12 +639,17 @@ class CommitmentScheduleLineFS(BudgetingFirestoreModel):
     amount: Decimal = Decimal("0")
     status: str = "outstanding"
     sequence: int = 0
+    principal: Decimal = Decimal("0")  # lines entered without a split count entirely as principal
+    interest: Decimal = Decimal("0")
+    _owner: Optional[str] = field(init=False, default=None, repr=False, compare=False)
 
     def to_dict(self):
         return {
             "commitment_id": self.commitment_id,
             "due_date": self.due_date.isoformat() if self.due_date else None,
             "amount": str(self.amount),
+            "principal": str(self.principal),
+            "interest": str(self.interest),
             "status": self.status,
             "sequence": self.sequence,
         }
@@ -447,6 +662,8 @@ class CommitmentScheduleLineFS(BudgetingFirestoreModel):
         o.amount = _as_decimal(data.get("amount", "0"))
         o.status = data.get("status", "outstanding") or "outstanding"
         o.sequence = int(data.get("sequence", 0) or 0)
+        o.principal = _as_decimal(data["principal"]) if data.get("principal") is not None else o.amount
+        o.interest = _as_decimal(data.get("interest", "0"))
         return o
 
     @classmethod
@@ -458,23 +675,150 @@ class CommitmentScheduleLineFS(BudgetingFirestoreModel):
         out.sort(key=lambda x: (x.due_date or date(1970, 1, 1), x.sequence))
         return out[:limit]
 
+    @classmethod
+    def list_by_commitments(cls, commitment_ids) -> List:
+        """Schedule lines of several commitments, one `in` query per 30 commitments."""
+        db = get_firestore_client()
+        out = []
+        for chunk in _chunks(sorted({str(cid) for cid in commitment_ids if cid})):
+            q = db.collection(cls.collection_name).where("commitment_id", "in", chunk)
+            out.extend(cls.from_dict(d.id, d.to_dict()) for d in q.stream())
+        return out
+
     @classmethod
     def sum_outstanding_by_commitment(cls, commitment_id: str) -> Decimal:
         lines = cls.list_by_commitment(commitment_id)
         return sum((l.amount for l in lines if l.status == "outstanding"), Decimal("0"))
 
+    def owner_id(self) -> Optional[str]:
+        """The owning commitment's user (lines carry no user_id); read once per instance."""
+        if self._owner is None and self.commitment_id:
+            commitment = CommitmentFS.get(self.commitment_id)
+            self._owner = commitment.user_id if commitment else ""
+        return self._owner or None
+
+    def save(self):
+        before = self.get(self.pk) if self.pk else None
+        super().save()
+        CommitmentDueIndexFS.apply_line_change(before, self, self.owner_id())
+        return self
+
+    def delete(self):
+        if not self.pk:
+            return
+        before = self.get(self.pk)
+        super().delete()
+        if before is not None:
+            CommitmentDueIndexFS.apply_line_change(before, None, self.owner_id())
+
     @classmethod
     def sum_amount_due_in_month(cls, user_id: str, year: int, month: int) -> Decimal:
-        start = date(year, month, 1)
-        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
-        commitments = CommitmentFS.list_by_user(user_id)
-        c_ids = [c.pk for c in commitments]
-        total = Decimal("0")
-        for cid in c_ids:
-            for line in cls.list_by_commitment(cid):
-                if line.due_date and start <= line.due_date < end:
-                    total += line.amount
-        return total
+        return CommitmentDueIndexFS.for_user(user_id).due_in_month(year, month)
+
+
+# --- Commitment due index (one document per user) ---
+@dataclass
+class CommitmentDueIndexFS(BudgetingFirestoreModel):
+    """
+    Schedule line amounts of all of a user's commitments, summed per due month and status:
+    months = {"YYYY-MM": {"outstanding": Decimal, "paid": Decimal}}. Document id = user id.
+    Rebuilt by sync_schedule and adjusted in place when a single line is saved or deleted, so
+    monthly dues are a single document read; built on first use for users without one.
+    Lines written around these hooks leave it stale; `manage.py rebuild_due_index` rebuilds it.
+    """
+    collection_name: str = field(init=False, default="budgeting_commitment_due_index")
+    pk: Optional[str] = None
+    user_id: str = ""
+    months: Dict[str, Dict[str, Decimal]] = field(default_factory=dict)
+    updated_at: Optional[datetime] = None
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "months": {
+                key: {status: str(amount) for status, amount in by_status.items()}
+                for key, by_status in self.months.items()
+            },
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, doc_id: str, data: Dict[str, Any]):
+        o = cls(pk=doc_id)
+        o.user_id = data.get("user_id", "") or doc_id
+        o.months = {
+            key: {status: _as_decimal(amount) for status, amount in (by_status or {}).items()}
+            for key, by_status in (data.get("months") or {}).items()
+        }
+        o.updated_at = _as_datetime(data.get("updated_at"))
+        return o
+
+    @classmethod
+    def build(cls, user_id: str, lines=None):
+        """Index from the schedule lines of the user's commitments (fetched when not given)."""
+        if lines is None:
+            commitment_ids = [c.pk for page in CommitmentFS.iter_pages([("user_id", "==", str(user_id))]) for c in page]
+            lines = CommitmentScheduleLineFS.list_by_commitments(commitment_ids)
+        index = cls(pk=str(user_id), user_id=str(user_id), updated_at=datetime.utcnow())
+        for line in lines:
+            if line.due_date:
+                index.add(line.due_date, line.status, line.amount)
+        return index
+
+    @classmethod
+    def rebuild(cls, user_id: str):
+        return cls.build(user_id).save()
+
+    @classmethod
+    def apply_line_change(cls, before, after, user_id=None):
+        """
+        Move one schedule line between month/status buckets: before/after are the line as stored
+        before and after a write (None when created or deleted). Only those buckets change.
+        user_id is the owner when already known; otherwise it is read from the line's commitment.
+        """
+        line = after or before
+        uid = user_id or (line.owner_id() if line else None)
+        if not uid:
+            return
+
+        def change(index):
+            if index is None:
+                return None  # no index yet; built from the stored lines below
+            for l, sign in ((before, -1), (after, 1)):
+                if l is not None and l.due_date:
+                    index.add(l.due_date, l.status, sign * l.amount)
+            index.updated_at = datetime.utcnow()
+            return index
+
+        if cls.update_in_transaction(uid, change) is None:
+            cls.rebuild(uid)
+
+    def add(self, due_date: date, status: str, amount: Decimal):
+        key = f"{due_date.year}-{due_date.month:02d}"
+        by_status = self.months.setdefault(key, {})
+        by_status[status] = by_status.get(status, Decimal("0")) + amount
+        if not by_status[status]:
+            del by_status[status]
+        if not by_status:
+            del self.months[key]
+
+    @classmethod
+    def for_user(cls, user_id: str):
+        return cls.get(str(user_id)) or cls.rebuild(user_id)
+
+    def due_in_month(self, year: int, month: int, status: Optional[str] = None) -> Decimal:
+        by_status = self.months.get(f"{year}-{month:02d}", {})
+        if status is not None:
+            return by_status.get(status, Decimal("0"))
+        return sum(by_status.values(), Decimal("0"))
+
+    def monthly_dues(self, year: int, month: int, count: int = 24, status: Optional[str] = None):
+        """[((year, month), amount due)] for `count` consecutive months starting at year/month."""
+        out = []
+        for offset in range(count):
+            y, m = divmod(month - 1 + offset, 12)
+            out.append(((year + y, m + 1), self.due_in_month(year + y, m + 1, status)))
+        return out
 
 
 # --- FinancialStanding ---
@@ -525,7 +869,15 @@ class FinancialStandingFS(BudgetingFirestoreModel):
     def save(self):
         if not self.created_at:
             self.created_at = datetime.utcnow()
-        return super().save()
+        super().save()
+        from .analytics import invalidate
+        invalidate(self.user_id)
+        return self
+
+    def delete(self):
+        super().delete()
+        from .analytics import invalidate
+        invalidate(self.user_id)
 
     @classmethod
     def list_by_user(cls, user_id: str, limit: int = 100) -> List:
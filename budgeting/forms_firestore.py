@@ -5,6 +5,8 @@ Choices for category etc. are injected in the view from Firestore data.
 from django import forms
 from decimal import Decimal
 from .models import Direction, GoalStatus, Frequency
+from .budget_bulk import MAX_TARGET_MONTHS
+from .schedule import MAX_TERM_MONTHS
 
 
 class TransactionFormFS(forms.Form):
@@ -25,6 +27,73 @@ class BudgetEditFormFS(forms.Form):
     forecast = forms.DecimalField(widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.01"}))
 
 
+def _parse_year_month(value):
+    try:
+        year, month = (int(part) for part in value.split("-"))
+    except (AttributeError, ValueError):
+        raise forms.ValidationError("Use YYYY-MM.")
+    if not 1 <= month <= 12:
+        raise forms.ValidationError("Use YYYY-MM.")
+    return year, month
+
+
+class YearMonthField(forms.CharField):
+    """<input type="month"> cleaned to a (year, month) tuple."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("widget", forms.TextInput(attrs={"type": "month", "class": "form-control"}))
+        super().__init__(**kwargs)
+
+    def to_python(self, value):
+        value = super().to_python(value)
+        return _parse_year_month(value) if value else None
+
+
+class BudgetBulkFormFS(forms.Form):
+    OPERATIONS = [
+        ("copy", "Copy a month's forecasts"),
+        ("template", "Apply a saved template"),
+        ("scale", "Scale existing forecasts"),
+        ("save_template", "Save a month as a template"),
+    ]
+    operation = forms.ChoiceField(choices=OPERATIONS, widget=forms.Select(attrs={"class": "form-select"}))
+    source = YearMonthField(required=False, label="Source month")
+    start = YearMonthField(required=False, label="From month")
+    end = YearMonthField(required=False, label="To month")
+    template_id = forms.ChoiceField(required=False, label="Template", widget=forms.Select(attrs={"class": "form-select"}))
+    template_name = forms.CharField(required=False, max_length=100, label="Template name", widget=forms.TextInput(attrs={"class": "form-control"}))
+    percent = forms.DecimalField(
+        required=False, min_value=-100, max_value=1000, decimal_places=2, label="Adjust by (%)",
+        widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.01"}),
+    )
+    overwrite = forms.BooleanField(required=False, initial=True, label="Overwrite existing budgets")
+
+    def __init__(self, *args, template_choices=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["template_id"].choices = [("", "—")] + (template_choices or [])
+
+    def clean(self):
+        cd = super().clean()
+        op = cd.get("operation")
+        required = {
+            "copy": ("source", "start", "end"),
+            "template": ("template_id", "start", "end"),
+            "scale": ("percent", "start", "end"),
+            "save_template": ("source", "template_name"),
+        }.get(op, ())
+        for name in required:
+            if cd.get(name) in (None, ""):
+                self.add_error(name, "Required for this operation.")
+        start, end = cd.get("start"), cd.get("end")
+        if start and end:
+            span = (end[0] - start[0]) * 12 + end[1] - start[1] + 1
+            if span < 1:
+                self.add_error("end", "Must not be before the from month.")
+            elif span > MAX_TARGET_MONTHS:
+                self.add_error("end", f"At most {MAX_TARGET_MONTHS} months at once.")
+        return cd
+
+
 class SavingsFormFS(forms.Form):
     year = forms.IntegerField(widget=forms.NumberInput(attrs={"class": "form-control"}))
     month = forms.IntegerField(min_value=1, max_value=12, widget=forms.NumberInput(attrs={"class": "form-control"}))
@@ -37,10 +106,24 @@ class CommitmentFormFS(forms.Form):
     name = forms.CharField(max_length=200, widget=forms.TextInput(attrs={"class": "form-control"}))
     amount = forms.DecimalField(widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.01"}))
     start_date = forms.DateField(widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}))
-    term_months = forms.IntegerField(widget=forms.NumberInput(attrs={"class": "form-control"}))
+    term_months = forms.IntegerField(min_value=1, max_value=MAX_TERM_MONTHS, widget=forms.NumberInput(attrs={"class": "form-control"}))
     frequency = forms.ChoiceField(choices=Frequency.choices, widget=forms.Select(attrs={"class": "form-select"}))
-    payment_amount = forms.DecimalField(widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.01"}))
-    balloon = forms.DecimalField(required=False, initial=0, widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.01"}))
+    interest_rate = forms.DecimalField(
+        required=False, initial=0, min_value=0, max_digits=7, decimal_places=4, label="Annual interest rate (%)",
+        widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.0001"}),
+    )
+    payment_amount = forms.DecimalField(
+        required=False, min_value=0, help_text="Leave empty to compute the level payment from the rate and term.",
+        widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.01"}),
+    )
+    balloon = forms.DecimalField(required=False, initial=0, min_value=0, widget=forms.NumberInput(attrs={"class": "form-control", "step": "0.01"}))
+
+    def clean(self):
+        cd = super().clean()
+        amount, balloon = cd.get("amount"), cd.get("balloon") or 0
+        if amount is not None and balloon > amount:
+            self.add_error("balloon", "Balloon cannot exceed the amount.")
+        return cd
 
 
 class FinancialStandingFormFS(forms.Form):
@@ -0,0 +1,27 @@
+"""
+Rebuild the per-user commitment due index (budgeting_commitment_due_index) from the stored
+schedule lines, e.g. after a bulk import or a direct edit of schedule line documents.
+Run: python manage.py rebuild_due_index [--user USER_ID ...]
+Without --user, rebuilds the index of every user that has commitments or an index document.
+"""
+from django.core.management.base import BaseCommand
+
+from budgeting.firestore_models import CommitmentDueIndexFS, CommitmentFS
+
+
+class Command(BaseCommand):
+    help = "Rebuild per-user commitment due indexes from the commitment schedule lines"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="users", help="User id (repeatable); default all users")
+
+    def handle(self, *args, **options):
+        users = options["users"]
+        if not users:
+            users = {c.user_id for page in CommitmentFS.iter_pages() for c in page if c.user_id}
+            users.update(i.pk for page in CommitmentDueIndexFS.iter_pages() for i in page)
+            users = sorted(users)
+        for uid in users:
+            index = CommitmentDueIndexFS.rebuild(uid)
+            self.stdout.write(f"{uid}: {len(index.months)} month(s)")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(users)} index(es)."))
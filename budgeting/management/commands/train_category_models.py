@@ -0,0 +1,28 @@
+"""
+Train the learned transaction categorizer from categorized transaction history.
+Run: python manage.py train_category_models [--user USER_ID ...]
+Without --user, trains a model for every user that has budgeting transactions.
+Stores one document per user in budgeting_category_models (see budgeting/categorizer.py).
+"""
+from django.core.management.base import BaseCommand
+
+from budgeting.categorizer import train_user_model
+from budgeting.firestore_models import TransactionFS
+
+
+class Command(BaseCommand):
+    help = "Train per-user transaction categorization models from categorized transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", action="append", dest="users", help="User id (repeatable); default all users")
+
+    def handle(self, *args, **options):
+        users = options["users"]
+        if not users:
+            users = sorted({t.user_id for page in TransactionFS.iter_pages() for t in page if t.user_id})
+        for uid in users:
+            learned = train_user_model(uid)
+            self.stdout.write(
+                f"{uid}: {learned.trained_rows} transactions, {len(learned.model.doc_counts)} categories"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Trained {len(users)} model(s)."))
@@ -0,0 +1,160 @@
+"""
+Cash-flow projection for the coming months.
+
+project_cash_flow() forecasts, for each of `months` months from a start month:
+
+    expense      per category: the BudgetFS forecast where one exists, otherwise the category's
+                 average monthly expense over the `window` months before the start month
+    income       the average monthly income over the same window (income is not budgeted)
+    commitments  outstanding commitment payments due, from CommitmentDueIndexFS
+    net          income - expense - commitments, and its running total
+
+Inputs are three reads (budgets of the covered years, the trailing transactions, the due
+index) plus categories and groups for labels. The per-category figures are numpy arrays of
+shape (categories, months), so the projection itself is a handful of vector operations.
+Amounts are projected in floating point and rounded to cents on output.
+
+Results are cached in the Django cache under the user's and the global data version
+(finance_tracker.data_version), so any write that could change them yields a new key.
+"""
+import logging
+
+import numpy as np
+from django.core.cache import cache
+
+from finance_tracker.data_version import get_data_version
+
+from .firestore_models import BudgetFS, CommitmentDueIndexFS, TransactionFS
+from .services import categories_and_groups_for_user
+
+logger = logging.getLogger(__name__)
+
+MAX_MONTHS = 60
+MAX_WINDOW = 24
+CACHE_TIMEOUT = 24 * 60 * 60
+UNCATEGORIZED = "_none_"
+TRANSACTION_FIELDS = ["month", "category_id", "amount", "direction"]
+
+
+def _shift(year, month, offset):
+    y, m = divmod(month - 1 + offset, 12)
+    return year + y, m + 1
+
+
+def _key(year, month):
+    return f"{year}-{month:02d}"
+
+
+def _cents(values):
+    return [round(float(v), 2) for v in values]
+
+
+def compute_projection(user_id, start, months=12, window=6):
+    """Uncached projection; see the module docstring. start = (year, month)."""
+    uid = str(user_id)
+    horizon = [_shift(*start, i) for i in range(months)]
+    history = [_shift(*start, i - window) for i in range(window)]
+    col = {ym: i for i, ym in enumerate(horizon)}
+    hist_col = {_key(*ym): i for i, ym in enumerate(history)}
+
+    rows = {}  # category_id -> row index
+
+    def row(category_id):
+        return rows.setdefault(category_id, len(rows))
+
+    budget_cells = []
+    for b in BudgetFS.list_by_user_years(uid, {y for y, _ in horizon}):
+        j = col.get((b.year, b.month))
+        if j is not None and b.category_id:
+            budget_cells.append((row(b.category_id), j, float(b.forecast)))
+    expense_cells = []
+    income = np.zeros(window)
+    for t in TransactionFS.list_by_user_months(uid, hist_col, fields=TRANSACTION_FIELDS):
+        j = hist_col.get(t.month)
+        if j is None:
+            continue
+        if t.direction == "expense":
+            expense_cells.append((row(t.category_id or UNCATEGORIZED), j, float(t.amount)))
+        elif t.direction == "income":
+            income[j] += float(t.amount)
+
+    n = len(rows)
+    budget = np.full((n, months), np.nan)
+    if budget_cells:
+        r, c, v = zip(*budget_cells)
+        budget[r, c] = 0.0
+        np.add.at(budget, (r, c), v)  # duplicate budgets add up
+    spent = np.zeros((n, window))
+    if expense_cells:
+        r, c, v = zip(*expense_cells)
+        np.add.at(spent, (r, c), v)
+    average = spent.mean(axis=1) if window else np.zeros(n)
+
+    budgeted = ~np.isnan(budget)
+    expense = np.where(budgeted, budget, average[:, None])
+    income_row = np.full(months, income.mean() if window else 0.0)
+    due_index = CommitmentDueIndexFS.for_user(uid)
+    commitments = np.array([float(due_index.due_in_month(y, m, "outstanding")) for y, m in horizon])
+    expense_total = expense.sum(axis=0) if n else np.zeros(months)
+    net = income_row - expense_total - commitments
+
+    category_ids = sorted(rows, key=rows.get)
+    totals = expense.sum(axis=1) if n else np.zeros(0)
+    budget_months = budgeted.sum(axis=1) if n else np.zeros(0)
+    order = np.argsort(-totals, kind="stable")
+    categories = []
+    for i in order:
+        if totals[i] == 0:
+            continue
+        source = "budget" if budget_months[i] == months else "history" if budget_months[i] == 0 else "mixed"
+        categories.append({
+            "category_id": category_ids[i],
+            "source": source,
+            "values": _cents(expense[i]),
+            "total": round(float(totals[i]), 2),
+        })
+    return {
+        "start": _key(*start),
+        "months": [_key(*ym) for ym in horizon],
+        "window": window,
+        "income": _cents(income_row),
+        "expense": _cents(expense_total),
+        "commitments": _cents(commitments),
+        "net": _cents(net),
+        "cumulative_net": _cents(np.cumsum(net)),
+        "categories": categories,
+    }
+
+
+def project_cash_flow(user, start, months=12, window=6):
+    """
+    compute_projection() with category and group names, cached per user data version.
+    months is clamped to 1..MAX_MONTHS and window to 0..MAX_WINDOW.
+    """
+    uid = str(user.pk) if hasattr(user, "pk") else str(user)
+    months = min(max(int(months), 1), MAX_MONTHS)
+    window = min(max(int(window), 0), MAX_WINDOW)
+    user_version, global_version = get_data_version(uid), get_data_version()
+    key = None
+    if user_version is not None and global_version is not None:
+        key = f"cash_flow:{uid}:{user_version!r}:{global_version!r}:{_key(*start)}:{months}:{window}"
+        try:
+            cached = cache.get(key)
+        except Exception:
+            logger.exception("Could not read cached projection %s", key)
+            cached = None
+        if cached is not None:
+            return cached
+
+    projection = compute_projection(uid, start, months, window)
+    _, categories_by_id = categories_and_groups_for_user()
+    for entry in projection["categories"]:
+        cat = categories_by_id.get(entry["category_id"])
+        entry["category"] = cat.name if cat else ("Uncategorized" if entry["category_id"] == UNCATEGORIZED else entry["category_id"])
+        entry["group"] = cat.group_name if cat else ""
+    if key is not None:
+        try:
+            cache.set(key, projection, timeout=CACHE_TIMEOUT)
+        except Exception:
+            logger.exception("Could not cache projection %s", key)
+    return projection
@@ -0,0 +1,215 @@
+"""
+Amortization schedules for commitments (loans).
+
+build_schedule() expands a CommitmentFS into its payment lines using Decimal arithmetic only:
+interest is charged on the outstanding balance at the periodic rate (annual interest_rate /
+payments per year), each line is rounded to cents and the last line settles whatever balance
+is left, balloon included, so the principal parts always add up to the amount exactly.
+Without an interest rate the principal is spread evenly.
+
+sync_schedule() stores the schedule in budgeting_commitment_schedule_lines. It compares the
+new lines with the stored ones by sequence and writes only the differences in batched
+writes; lines already marked paid are never rewritten or deleted. The unpaid lines amortize
+what the paid ones left (amount - paid principal), so the total still matches the amount.
+After any write the owner's CommitmentDueIndexFS is rebuilt so monthly dues stay a single
+document read.
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal, localcontext
+from typing import List
+
+from firebase_client import get_firestore_client
+from finance_tracker.data_version import bump_data_version
+
+from .firestore_models import CommitmentDueIndexFS, CommitmentScheduleLineFS
+
+CENT = Decimal("0.01")
+PERIOD_MONTHS = {"monthly": 1, "quarterly": 3, "yearly": 12}
+MAX_TERM_MONTHS = 1200  # 100 years
+BATCH_SIZE = 500  # Firestore limit per write batch
+
+
+@dataclass(frozen=True)
+class ScheduledPayment:
+    sequence: int
+    due_date: date
+    amount: Decimal
+    principal: Decimal
+    interest: Decimal
+
+
+def _cents(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def add_months(d: date, months: int) -> date:
+    """Same day `months` later, clamped to the end of shorter months (Jan 31 + 1 -> Feb 28/29)."""
+    y, m = divmod(d.month - 1 + months, 12)
+    year, month = d.year + y, m + 1
+    return date(year, month, min(d.day, calendar.monthrange(year, month)[1]))
+
+
+def period_count(term_months: int, frequency: str) -> int:
+    step = PERIOD_MONTHS.get(frequency, 1)
+    return -(-max(0, int(term_months or 0)) // step)
+
+
+def periodic_rate(commitment) -> Decimal:
+    rate = getattr(commitment, "interest_rate", None) or Decimal("0")
+    return Decimal(rate) / 100 / (12 // PERIOD_MONTHS.get(commitment.frequency, 1))
+
+
+def regular_payment(commitment) -> Decimal:
+    """
+    Level payment that amortizes amount down to the balloon over the term:
+    (PV - FV / (1+i)^n) * i / (1 - (1+i)^-n), or (PV - FV) / n without interest.
+    """
+    n = period_count(commitment.term_months, commitment.frequency)
+    return _level_payment(Decimal(commitment.amount or 0), Decimal(commitment.balloon or 0), periodic_rate(commitment), n)
+
+
+def _level_payment(principal, balloon, i, n) -> Decimal:
+    if n <= 0 or principal <= 0:
+        return Decimal("0")
+    if i == 0:
+        return _cents((principal - balloon) / n)
+    with localcontext() as ctx:
+        ctx.prec = 40
+        growth = (1 + i) ** n
+        return _cents((principal - balloon / growth) * i / (1 - 1 / growth))
+
+
+def resolve_payment(commitment, submitted, previous=None) -> None:
+    """
+    Set payment_amount and payment_manual from a submitted payment (empty or 0: compute it).
+    `previous` is the commitment as stored before an edit: a computed payment that comes back
+    unchanged from the form is recomputed, so a new rate or term is not paid at the old level.
+    Raises ValueError for a payment that does not cover the first period's interest, which
+    would never pay down any principal.
+    """
+    submitted = _cents(Decimal(submitted or 0))
+    if submitted and previous is not None and submitted == previous.payment_amount:
+        manual = previous.payment_manual
+        if manual is None:  # stored before the flag existed
+            manual = previous.payment_amount != regular_payment(previous)
+        if not manual:
+            submitted = Decimal("0")
+    interest = _cents(_cents(Decimal(commitment.amount or 0)) * periodic_rate(commitment))
+    if submitted and interest and submitted <= interest:
+        raise ValueError(f"The payment must be more than the first period's interest ({interest}).")
+    commitment.payment_manual = bool(submitted)
+    commitment.payment_amount = submitted or regular_payment(commitment)
+
+
+def build_schedule(commitment, paid=None) -> List[ScheduledPayment]:
+    """
+    Payment lines for a commitment; the first one is due one period after start_date.
+    paid = {sequence: line} of lines already paid: they are kept as they are and the other
+    lines amortize the balance they leave (at a recomputed level unless payment_manual).
+    """
+    n = period_count(commitment.term_months, commitment.frequency)
+    balance = _cents(Decimal(commitment.amount or 0))
+    if n <= 0 or balance <= 0 or commitment.start_date is None:
+        return []
+    paid = {seq: line for seq, line in (paid or {}).items() if 1 <= seq <= n}
+    balloon = min(_cents(Decimal(commitment.balloon or 0)), balance)
+    step = PERIOD_MONTHS.get(commitment.frequency, 1)
+    i = periodic_rate(commitment)
+    payment = _cents(Decimal(commitment.payment_amount or 0)) or regular_payment(commitment)
+    recompute = bool(paid) and not commitment.payment_manual
+    last = max((seq for seq in range(1, n + 1) if seq not in paid), default=0)
+    lines = []
+    for seq in range(1, n + 1):
+        kept = paid.get(seq)
+        if kept is not None:
+            principal, interest = min(kept.principal, balance), kept.interest
+        else:
+            if recompute:
+                periods = sum(1 for s in range(seq, n + 1) if s not in paid)
+                payment = _level_payment(balance, balloon, i, periods) or payment
+                recompute = False
+            interest = _cents(balance * i)
+            if seq == last:
+                principal = balance
+            else:
+                # Never amortize below the balloon before the last line.
+                principal = max(Decimal("0"), min(payment - interest, balance - balloon))
+        balance -= principal
+        lines.append(ScheduledPayment(
+            sequence=seq,
+            due_date=add_months(commitment.start_date, seq * step),
+            amount=principal + interest,
+            principal=principal,
+            interest=interest,
+        ))
+    return lines
+
+
+def line_id(commitment_id: str, sequence: int) -> str:
+    return f"{commitment_id}-{sequence:04d}"
+
+
+def sync_schedule(commitment) -> dict:
+    """
+    Make the stored schedule match build_schedule(commitment). Returns counts of
+    created / updated / deleted / unchanged / kept_paid lines.
+    """
+    counts = dict.fromkeys(("created", "updated", "deleted", "unchanged", "kept_paid"), 0)
+    stored = {}
+    leftovers = []
+    for line in CommitmentScheduleLineFS.list_by_commitment(commitment.pk, limit=MAX_TERM_MONTHS * 2):
+        current = stored.get(line.sequence)
+        if current is None:
+            stored[line.sequence] = line
+        elif line.status == "paid" and current.status != "paid":
+            stored[line.sequence] = line  # a duplicate sequence: the paid one is authoritative
+            leftovers.append(current)
+        else:
+            leftovers.append(line)
+
+    sets, deletes = [], []
+    paid = {seq: line for seq, line in stored.items() if line.status == "paid"}
+    for payment in build_schedule(commitment, paid):
+        current = stored.pop(payment.sequence, None)
+        if current is not None and current.status == "paid":
+            counts["kept_paid"] += 1
+            continue
+        line = CommitmentScheduleLineFS(
+            pk=current.pk if current is not None else line_id(commitment.pk, payment.sequence),
+            commitment_id=commitment.pk,
+            due_date=payment.due_date,
+            amount=payment.amount,
+            principal=payment.principal,
+            interest=payment.interest,
+            status="outstanding",
+            sequence=payment.sequence,
+        )
+        if current is not None and current.to_dict() == line.to_dict():
+            counts["unchanged"] += 1
+            continue
+        sets.append(line)
+        counts["updated" if current is not None else "created"] += 1
+    for line in list(stored.values()) + leftovers:
+        if line.status == "paid":
+            counts["kept_paid"] += 1
+        else:
+            deletes.append(line)
+            counts["deleted"] += 1
+
+    if sets or deletes:
+        db = get_firestore_client()
+        col = db.collection(CommitmentScheduleLineFS.collection_name)
+        ops = [("set", line) for line in sets] + [("delete", line) for line in deletes]
+        for start in range(0, len(ops), BATCH_SIZE):
+            batch = db.batch()
+            for op, line in ops[start:start + BATCH_SIZE]:
+                if op == "set":
+                    batch.set(col.document(line.pk), line.to_dict())
+                else:
+                    batch.delete(col.document(line.pk))
+            batch.commit()
+        CommitmentDueIndexFS.rebuild(commitment.user_id)
+        bump_data_version(commitment.user_id)
+    return counts
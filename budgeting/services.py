@@ -3,16 +3,17 @@ Business logic for budgeting: actuals from transactions (Firestore), variance, a
 All data is read from Firestore; no Django ORM.
 """
 from decimal import Decimal
-from datetime import date
+from functools import cached_property
 
 from .firestore_models import (
     GroupFS,
     CategoryFS,
+    BudgetFS,
     TransactionFS,
-    MerchantCategoryLinkFS,
     CommitmentScheduleLineFS,
-    CommitmentFS,
+    CommitmentDueIndexFS,
 )
+from .categorizer import categorize_many
 
 
 def get_month_str(d):
@@ -24,34 +25,103 @@ def _user_id(user):
     return str(user.pk) if hasattr(user, "pk") else str(user)
 
 
+class MonthlyLedger:
+    """
+    One month of a user's budgeting data, loaded once: the month's transactions (one query) and
+    the commitment payments due from the user's CommitmentDueIndexFS (one document). Every figure is
+    computed on first access and memoized, so a view can read several of them for the cost of
+    a single load.
+    """
+
+    def __init__(self, user, year, month, transactions=None, commitments=None):
+        self.user_id = _user_id(user)
+        self.year = year
+        self.month = month
+        self.month_str = f"{year}-{month:02d}"
+        if transactions is not None:
+            self.transactions = transactions
+        if commitments is not None:
+            self.commitments = commitments
+
+    @classmethod
+    def for_months(cls, user, months):
+        """
+        Ledgers for many (year, month) pairs from one load: transactions with one query per 30
+        months and the commitment due index once.
+        Returns {(year, month): MonthlyLedger}.
+        """
+        months = sorted(set(months))
+        if not months:
+            return {}
+        uid = _user_id(user)
+        txns_by_month = {f"{y}-{m:02d}": [] for y, m in months}
+        for t in TransactionFS.list_by_user_months(uid, txns_by_month):
+            bucket = txns_by_month.get(t.month)
+            if bucket is not None:
+                bucket.append(t)
+        due_index = CommitmentDueIndexFS.for_user(uid)
+        return {
+            (y, m): cls(uid, y, m, transactions=txns_by_month[f"{y}-{m:02d}"], commitments=due_index.due_in_month(y, m))
+            for y, m in months
+        }
+
+    @cached_property
+    def transactions(self):
+        return TransactionFS.list_by_user_months(self.user_id, [self.month_str])
+
+    def _total(self, direction):
+        return sum((t.amount for t in self.transactions if t.direction == direction), Decimal("0"))
+
+    @cached_property
+    def expense_by_category(self):
+        """category_id -> total expense; uncategorized expenses under "_none_"."""
+        result = {}
+        for t in self.transactions:
+            if t.direction != "expense":
+                continue
+            cid = t.category_id or "_none_"
+            result[cid] = result.get(cid, Decimal("0")) + t.amount
+        return result
+
+    @cached_property
+    def income(self):
+        return self._total("income")
+
+    @cached_property
+    def expense(self):
+        return self._total("expense")
+
+    @cached_property
+    def transfers(self):
+        return self._total("transfer")
+
+    @cached_property
+    def commitments(self):
+        """Commitment payments due in this month (paid and outstanding)."""
+        return CommitmentDueIndexFS.for_user(self.user_id).due_in_month(self.year, self.month)
+
+    @cached_property
+    def savings(self):
+        """Actual savings = income - expenses - commitment payments."""
+        return self.income - self.expense - self.commitments
+
+
 def actual_expense_by_category(user, year, month):
     """
     Sum of transaction amounts (expense direction) per category for a month.
     Returns dict category_id -> total amount. Uses Firestore data.
     """
-    month_str = f"{year}-{month:02d}"
-    txns = TransactionFS.list_by_user(_user_id(user), month=month_str)
-    result = {}
-    for t in txns:
-        if t.direction != "expense":
-            continue
-        cid = t.category_id or "_none_"
-        result[cid] = result.get(cid, Decimal("0")) + t.amount
-    return result
+    return MonthlyLedger(user, year, month).expense_by_category
 
 
 def actual_income_total(user, year, month):
     """Total income for a month (exclude transfers). Firestore."""
-    month_str = f"{year}-{month:02d}"
-    txns = TransactionFS.list_by_user(_user_id(user), month=month_str)
-    return sum((t.amount for t in txns if t.direction == "income"), Decimal("0"))
+    return MonthlyLedger(user, year, month).income
 
 
 def actual_expense_total(user, year, month):
     """Total expenses for a month (exclude transfers). Firestore."""
-    month_str = f"{year}-{month:02d}"
-    txns = TransactionFS.list_by_user(_user_id(user), month=month_str)
-    return sum((t.amount for t in txns if t.direction == "expense"), Decimal("0"))
+    return MonthlyLedger(user, year, month).expense
 
 
 def commitment_payments_total(user, year, month):
@@ -59,12 +129,79 @@ def commitment_payments_total(user, year, month):
     return CommitmentScheduleLineFS.sum_amount_due_in_month(_user_id(user), year, month)
 
 
+def commitment_dues_by_month(user, year, month, count=24, status=None):
+    """[((year, month), amount due)] for `count` months from year/month, from the due index."""
+    return CommitmentDueIndexFS.for_user(_user_id(user)).monthly_dues(year, month, count, status)
+
+
 def savings_actual(user, year, month):
     """Actual savings = income - expenses - commitment payments (for the month)."""
-    inc = actual_income_total(user, year, month)
-    exp = actual_expense_total(user, year, month)
-    comm = commitment_payments_total(user, year, month)
-    return inc - exp - comm
+    return MonthlyLedger(user, year, month).savings
+
+
+def savings_by_month(user, months):
+    """{(year, month): actual savings} for many months from a single data load."""
+    return {ym: ledger.savings for ym, ledger in MonthlyLedger.for_months(user, months).items()}
+
+
+def budget_year_matrix(user, year):
+    """
+    Forecast vs actual expense for every reported category x 12 months of a year, from one
+    BudgetFS query and one transaction query for the year, aggregated in a single pass.
+    Returns {"year", "rows", "month_totals", "total"}: each row has the category, 12 cells and a
+    year total; each cell (and total) is {"month", "forecast", "actual", "variance", "utilization"}.
+    """
+    uid = _user_id(user)
+    groups, categories_by_id = categories_and_groups_for_user()
+    forecast = {}
+    for b in BudgetFS.list_by_user_years(uid, {year}):
+        if 1 <= b.month <= 12:
+            key = (b.category_id, b.month)
+            forecast[key] = forecast.get(key, Decimal("0")) + b.forecast
+    actual = {}
+    for t in TransactionFS.list_by_user_months(uid, [f"{year}-{m:02d}" for m in range(1, 13)]):
+        if t.direction != "expense" or not t.category_id or not t.month[5:7].isdigit():
+            continue
+        key = (t.category_id, int(t.month[5:7]))
+        actual[key] = actual.get(key, Decimal("0")) + t.amount
+
+    def cell(month, f, a):
+        return {
+            "month": month,
+            "forecast": f,
+            "actual": a,
+            "variance": budget_variance(a, f),
+            "utilization": utilization_pct(a, f),
+        }
+
+    zero = Decimal("0")
+    used = {cid for cid, _ in forecast} | {cid for cid, _ in actual}
+    reported = [c for cid, c in categories_by_id.items() if c.include_in_reports and cid in used]
+    group_order = {g.pk: (g.order, g.name) for g in groups}
+    reported.sort(key=lambda c: (group_order.get(c.group_id, (len(groups), "")), c.order, c.name))
+    rows = []
+    month_f = [zero] * 12
+    month_a = [zero] * 12
+    for c in reported:
+        cells = []
+        for m in range(1, 13):
+            f, a = forecast.get((c.pk, m), zero), actual.get((c.pk, m), zero)
+            month_f[m - 1] += f
+            month_a[m - 1] += a
+            cells.append(cell(m, f, a))
+        rows.append({
+            "category_id": c.pk,
+            "category": c.name,
+            "group": c.group_name,
+            "cells": cells,
+            "total": cell(None, sum((x["forecast"] for x in cells), zero), sum((x["actual"] for x in cells), zero)),
+        })
+    return {
+        "year": year,
+        "rows": rows,
+        "month_totals": [cell(m, month_f[m - 1], month_a[m - 1]) for m in range(1, 13)],
+        "total": cell(None, sum(month_f, zero), sum(month_a, zero)),
+    }
 
 
 def budget_variance(actual, forecast):
@@ -83,34 +220,21 @@ def utilization_pct(actual, forecast):
     return None
 
 
-def suggest_category_for_description(description, user=None):
+def suggest_category_for_description(description, user=None, amount=None, direction=None):
     """
-    Suggest category from MerchantCategoryLink (Firestore) by keyword match (case-insensitive).
-    Returns CategoryFS or None. user optional: if set, prefer user-specific links.
+    Suggest a category for a description: MerchantCategoryLink keywords first (user links over
+    global ones, longest keyword wins), then the user's learned model (see categorizer.py).
+    Returns CategoryFS or None.
     """
-    if not description:
-        return None
-    desc_lower = description.lower()
-    uid = _user_id(user) if user else None
-    # User-specific first
-    if uid:
-        links = MerchantCategoryLinkFS.list_by_user(uid)
-        for link in links:
-            if link.keyword.lower() in desc_lower:
-                return CategoryFS.get(link.category_id)
-    # Global (user_id null) - list all and filter
-    all_links = MerchantCategoryLinkFS.list_all(limit=1000)
-    for link in all_links:
-        if link.user_id:
-            continue
-        if link.keyword.lower() in desc_lower:
-            return CategoryFS.get(link.category_id)
-    return None
+    category_id, _, _ = categorize_many([(description, amount, direction)], user)[0]
+    return CategoryFS.get(category_id) if category_id else None
 
 
-def remaining_principal(commitment_fs):
-    """Sum of outstanding schedule line amounts for a CommitmentFS."""
-    return CommitmentScheduleLineFS.sum_outstanding_by_commitment(commitment_fs.pk)
+def remaining_principal(commitment_fs, lines=None):
+    """Principal part of the outstanding schedule lines of a CommitmentFS (lines fetched when not given)."""
+    if lines is None:
+        lines = CommitmentScheduleLineFS.list_by_commitment(commitment_fs.pk, limit=2000)
+    return sum((l.principal for l in lines if l.status == "outstanding"), Decimal("0"))
 
 
 def categories_and_groups_for_user():
@@ -0,0 +1,515 @@
+import copy
+from datetime import date
+from io import StringIO
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from finance_tracker.data_version import user_data_etag
+from finance_tracker.testing import LOCMEM_CACHE, MemoryFirestoreMixin
+
+from .analytics import build_series
+from .budget_bulk import MAX_TARGET_MONTHS, apply_forecasts, copy_month, month_forecasts, month_range
+from .budget_join import join_budget_actuals
+from .categorizer import Categorizer, LearnedCategorizer, learn_from_transaction
+from .firestore_models import (
+    CATEGORY_SOURCE_AUTO,
+    CATEGORY_SOURCE_MANUAL,
+    BudgetFS,
+    BudgetingFirestoreModel,
+    CategoryFS,
+    CategoryModelFS,
+    CommitmentDueIndexFS,
+    CommitmentFS,
+    CommitmentScheduleLineFS,
+    FinancialStandingFS,
+    GroupFS,
+    MerchantCategoryLinkFS,
+    SavingsFS,
+    TransactionFS,
+)
+from .projection import compute_projection
+from .schedule import build_schedule, regular_payment, resolve_payment, sync_schedule
+from .services import MonthlyLedger, budget_year_matrix, savings_actual, savings_by_month
+from .views import savings_list
+
+
+def commitment(**fields):
+    values = {"pk": "c1", "user_id": "7", "start_date": date(2025, 1, 31), "frequency": "monthly"}
+    values.update(fields)
+    return CommitmentFS(**values)
+
+
+class BuildScheduleTests(SimpleTestCase):
+    def test_cents_add_up_exactly(self):
+        lines = build_schedule(commitment(amount=Decimal("1000"), term_months=3))
+        self.assertEqual([l.amount for l in lines], [Decimal("333.33"), Decimal("333.33"), Decimal("333.34")])
+        self.assertEqual([l.due_date for l in lines], [date(2025, 2, 28), date(2025, 3, 31), date(2025, 4, 30)])
+
+    def test_amortized_loan(self):
+        loan = commitment(amount=Decimal("300000"), term_months=360, interest_rate=Decimal("6"))
+        self.assertEqual(regular_payment(loan), Decimal("1798.65"))
+        lines = build_schedule(loan)
+        self.assertEqual(len(lines), 360)
+        self.assertEqual(sum(l.principal for l in lines), Decimal("300000.00"))
+        self.assertEqual(lines[0].interest, Decimal("1500.00"))
+        self.assertLess(abs(lines[-1].amount - Decimal("1798.65")), Decimal("5"))
+
+    def test_balloon_is_paid_with_the_last_line(self):
+        lines = build_schedule(commitment(amount=Decimal("10000"), balloon=Decimal("4000"), term_months=12))
+        self.assertEqual({l.amount for l in lines[:-1]}, {Decimal("500.00")})
+        self.assertEqual(lines[-1].amount, Decimal("4500.00"))
+        quarterly = build_schedule(commitment(amount=Decimal("1200"), term_months=12, frequency="quarterly"))
+        self.assertEqual([l.due_date.month for l in quarterly], [4, 7, 10, 1])
+
+    def test_computed_payment_follows_an_edited_rate(self):
+        loan = commitment(amount=Decimal("300000"), term_months=360, interest_rate=Decimal("6"))
+        resolve_payment(loan, None)
+        previous = copy.copy(loan)
+        loan.interest_rate = Decimal("9")
+        resolve_payment(loan, previous.payment_amount, previous=previous)  # the form sends it back unchanged
+        self.assertEqual(loan.payment_amount, Decimal("2413.87"))
+        self.assertLess(build_schedule(loan)[-1].amount, Decimal("2500"))
+
+    def test_typed_in_payment_is_kept(self):
+        loan = commitment(amount=Decimal("300000"), term_months=360, interest_rate=Decimal("6"))
+        resolve_payment(loan, Decimal("2500"))
+        previous = copy.copy(loan)
+        loan.interest_rate = Decimal("9")
+        resolve_payment(loan, Decimal("2500"), previous=previous)
+        self.assertEqual((loan.payment_amount, loan.payment_manual), (Decimal("2500.00"), True))
+
+    def test_payment_must_cover_the_first_interest(self):
+        loan = commitment(amount=Decimal("300000"), term_months=360, interest_rate=Decimal("6"))
+        with self.assertRaisesMessage(ValueError, "(1500.00)"):
+            resolve_payment(loan, Decimal("1500"))
+        resolve_payment(loan, Decimal("1500.01"))
+        self.assertEqual(sum(l.principal for l in build_schedule(loan)), Decimal("300000.00"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SyncScheduleTests(MemoryFirestoreMixin, SimpleTestCase):
+    def lines(self):
+        return CommitmentScheduleLineFS.list_by_commitment("c1")
+
+    def test_writes_only_differences_and_keeps_paid_lines(self):
+        loan = commitment(amount=Decimal("1200"), term_months=12)
+        self.assertEqual(sync_schedule(loan)["created"], 12)
+        self.assertEqual(sync_schedule(loan)["unchanged"], 12)
+
+        for line in self.lines()[:2]:
+            line.status = "paid"
+            line.save()
+        loan.amount, loan.term_months = Decimal("1800"), 9
+        counts = sync_schedule(loan)
+        self.assertEqual(counts, {"created": 0, "updated": 7, "deleted": 3, "unchanged": 0, "kept_paid": 2})
+        lines = self.lines()
+        self.assertEqual([l.status for l in lines[:2]], ["paid", "paid"])
+        self.assertEqual(lines[0].amount, Decimal("100.00"))  # paid lines are never rewritten
+        self.assertEqual(len(lines), 9)
+        self.assertEqual(sum(l.principal for l in lines), Decimal("1800.00"))
+        self.assertEqual([l.amount for l in lines[2:]], [Decimal("228.57")] * 6 + [Decimal("228.58")])
+
+    def test_paid_lines_leave_the_rest_of_an_amortized_loan(self):
+        loan = commitment(amount=Decimal("10000"), term_months=12, interest_rate=Decimal("12"))
+        resolve_payment(loan, None)
+        sync_schedule(loan)
+        for line in self.lines()[:3]:
+            line.status = "paid"
+            line.save()
+        loan.interest_rate = Decimal("6")
+        resolve_payment(loan, loan.payment_amount, previous=copy.copy(loan))
+        sync_schedule(loan)
+        lines = self.lines()
+        self.assertEqual(sum(l.principal for l in lines), Decimal("10000.00"))
+        self.assertLess(abs(lines[-1].amount - lines[-2].amount), Decimal("0.10"))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CommitmentDueIndexTests(MemoryFirestoreMixin, SimpleTestCase):
+    def test_line_writes_move_only_their_buckets(self):
+        loan = commitment(amount=Decimal("300"), term_months=3).save()
+        sync_schedule(loan)
+        index = CommitmentDueIndexFS.for_user("7")
+        self.assertEqual(index.due_in_month(2025, 2, "outstanding"), Decimal("100.00"))
+
+        first, second, _ = CommitmentScheduleLineFS.list_by_commitment("c1")
+        first.status = "paid"
+        first.save()
+        second.delete()
+        index = CommitmentDueIndexFS.get("7")
+        self.assertEqual(index.months["2025-02"], {"paid": Decimal("100.00")})
+        self.assertNotIn("2025-03", index.months)
+        self.assertEqual(index.due_in_month(2025, 4, "outstanding"), Decimal("100.00"))
+        self.assertEqual(index.months, CommitmentDueIndexFS.build("7").months)
+
+    def test_build_pages_through_every_commitment(self):
+        for n in range(5):
+            sync_schedule(commitment(pk=f"c{n}", amount=Decimal("10"), term_months=1).save())
+        with mock.patch.object(BudgetingFirestoreModel.iter_pages.__func__, "__defaults__", ((), 2)):
+            index = CommitmentDueIndexFS.build("7")
+        self.assertEqual(index.due_in_month(2025, 2, "outstanding"), Decimal("50.00"))
+
+    def test_rebuild_command_repairs_stale_indexes(self):
+        sync_schedule(commitment(amount=Decimal("300"), term_months=3).save())
+        sync_schedule(commitment(pk="c2", user_id="8", amount=Decimal("20"), term_months=1).save())
+        CommitmentDueIndexFS(pk="9", user_id="9", months={"2025-02": {"outstanding": Decimal("5")}}).save()  # no commitments left
+        CommitmentDueIndexFS(pk="7", user_id="7").save()  # stale
+
+        call_command("rebuild_due_index", "--user", "8", stdout=StringIO())
+        self.assertEqual(CommitmentDueIndexFS.get("7").months, {})
+
+        out = StringIO()
+        call_command("rebuild_due_index", stdout=out)
+        self.assertIn("Rebuilt 3 index(es).", out.getvalue())
+        self.assertEqual(CommitmentDueIndexFS.get("7").due_in_month(2025, 3, "outstanding"), Decimal("100.00"))
+        self.assertEqual(CommitmentDueIndexFS.get("8").due_in_month(2025, 2, "outstanding"), Decimal("20.00"))
+        self.assertEqual(CommitmentDueIndexFS.get("9").months, {})
+
+    def test_line_writes_only_change_the_owners_etag(self):
+        sync_schedule(commitment(amount=Decimal("300"), term_months=3).save())
+        line = CommitmentScheduleLineFS.list_by_commitment("c1")[0]
+        owner, other = self.etag(7), self.etag(8)
+        line.status = "paid"
+        line.save()
+        self.assertEqual(self.etag(8), other)
+        self.assertNotEqual(self.etag(7), owner)
+        other = self.etag(8)
+        line.delete()
+        self.assertEqual(self.etag(8), other)
+
+    def etag(self, user_pk):
+        request = RequestFactory().get("/budgeting/")
+        request.user = SimpleNamespace(pk=user_pk, is_authenticated=True)
+        SessionMiddleware(lambda r: None).process_request(request)
+        MessageMiddleware(lambda r: None).process_request(request)
+        return user_data_etag(request)
+
+
+def link(pk, keyword, category_id, user_id=None):
+    return MerchantCategoryLinkFS(pk=pk, keyword=keyword, category_id=category_id, user_id=user_id)
+
+
+class CategorizerTests(SimpleTestCase):
+    def test_match_precedence(self):
+        categorizer = Categorizer(
+            [link("u1", "Coffee", "mine"), link("u2", "uber", "rides"), link("u3", "uber eats", "food")],
+            [link("g1", "coffee shop", "global"), link("g2", "netflix", "tv"), link("g3", "spotify", "music"),
+             link("g5", "gym", "sport"), link("g4", "gym", "health"), link("g6", "bakery", "gone")],
+            category_ids={"mine", "rides", "food", "global", "tv", "music", "sport", "health"},
+        )
+        self.assertEqual(categorizer.classify_many([
+            "THE COFFEE SHOP",    # a user link beats a longer global one
+            "Uber Eats order",    # then the longer keyword
+            "spotify + netflix",  # then the earlier match
+            "gym",                # then the lower link id
+            "bakery",             # links to deleted categories are dropped
+            "",
+        ]), ["mine", "food", "music", "health", None, None])
+
+
+class LearnedCategorizerTests(SimpleTestCase):
+    def test_unlearn_reverts_learn(self):
+        learned = LearnedCategorizer(CategoryModelFS(pk="7", user_id="7"))
+        learned.learn("Corner grocery", Decimal("30"), "expense", "food")
+        learned.learn("Grocery market", Decimal("45"), "expense", "food")
+        learned.learn("City bus pass", Decimal("20"), "expense", "transport")
+        category, probability = learned.predict("grocery", Decimal("35"), "expense")
+        self.assertEqual(category, "food")
+        self.assertGreater(probability, 0.5)
+
+        learned.unlearn("City bus pass", Decimal("20"), "expense", "transport")
+        learned.unlearn("Never learned", Decimal("5"), "expense", "transport")
+        self.assertEqual(learned.model.doc_counts, {"food": 2})
+        self.assertNotIn("transport", learned.model.token_counts)
+        self.assertEqual(learned.predict("bus"), ("food", 1.0))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class LearnFromTransactionTests(MemoryFirestoreMixin, SimpleTestCase):
+    def transaction(self, category_id, source=CATEGORY_SOURCE_MANUAL):
+        return TransactionFS(pk="t1", user_id="7", description="Corner grocery", amount=Decimal("30"),
+                             category_id=category_id, category_source=source)
+
+    def stored_counts(self):
+        return CategoryModelFS.get("7").doc_counts
+
+    def test_edits_move_counts_and_auto_categories_are_ignored(self):
+        learn_from_transaction("7", self.transaction("food"))
+        self.assertEqual(self.stored_counts(), {"food": 1})
+
+        previous = self.transaction("food")
+        learn_from_transaction("7", self.transaction("household"), previous=previous)
+        self.assertEqual(self.stored_counts(), {"household": 1})
+        self.assertEqual(set(CategoryModelFS.get("7").token_counts), {"household"})
+
+        self.assertIsNone(learn_from_transaction("7", self.transaction("household"), previous=self.transaction("household")))
+        learn_from_transaction("7", self.transaction("food", CATEGORY_SOURCE_AUTO))
+        self.assertEqual(self.stored_counts(), {"household": 1})
+        learn_from_transaction("7", self.transaction(None), previous=self.transaction("household"))
+        self.assertEqual(self.stored_counts(), {})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class ApplyForecastsTests(MemoryFirestoreMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db.load(BudgetFS.collection_name, {
+            "b1": BudgetFS(user_id="7", category_id="food", year=2025, month=1, forecast=Decimal("100")).to_dict(),
+            "b2": BudgetFS(user_id="7", category_id="rent", year=2025, month=1, forecast=Decimal("500")).to_dict(),
+            "b3": BudgetFS(user_id="8", category_id="food", year=2025, month=2, forecast=Decimal("1")).to_dict(),
+        })
+
+    def test_writes_only_changed_and_missing_budgets(self):
+        targets = {
+            ("food", 2025, 1): Decimal("100"),
+            ("rent", 2025, 1): Decimal("550"),
+            ("food", 2025, 2): Decimal("120"),
+        }
+        self.assertEqual(apply_forecasts("7", targets), {"created": 1, "updated": 1, "unchanged": 1, "skipped": 0})
+        self.assertEqual(self.db.writes, 2)
+        self.assertEqual(BudgetFS.get("b2").forecast, Decimal("550"))  # updated in place
+        self.assertEqual(self.db.count(BudgetFS.collection_name), 4)
+
+        targets[("rent", 2025, 1)] = Decimal("600")
+        targets[("rent", 2025, 2)] = Decimal("600")
+        counts = apply_forecasts("7", targets, overwrite=False)
+        self.assertEqual(counts, {"created": 1, "updated": 0, "unchanged": 0, "skipped": 3})
+        self.assertEqual(BudgetFS.get("b2").forecast, Decimal("550"))
+
+    def test_month_range_is_inclusive_and_bounded(self):
+        self.assertEqual(month_range((2024, 11), (2025, 2)), [(2024, 11), (2024, 12), (2025, 1), (2025, 2)])
+        self.assertEqual(month_range((2025, 3), (2025, 2)), [])
+        self.assertEqual(len(month_range((2025, 1), (2029, 12))), MAX_TARGET_MONTHS)
+        with self.assertRaises(ValueError):
+            month_range((2025, 1), (2030, 1))
+
+    def test_copy_month_scales_into_the_other_months(self):
+        counts = copy_month("7", (2025, 1), month_range((2025, 1), (2025, 3)), percent=10)
+        self.assertEqual(counts, {"created": 4, "updated": 0, "unchanged": 0, "skipped": 0})
+        self.assertEqual(month_forecasts("7", 2025, 3), {"food": Decimal("110.00"), "rent": Decimal("550.00")})
+        self.assertEqual(month_forecasts("8", 2025, 2), {"food": Decimal("1")})
+
+
+class JoinBudgetActualsTests(SimpleTestCase):
+    def test_rows_subtotals_and_exclusions(self):
+        groups = [GroupFS(pk="home", name="Home"), GroupFS(pk="life", name="Living")]
+        categories_by_id = {c.pk: c for c in [
+            CategoryFS(pk="rent", name="Rent", group_id="home"),
+            CategoryFS(pk="food", name="Food", group_id="life"),
+            CategoryFS(pk="fun", name="Fun", group_id="life"),
+            CategoryFS(pk="gifts", name="Gifts", group_id="life", include_in_reports=False),
+        ]}
+        budgets = [
+            BudgetFS(category_id="food", forecast=Decimal("200")),
+            BudgetFS(category_id="rent", forecast=Decimal("500")),
+            BudgetFS(category_id="food", forecast=Decimal("50")),
+            BudgetFS(category_id="deleted", forecast=Decimal("10")),
+        ]
+        actuals = {"rent": Decimal("500"), "food": Decimal("300"), "fun": Decimal("40"),
+                   "gifts": Decimal("99"), "_none_": Decimal("7")}
+        join = join_budget_actuals(budgets, actuals, categories_by_id, groups)
+
+        self.assertEqual([(r.category_id, r.forecast, r.actual) for r in join.rows], [
+            ("food", Decimal("250"), Decimal("300")),
+            ("rent", Decimal("500"), Decimal("500")),
+            ("fun", Decimal("0"), Decimal("40")),
+        ])
+        self.assertEqual([(r.group.name, r.forecast, r.actual) for r in join.group_rows], [
+            ("Home", Decimal("500"), Decimal("500")),
+            ("Living", Decimal("250"), Decimal("340")),
+        ])
+        self.assertEqual((join.total.forecast, join.total.actual), (Decimal("750"), Decimal("840")))
+        self.assertEqual(join.rows[0].utilization_pct, Decimal("120.0"))
+        self.assertIsNone(join.rows[2].utilization_pct)
+        self.assertEqual([r.category.name for r in join.overspends()], ["Food", "Fun"])
+        self.assertEqual(join.highest.category_id, "rent")
+
+
+class NetWorthSeriesTests(SimpleTestCase):
+    def snapshot(self, day, assets, liabilities):
+        return FinancialStandingFS(snapshot_date=day, total_assets=Decimal(assets), current_assets=Decimal("200"),
+                                   total_liabilities=Decimal(liabilities), short_term_liabilities=Decimal("0"))
+
+    def test_monthly_points_are_interpolated_by_date(self):
+        series = build_series([
+            self.snapshot(date(2025, 3, 15), "1590", "500"),
+            self.snapshot(date(2025, 1, 15), "900", "500"),
+            self.snapshot(date(2025, 1, 15), "1000", "500"),  # same day: the last one listed wins
+        ])
+        points = series["points"]
+        self.assertEqual((series["snapshots"], series["first"], series["last"]), (2, "2025-01-15", "2025-03-15"))
+        self.assertEqual([p["date"] for p in points], ["2025-01-15", "2025-02-01", "2025-03-01", "2025-03-15"])
+        self.assertEqual([p["snapshot"] for p in points], [True, False, False, True])
+        self.assertEqual([p["total_assets"] for p in points], [1000.0, 1170.0, 1450.0, 1590.0])  # 10 a day
+        self.assertEqual(points[1]["net_worth"], 670.0)
+        self.assertEqual(points[1]["debt_ratio"], 0.4274)
+        self.assertIsNone(points[1]["current_ratio"])
+        self.assertEqual(build_series([])["points"], [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CashFlowProjectionTests(MemoryFirestoreMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        rows = [("2025-01", "food", "30", "expense"), ("2025-02", "food", "60", "expense"),
+                ("2025-03", "food", "90", "expense"), ("2025-03", None, "30", "expense"),
+                ("2025-03", "food", "900", "income"), ("2024-12", "food", "999", "expense")]
+        self.db.load(TransactionFS.collection_name, {
+            f"t{i}": TransactionFS(user_id="7", month=month, category_id=cid, amount=Decimal(amount), direction=direction).to_dict()
+            for i, (month, cid, amount, direction) in enumerate(rows)
+        })
+        budgets = [("rent", 4, "200"), ("rent", 5, "200"), ("rent", 6, "200"), ("food", 5, "100")]
+        self.db.load(BudgetFS.collection_name, {
+            f"b{i}": BudgetFS(user_id="7", category_id=cid, year=2025, month=month, forecast=Decimal(amount)).to_dict()
+            for i, (cid, month, amount) in enumerate(budgets)
+        })
+        sync_schedule(commitment(amount=Decimal("50"), term_months=1, start_date=date(2025, 4, 10)).save())
+
+    def test_budget_overrides_history_average(self):
+        projection = compute_projection("7", (2025, 4), months=3, window=3)
+        self.assertEqual(projection["months"], ["2025-04", "2025-05", "2025-06"])
+        self.assertEqual(projection["income"], [300.0, 300.0, 300.0])
+        self.assertEqual(projection["expense"], [270.0, 310.0, 270.0])
+        self.assertEqual(projection["commitments"], [0.0, 50.0, 0.0])
+        self.assertEqual(projection["cumulative_net"], [30.0, -30.0, 0.0])
+        self.assertEqual([(c["category_id"], c["source"], c["values"]) for c in projection["categories"]], [
+            ("rent", "budget", [200.0, 200.0, 200.0]),
+            ("food", "mixed", [60.0, 100.0, 60.0]),
+            ("_none_", "history", [10.0, 10.0, 10.0]),
+        ])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class MonthlyLedgerTests(MemoryFirestoreMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        rows = [("2025-02", "food", "30", "expense"), ("2025-02", "food", "20", "expense"),
+                ("2025-02", None, "5", "expense"), ("2025-02", "rent", "400", "expense"),
+                ("2025-02", None, "1000", "income"), ("2025-02", None, "250", "transfer"),
+                ("2025-03", "food", "70", "expense"), ("2025-03", None, "900", "income")]
+        self.db.load(TransactionFS.collection_name, {
+            f"t{i}": TransactionFS(user_id="7", month=month, category_id=cid, amount=Decimal(amount), direction=direction).to_dict()
+            for i, (month, cid, amount, direction) in enumerate(rows)
+        })
+        self.db.load(TransactionFS.collection_name, {
+            "other": TransactionFS(user_id="8", month="2025-02", amount=Decimal("99")).to_dict(),
+        })
+        sync_schedule(commitment(amount=Decimal("300"), term_months=3).save())  # 100 due Feb, Mar, Apr
+        first = CommitmentScheduleLineFS.list_by_commitment("c1")[0]
+        first.status = "paid"
+        first.save()
+        self.db.reads = 0
+
+    def test_month_totals(self):
+        ledger = MonthlyLedger("7", 2025, 2)
+        self.assertEqual((ledger.income, ledger.expense, ledger.transfers), (Decimal("1000"), Decimal("455"), Decimal("250")))
+        self.assertEqual(ledger.expense_by_category, {"food": Decimal("50"), "_none_": Decimal("5"), "rent": Decimal("400")})
+        self.assertEqual(ledger.commitments, Decimal("100.00"))  # paid lines count too
+        self.assertEqual(ledger.savings, Decimal("445.00"))
+        self.assertEqual(MonthlyLedger(SimpleNamespace(pk=7), 2025, 3).savings, Decimal("730.00"))
+
+    def test_commitments_come_from_the_due_index(self):
+        CommitmentDueIndexFS(pk="7", user_id="7", months={"2025-02": {"outstanding": Decimal("42")}}).save()
+        with mock.patch.object(CommitmentScheduleLineFS, "list_by_commitments") as lines:
+            self.assertEqual(MonthlyLedger("7", 2025, 2).commitments, Decimal("42"))
+        lines.assert_not_called()
+
+    def test_every_figure_from_one_query_and_one_document(self):
+        ledger = MonthlyLedger("7", 2025, 2)
+        for _ in range(2):
+            ledger.income, ledger.expense, ledger.transfers, ledger.expense_by_category, ledger.savings
+        self.assertEqual(self.db.reads, 2)
+
+    def test_for_months_loads_once_and_matches_single_months(self):
+        months = [(2025, 3), (2025, 2), (2025, 5), (2025, 2)]
+        with mock.patch.object(TransactionFS, "list_by_user_months", wraps=TransactionFS.list_by_user_months) as load:
+            ledgers = MonthlyLedger.for_months("7", months)
+            savings = savings_by_month("7", months)
+        self.assertEqual(load.call_count, 2)  # once per call, all months together
+        self.assertEqual(self.db.reads, 4)
+        self.assertEqual(sorted(ledgers), [(2025, 2), (2025, 3), (2025, 5)])
+        self.assertEqual(savings, {(2025, 2): Decimal("445.00"), (2025, 3): Decimal("730.00"), (2025, 5): Decimal("0")})
+        for ym, ledger in ledgers.items():
+            self.assertEqual(ledger.savings, savings_actual("7", *ym))
+        self.assertEqual(MonthlyLedger.for_months("7", []), {})
+
+    def test_savings_list_fills_missing_actuals_from_one_load(self):
+        self.db.load(SavingsFS.collection_name, {
+            "s1": SavingsFS(user_id="7", year=2025, month=1, actual=Decimal("5")).to_dict(),
+            "s2": SavingsFS(user_id="7", year=2025, month=2).to_dict(),
+            "s3": SavingsFS(user_id="7", year=2025, month=3).to_dict(),
+        })
+        request = RequestFactory().get("/budgeting/savings/")
+        request.user = SimpleNamespace(pk=7, is_authenticated=True)
+        with mock.patch("budgeting.views.render", return_value=HttpResponse()) as render, \
+                mock.patch.object(TransactionFS, "list_by_user_months", wraps=TransactionFS.list_by_user_months) as load:
+            savings_list(request)
+        load.assert_called_once()
+        rows = render.call_args[0][2]["savings_list"]
+        self.assertEqual({(s.year, s.month): s.actual for s in rows},
+                         {(2025, 1): Decimal("5"), (2025, 2): Decimal("445.00"), (2025, 3): Decimal("730.00")})
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BudgetYearMatrixTests(MemoryFirestoreMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db.load(GroupFS.collection_name, {
+            "living": GroupFS(name="Living", order=1).to_dict(),
+            "fixed": GroupFS(name="Fixed", order=0).to_dict(),
+        })
+        self.db.load(CategoryFS.collection_name, {
+            "food": CategoryFS(name="Food", group_id="living").to_dict(),
+            "rent": CategoryFS(name="Rent", group_id="fixed").to_dict(),
+            "hidden": CategoryFS(name="Hidden", group_id="living", include_in_reports=False).to_dict(),
+            "unused": CategoryFS(name="Unused", group_id="living").to_dict(),
+        })
+        budgets = [("7", "food", 2025, 1, "100"), ("7", "food", 2025, 1, "20"), ("7", "rent", 2025, 2, "500"),
+                   ("7", "hidden", 2025, 1, "10"), ("7", "rent", 2024, 1, "999"), ("8", "food", 2025, 1, "999")]
+        self.db.load(BudgetFS.collection_name, {
+            f"b{i}": BudgetFS(user_id=uid, category_id=cid, year=year, month=month, forecast=Decimal(amount)).to_dict()
+            for i, (uid, cid, year, month, amount) in enumerate(budgets)
+        })
+        rows = [("2025-01", "food", "90", "expense"), ("2025-02", "food", "30", "expense"),
+                ("2025-02", "rent", "550", "expense"), ("2025-01", "hidden", "10", "expense"),
+                ("2025-01", None, "5", "expense"), ("2025-01", "food", "1000", "income"),
+                ("2024-12", "food", "999", "expense")]
+        self.db.load(TransactionFS.collection_name, {
+            f"t{i}": TransactionFS(user_id="7", month=month, category_id=cid, amount=Decimal(amount), direction=direction).to_dict()
+            for i, (month, cid, amount, direction) in enumerate(rows)
+        })
+
+    def test_year_with_budgets_actuals_and_empty_months(self):
+        with mock.patch.object(BudgetFS, "list_by_user_years", wraps=BudgetFS.list_by_user_years) as budgets:
+            matrix = budget_year_matrix(SimpleNamespace(pk=7), 2025)
+        budgets.assert_called_once_with("7", {2025})
+        self.assertEqual(self.db.reads, 4)  # groups, categories, the year's budgets and transactions
+
+        self.assertEqual([(r["category"], r["group"]) for r in matrix["rows"]], [("Rent", "Fixed"), ("Food", "Living")])
+        rent, food = matrix["rows"]
+        self.assertEqual(rent["cells"][1], {"month": 2, "forecast": Decimal("500"), "actual": Decimal("550"),
+                                            "variance": Decimal("50"), "utilization": Decimal("110.0")})
+        self.assertEqual((food["cells"][0]["forecast"], food["cells"][0]["actual"]), (Decimal("120"), Decimal("90")))
+        self.assertEqual(food["cells"][0]["utilization"], Decimal("75.0"))
+        self.assertIsNone(food["cells"][1]["utilization"])  # actual without a forecast
+        self.assertEqual(len(food["cells"]), 12)
+        self.assertEqual((food["total"]["forecast"], food["total"]["actual"]), (Decimal("120"), Decimal("120")))
+
+        totals = matrix["month_totals"]
+        self.assertEqual([(t["forecast"], t["actual"]) for t in totals[:3]],
+                         [(Decimal("120"), Decimal("90")), (Decimal("500"), Decimal("580")), (Decimal("0"), Decimal("0"))])
+        self.assertEqual(totals[11], {"month": 12, "forecast": Decimal("0"), "actual": Decimal("0"),
+                                      "variance": Decimal("0"), "utilization": None})
+        self.assertEqual((matrix["total"]["forecast"], matrix["total"]["actual"]), (Decimal("620"), Decimal("670")))
+
+    def test_year_without_data_has_no_rows(self):
+        matrix = budget_year_matrix("7", 2023)
+        self.assertEqual(matrix["rows"], [])
+        self.assertEqual(matrix["total"]["forecast"], Decimal("0"))
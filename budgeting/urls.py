@@ -9,10 +9,13 @@ urlpatterns = [
     path("transactions/expenses/", views.transaction_expenses_inquiry, name="transaction_expenses_inquiry"),
     path("transactions/add/", views.transaction_add, name="transaction_add"),
     path("transactions/upload/", views.transaction_upload, name="transaction_upload"),
+    path("transactions/export/", views.transaction_export, name="transaction_export"),
     path("transactions/<str:pk>/edit/", views.transaction_edit, name="transaction_edit"),
     path("transactions/consumption-to-transaction/", views.consumption_add_to_transaction, name="consumption_add_to_transaction"),
     path("transactions/consumption-add-all/", views.consumption_add_all_to_transactions, name="consumption_add_all_to_transactions"),
     path("budgets/", views.budget_list, name="budget_list"),
+    path("budgets/year/", views.budget_year, name="budget_year"),
+    path("budgets/bulk/", views.budget_bulk, name="budget_bulk"),
     path("budgets/add/", views.budget_add, name="budget_add"),
     path("budgets/<int:year>/<int:month>/<str:category_id>/", views.budget_edit, name="budget_edit"),
     path("savings/", views.savings_list, name="savings_list"),
@@ -20,7 +23,9 @@ urlpatterns = [
     path("commitments/", views.commitment_list, name="commitment_list"),
     path("commitments/add/", views.commitment_add, name="commitment_add"),
     path("commitments/<str:pk>/edit/", views.commitment_edit, name="commitment_edit"),
+    path("cash-flow/", views.cash_flow, name="cash_flow"),
     path("financial-standing/", views.financial_standing_list, name="financial_standing_list"),
+    path("financial-standing/series/", views.financial_standing_series, name="financial_standing_series"),
     path("financial-standing/add/", views.financial_standing_add, name="financial_standing_add"),
     path("config/categories/", views.config_categories, name="config_categories"),
     path("config/merchant-links/", views.config_merchant_links, name="config_merchant_links"),
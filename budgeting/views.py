@@ -4,21 +4,30 @@ All data is read from and written to Firestore (Firebase); no Django ORM for bud
 """
 from django.shortcuts import render, redirect
 from django.urls import reverse
-from django.http import Http404
+from django.http import Http404, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.core.paginator import Paginator
 from decimal import Decimal
 from datetime import date, datetime
+import copy
 import csv
 import io
 import json
 
+from finance_tracker import search as search_index
+from finance_tracker.data_version import conditional_user_page
+from finance_tracker.listing import ListQuery
+from finance_tracker.export import FORMATS as EXPORT_FORMATS, export_response
+
 from .firestore_models import (
+    CATEGORY_SOURCE_AUTO,
+    CATEGORY_SOURCE_MANUAL,
     GroupFS,
     CategoryFS,
     TransactionFS,
     BudgetFS,
+    BudgetTemplateFS,
     SavingsFS,
     CommitmentFS,
     CommitmentScheduleLineFS,
@@ -28,6 +37,7 @@ from .firestore_models import (
 from .forms_firestore import (
     TransactionFormFS,
     BudgetEditFormFS,
+    BudgetBulkFormFS,
     SavingsFormFS,
     CommitmentFormFS,
     FinancialStandingFormFS,
@@ -35,33 +45,26 @@ from .forms_firestore import (
     TransactionUploadForm,
 )
 from .models import Direction, GoalStatus
+from .analytics import net_worth_series
+from .budget_bulk import apply_template, copy_month, month_range, save_template, scale_months
+from .budget_join import join_budget_actuals
+from .categorizer import categorize_many, learn_from_transaction
+from .projection import project_cash_flow
+from .schedule import resolve_payment, sync_schedule
 from .services import (
+    MonthlyLedger,
     get_month_str,
     actual_expense_by_category,
-    actual_expense_total,
-    actual_income_total,
-    savings_actual,
-    budget_variance,
-    utilization_pct,
+    budget_year_matrix,
+    savings_by_month,
     suggest_category_for_description,
     remaining_principal,
     categories_and_groups_for_user,
 )
 
 
-def _category_display(cat_fs, group_name):
-    """Simple namespace so template can use category.name and category.group.name."""
-    class G:
-        name = group_name
-    class C:
-        id = cat_fs.pk
-        name = cat_fs.name
-        group = G
-        include_in_reports = cat_fs.include_in_reports
-    return C()
-
-
 @login_required
+@conditional_user_page
 def dashboard(request):
     """Monthly budget dashboard: budget vs actual by category (Firestore)."""
     today = date.today()
@@ -71,78 +74,75 @@ def dashboard(request):
     uid = str(request.user.pk)
 
     groups_list, categories_by_id = categories_and_groups_for_user()
-    groups_map = {g.pk: g for g in groups_list}
-
     budgets = BudgetFS.list_by_user(uid, year=year, month=month)
-    actuals = actual_expense_by_category(request.user, year, month)
-
-    rows = []
-    for b in budgets:
-        cat_fs = categories_by_id.get(b.category_id)
-        if not cat_fs or not cat_fs.include_in_reports:
-            continue
-        group_name = groups_map.get(cat_fs.group_id).name if cat_fs.group_id in groups_map else ""
-        cat_display = _category_display(cat_fs, group_name)
-        act = actuals.get(b.category_id) or Decimal("0")
-        var = budget_variance(act, b.forecast)
-        util = utilization_pct(act, b.forecast)
-        rows.append({
-            "category": cat_display,
-            "forecast": b.forecast,
-            "actual": act,
-            "variance": var,
-            "utilization_pct": util,
-        })
-    for cat_id, act in actuals.items():
-        if cat_id == "_none_" or any(r["category"].id == cat_id for r in rows):
-            continue
-        cat_fs = categories_by_id.get(cat_id)
-        if not cat_fs or not cat_fs.include_in_reports:
-            continue
-        group_name = groups_map.get(cat_fs.group_id).name if cat_fs.group_id in groups_map else ""
-        rows.append({
-            "category": _category_display(cat_fs, group_name),
-            "forecast": Decimal("0"),
-            "actual": act,
-            "variance": act,
-            "utilization_pct": None,
-        })
-
-    total_forecast = sum(r["forecast"] for r in rows)
-    total_actual = sum(r["actual"] for r in rows)
-    overall_variance = budget_variance(total_actual, total_forecast)
-    overall_util = utilization_pct(total_actual, total_forecast)
-    highest = max(rows, key=lambda r: r["actual"]) if rows else None
-    overspends = sorted([r for r in rows if r["variance"] > 0], key=lambda r: r["variance"], reverse=True)[:5]
-    income_total = actual_income_total(request.user, year, month)
-    expense_total = actual_expense_total(request.user, year, month)
+    ledger = MonthlyLedger(request.user, year, month)
+    joined = join_budget_actuals(budgets, ledger.expense_by_category, categories_by_id, groups_list)
 
     context = {
         "year": year,
         "month": month,
         "month_str": month_str,
         "years": list(range(today.year - 2, today.year + 3)),
-        "rows": rows,
-        "total_forecast": total_forecast,
-        "total_actual": total_actual,
-        "overall_variance": overall_variance,
-        "overall_util": overall_util,
-        "highest": highest,
-        "top_overspends": overspends,
-        "income_total": income_total,
-        "expense_total": expense_total,
+        "rows": joined.rows,
+        "group_rows": joined.group_rows,
+        "total_forecast": joined.total.forecast,
+        "total_actual": joined.total.actual,
+        "overall_variance": joined.total.variance,
+        "overall_util": joined.total.utilization_pct,
+        "highest": joined.highest,
+        "top_overspends": joined.overspends(),
+        "income_total": ledger.income,
+        "expense_total": ledger.expense,
     }
     return render(request, "budgeting/dashboard.html", context)
 
 
+# sort param -> (attribute, reverse, value for missing, label)
+TRANSACTION_SORT_OPTIONS = {
+    "-date": ("date", True, date(1970, 1, 1), "Newest first"),
+    "date": ("date", False, date(1970, 1, 1), "Oldest first"),
+    "-amount": ("amount", True, Decimal("0"), "Amount: high to low"),
+    "amount": ("amount", False, Decimal("0"), "Amount: low to high"),
+}
+
+
+TRANSACTION_LIST_MONTHS = 12  # months listed when no month filter is given
+
+
+def _transaction_list_query(request, categories_by_id):
+    return ListQuery.from_params(
+        request.GET,
+        equality={
+            "month": ("month", None),
+            "direction": ("direction", Direction.values),
+            "category": ("category_id", list(categories_by_id)),
+        },
+        sort_options=TRANSACTION_SORT_OPTIONS,
+        default_sort="-date",
+        amount_attr="amount",
+        text_attr="description",
+    )
+
+
 @login_required
+@conditional_user_page
 def transaction_list(request):
     """List transactions from Firestore with optional month filter. Supports expenses inquiry in a modal."""
     month_str = request.GET.get("month")
     inquiry_month = request.GET.get("inquiry_month")
     uid = str(request.user.pk)
-    txns = TransactionFS.list_by_user(uid, month=month_str)
     _, categories_by_id = categories_and_groups_for_user()
+    list_query = _transaction_list_query(request, categories_by_id)
+    # Equality filters (user, month, direction, category) run in Firestore; amount and text in one pass.
+    # Without a month filter the list covers the recent months (month `in`), not the whole history.
+    filters = [("user_id", "==", uid)] + list_query.pushdown()
+    recent_months = []
+    if not list_query.value("month"):
+        today = date.today()
+        start = divmod(today.year * 12 + today.month - TRANSACTION_LIST_MONTHS, 12)
+        recent_months = [f"{y}-{m:02d}" for y, m in month_range((start[0], start[1] + 1), (today.year, today.month))]
+        filters.append(("month", "in", recent_months))
+    txns = list_query.apply(TransactionFS.query_where(filters))
     # Paginate in memory
     paginator = Paginator(txns, 50)
     page = request.GET.get("page", 1)
@@ -157,6 +157,12 @@ def transaction_list(request):
     context = {
         "transactions": transactions,
         "month_filter": month_str,
+        "recent_months": len(recent_months),
+        "list_query": list_query,
+        "filter_query": list_query.querystring(),
+        "direction_choices": Direction.choices,
+        "category_choices": sorted(((c.pk, c.name) for c in categories_by_id.values()), key=lambda c: c[1].lower()),
+        "sort_choices": [(k, v[3]) for k, v in TRANSACTION_SORT_OPTIONS.items()],
         "inquiry_available_months": inquiry_available_months,
         "inquiry_years": inquiry_years,
         "inquiry_year_months": inquiry_year_months,
@@ -188,6 +194,55 @@ def transaction_list(request):
     return render(request, "budgeting/transaction_list.html", context)
 
 
+TRANSACTION_EXPORT_HEADER = ["Date", "Month", "Description", "Category", "Group", "Direction", "Amount", "Source account", "External ID"]
+
+
+def _parse_day(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+@login_required
+def transaction_export(request):
+    """
+    Download transactions as CSV or XLSX (?fmt=) for an optional ?from= / ?to= date range, honouring
+    the transaction list filters. Streamed page by page from Firestore, in document order.
+    """
+    fmt = request.GET.get("fmt", "csv")
+    if fmt not in EXPORT_FORMATS:
+        fmt = "csv"
+    date_from = _parse_day(request.GET.get("from"))
+    date_to = _parse_day(request.GET.get("to"))
+    uid = str(request.user.pk)
+    _, categories_by_id = categories_and_groups_for_user()
+    list_query = _transaction_list_query(request, categories_by_id)
+    filters = [("user_id", "==", uid)] + list_query.pushdown()
+    direction_labels = dict(Direction.choices)
+
+    def in_range(t):
+        if date_from is None and date_to is None:
+            return True
+        if t.date is None:
+            return False
+        return (date_from is None or t.date >= date_from) and (date_to is None or t.date <= date_to)
+
+    def rows():
+        items = (t for page in TransactionFS.iter_pages(filters) for t in page)
+        for t in list_query.iter_matching(items, extra=in_range):
+            cat = categories_by_id.get(t.category_id) if t.category_id else None
+            yield [
+                t.date, t.month, t.description,
+                cat.name if cat else "", cat.group_name if cat else "",
+                direction_labels.get(t.direction, t.direction), t.amount,
+                t.source_account, t.external_id,
+            ]
+
+    span = f"{date_from or 'start'}_{date_to or date.today()}"
+    return export_response(fmt, f"transactions_{span}", TRANSACTION_EXPORT_HEADER, rows(), sheet="Transactions")
+
+
 def _inquiry_available_months(uid):
     """Return distinct (year, month) from consumptions for this user. Values: list of 'YYYY-MM', and year_months dict {year: [month, ...]}."""
     try:
@@ -279,6 +334,7 @@ def _merged_consumption_and_transactions(uid, month_str, categories_by_id, added
 
 
 @login_required
+@conditional_user_page
 def transaction_expenses_inquiry(request):
     """List only expense transactions for the user (inquire expenses) with optional month filter and total."""
     month_str = request.GET.get("month")
@@ -354,9 +410,10 @@ def consumption_add_to_transaction(request):
         external_id=ext_id,
     )
     if c.note:
-        suggested = suggest_category_for_description(c.note, request.user)
+        suggested = suggest_category_for_description(c.note, request.user, t.amount, t.direction)
         if suggested:
             t.category_id = suggested.pk
+            t.category_source = CATEGORY_SOURCE_AUTO
     t.save()
     messages.success(request, "Expense added to transactions. You can edit it to set category.")
     _url = reverse("budgeting:transaction_list")
@@ -391,7 +448,7 @@ def consumption_add_all_to_transactions(request):
     year, month = int(inquiry_month[:4]), int(inquiry_month[5:7])
     start = date_type(year, month, 1)
     end = date_type(year, month + 1, 1) if month < 12 else date_type(year + 1, 1, 1)
-    created = 0
+    pending = []
     for c in consumptions:
         if not c.date or not (start <= c.date < end) or (c.record_status or "active") != "active":
             continue
@@ -413,13 +470,16 @@ def consumption_add_all_to_transactions(request):
             source_account="",
             external_id=ext_id,
         )
-        if c.note:
-            suggested = suggest_category_for_description(c.note, request.user)
-            if suggested:
-                t.category_id = suggested.pk
-        t.save()
-        created += 1
+        pending.append((t, c.note))
         added_ids.add(c.pk)
+    suggestions = categorize_many(((note, t.amount, t.direction) for t, note in pending), request.user)
+    with search_index.batch():
+        for (t, note), (category_id, _, _) in zip(pending, suggestions):
+            if note and category_id:
+                t.category_id = category_id
+                t.category_source = CATEGORY_SOURCE_AUTO
+            t.save()
+    created = len(pending)
     if created:
         messages.success(request, f"Added {created} expense(s) to transactions. You can edit them to set categories.")
     else:
@@ -453,11 +513,17 @@ def transaction_add(request):
                 direction=cd["direction"],
                 source_account=cd.get("source_account") or "",
             )
-            if not t.category_id and cd.get("description"):
-                suggested = suggest_category_for_description(cd["description"], request.user)
-                if suggested:
-                    t.category_id = suggested.pk
-            t.save()
+            if t.category_id:
+                t.category_source = CATEGORY_SOURCE_MANUAL
+                t.save()
+                learn_from_transaction(request.user, t)
+            else:
+                if cd.get("description"):
+                    suggested = suggest_category_for_description(cd["description"], request.user, t.amount, t.direction)
+                    if suggested:
+                        t.category_id = suggested.pk
+                        t.category_source = CATEGORY_SOURCE_AUTO
+                t.save()
             messages.success(request, "Transaction added.")
             return redirect("budgeting:transaction_list")
     else:
@@ -476,15 +542,19 @@ def transaction_edit(request, pk):
         form = TransactionFormFS(request.POST, category_choices=choices)
         if form.is_valid():
             cd = form.cleaned_data
+            previous = copy.copy(t)
             t.date = cd["date"]
             t.month = get_month_str(cd["date"])
             t.description = cd["description"]
             t.category_id = cd.get("category_id") or None
+            if t.category_id != previous.category_id:
+                t.category_source = CATEGORY_SOURCE_MANUAL if t.category_id else ""
             t.classification = cd.get("classification") or None
             t.amount = cd["amount"]
             t.direction = cd["direction"]
             t.source_account = cd.get("source_account") or ""
             t.save()
+            learn_from_transaction(request.user, t, previous=previous)
             messages.success(request, "Transaction updated.")
             return redirect("budgeting:transaction_list")
     else:
@@ -527,8 +597,9 @@ def transaction_upload(request):
         return redirect("budgeting:transaction_upload")
 
     uid = str(request.user.pk)
-    created = 0
     skipped = 0
+    pending = []
+    pending_ext_ids = set()
     for row in rows[1:]:
         if len(row) < 3:
             continue
@@ -550,22 +621,26 @@ def transaction_upload(request):
         amount = abs(amt)
         month_str = get_month_str(dt.date())
         ext_id = f"{dt.date()}-{amount}-{desc[:50]}"
-        if TransactionFS.exists_by_external_id(uid, ext_id):
+        if ext_id in pending_ext_ids or TransactionFS.exists_by_external_id(uid, ext_id):
             skipped += 1
             continue
-        cat = suggest_category_for_description(desc, request.user)
-        t = TransactionFS(
+        pending_ext_ids.add(ext_id)
+        pending.append(TransactionFS(
             user_id=uid,
             date=dt.date(),
             month=month_str,
             description=desc,
             amount=amount,
             direction=direction,
-            category_id=cat.pk if cat else None,
             external_id=ext_id,
-        )
-        t.save()
-        created += 1
+        ))
+    suggestions = categorize_many(((t.description, t.amount, t.direction) for t in pending), request.user)
+    with search_index.batch():
+        for t, (category_id, _, _) in zip(pending, suggestions):
+            t.category_id = category_id
+            t.category_source = CATEGORY_SOURCE_AUTO if category_id else ""
+            t.save()
+    created = len(pending)
 
     messages.success(request, f"Imported {created} transactions to Firebase, skipped {skipped}.")
     return redirect("budgeting:transaction_list")
@@ -651,6 +726,7 @@ MONTH_NAMES = [
 
 
 @login_required
+@conditional_user_page
 def budget_list(request):
     """Single-month budget view: navigator card (prev/next month) and grid of category vs forecast vs actual."""
     uid = str(request.user.pk)
@@ -670,37 +746,9 @@ def budget_list(request):
     month_label = f"{MONTH_NAMES[month]} {year}"
 
     groups_list, categories_by_id = categories_and_groups_for_user()
-    groups_map = {g.pk: g for g in groups_list}
     budgets = BudgetFS.list_by_user(uid, year=year, month=month)
     actuals = actual_expense_by_category(request.user, year, month)
-
-    rows = []
-    for b in budgets:
-        cat_fs = categories_by_id.get(b.category_id)
-        if not cat_fs or not cat_fs.include_in_reports:
-            continue
-        group_name = groups_map.get(cat_fs.group_id).name if cat_fs.group_id in groups_map else ""
-        cat_display = _category_display(cat_fs, group_name)
-        act = actuals.get(b.category_id) or Decimal("0")
-        rows.append({
-            "category": cat_display,
-            "category_id": b.category_id,
-            "forecast": b.forecast,
-            "actual": act,
-        })
-    for cat_id, act in actuals.items():
-        if cat_id == "_none_" or any(r["category_id"] == cat_id for r in rows):
-            continue
-        cat_fs = categories_by_id.get(cat_id)
-        if not cat_fs or not cat_fs.include_in_reports:
-            continue
-        group_name = groups_map.get(cat_fs.group_id).name if cat_fs.group_id in groups_map else ""
-        rows.append({
-            "category": _category_display(cat_fs, group_name),
-            "category_id": cat_id,
-            "forecast": Decimal("0"),
-            "actual": act,
-        })
+    rows = join_budget_actuals(budgets, actuals, categories_by_id, groups_list).rows
 
     return render(
         request,
@@ -718,6 +766,69 @@ def budget_list(request):
     )
 
 
+@login_required
+@conditional_user_page
+def budget_year(request):
+    """Year at a glance: categories x months of forecast vs actual. ?format=json returns the matrix as JSON."""
+    today = date.today()
+    try:
+        year = int(request.GET.get("year", today.year))
+    except (TypeError, ValueError):
+        year = today.year
+    matrix = budget_year_matrix(request.user, year)
+    if request.GET.get("format") == "json":
+        return JsonResponse(matrix)
+    return render(
+        request,
+        "budgeting/budget_year.html",
+        {
+            "year": year,
+            "prev_year": year - 1,
+            "next_year": year + 1,
+            "month_labels": [name[:3] for name in MONTH_NAMES[1:]],
+            "matrix": matrix,
+        },
+    )
+
+
+@login_required
+def budget_bulk(request):
+    """Copy a month's forecasts, apply a template or scale forecasts over a range of months in one request."""
+    uid = str(request.user.pk)
+    templates = {t.pk: t for t in BudgetTemplateFS.list_by_user(uid)}
+    template_choices = [(pk, t.name) for pk, t in templates.items()]
+    if request.method == "POST":
+        form = BudgetBulkFormFS(request.POST, template_choices=template_choices)
+        if form.is_valid():
+            cd = form.cleaned_data
+            op = cd["operation"]
+            if op == "save_template":
+                template = save_template(uid, cd["template_name"].strip(), cd["source"])
+                messages.success(request, f"Saved template \"{template.name}\" with {len(template.forecasts)} categories.")
+                return redirect("budgeting:budget_bulk")
+            months = month_range(cd["start"], cd["end"])
+            if op == "copy":
+                counts = copy_month(uid, cd["source"], months, percent=cd.get("percent"), overwrite=cd["overwrite"])
+            elif op == "template":
+                counts = apply_template(uid, templates[cd["template_id"]], months, percent=cd.get("percent"), overwrite=cd["overwrite"])
+            else:
+                counts = scale_months(uid, months, cd["percent"])
+            messages.success(
+                request,
+                f"{counts['created']} budget(s) created, {counts['updated']} updated, "
+                f"{counts['unchanged']} unchanged, {counts['skipped']} kept.",
+            )
+            return redirect(reverse("budgeting:budget_year") + "?year=%d" % cd["start"][0])
+    else:
+        today = date.today()
+        form = BudgetBulkFormFS(template_choices=template_choices, initial={
+            "source": f"{today.year}-{today.month:02d}",
+            "start": f"{today.year + 1}-01",
+            "end": f"{today.year + 1}-12",
+        })
+    return render(request, "budgeting/budget_bulk.html", {"form": form, "templates": templates.values()})
+
+
 @login_required
 def budget_edit(request, year, month, category_id):
     """Create or edit budget in Firestore for category/month."""
@@ -747,14 +858,16 @@ def budget_edit(request, year, month, category_id):
 
 
 @login_required
+@conditional_user_page
 def savings_list(request):
-    """List savings from Firestore; compute actual from transactions if not set."""
+    """List savings from Firestore; actuals that are not set are computed for all months in one load."""
     uid = str(request.user.pk)
     savings_list_data = SavingsFS.list_by_user(uid)
     goal_labels = dict(GoalStatus.choices)
+    computed = savings_by_month(request.user, [(s.year, s.month) for s in savings_list_data if s.actual is None])
     for s in savings_list_data:
         if s.actual is None:
-            s.actual = savings_actual(request.user, s.year, s.month)
+            s.actual = computed[(s.year, s.month)]
         s.goal_status_display = goal_labels.get(s.goal_status, s.goal_status)
     return render(request, "budgeting/savings_list.html", {"savings_list": savings_list_data})
 
@@ -784,12 +897,16 @@ def savings_edit(request, year, month):
 
 
 @login_required
+@conditional_user_page
 def commitment_list(request):
     """List commitments from Firestore with remaining balance."""
     uid = str(request.user.pk)
     commitments = CommitmentFS.list_by_user(uid)
+    lines_by_commitment = {}
+    for line in CommitmentScheduleLineFS.list_by_commitments(c.pk for c in commitments):
+        lines_by_commitment.setdefault(line.commitment_id, []).append(line)
     for c in commitments:
-        c.remaining = remaining_principal(c)
+        c.remaining = remaining_principal(c, lines_by_commitment.get(c.pk, []))
     return render(request, "budgeting/commitment_list.html", {"commitments": commitments})
 
 
@@ -806,12 +923,18 @@ def commitment_add(request):
                 start_date=cd["start_date"],
                 term_months=cd["term_months"],
                 frequency=cd["frequency"],
-                payment_amount=cd["payment_amount"],
+                interest_rate=cd.get("interest_rate") or Decimal("0"),
                 balloon=cd.get("balloon") or Decimal("0"),
             )
-            c.save()
-            messages.success(request, "Commitment added. Add schedule lines in Firebase console or later.")
-            return redirect("budgeting:commitment_list")
+            try:
+                resolve_payment(c, cd.get("payment_amount"))
+            except ValueError as e:
+                form.add_error("payment_amount", str(e))
+            else:
+                c.save()
+                counts = sync_schedule(c)
+                messages.success(request, f"Commitment added with {counts['created']} scheduled payments.")
+                return redirect("budgeting:commitment_list")
     else:
         form = CommitmentFormFS()
     return render(request, "budgeting/commitment_form.html", {"form": form, "title": "Add commitment"})
@@ -826,16 +949,24 @@ def commitment_edit(request, pk):
         form = CommitmentFormFS(request.POST)
         if form.is_valid():
             cd = form.cleaned_data
+            previous = copy.copy(c)
             c.name = cd["name"]
             c.amount = cd["amount"]
             c.start_date = cd["start_date"]
             c.term_months = cd["term_months"]
             c.frequency = cd["frequency"]
-            c.payment_amount = cd["payment_amount"]
+            c.interest_rate = cd.get("interest_rate") or Decimal("0")
             c.balloon = cd.get("balloon") or Decimal("0")
-            c.save()
-            messages.success(request, "Commitment updated.")
-            return redirect("budgeting:commitment_list")
+            try:
+                resolve_payment(c, cd.get("payment_amount"), previous=previous)
+            except ValueError as e:
+                form.add_error("payment_amount", str(e))
+            else:
+                c.save()
+                counts = sync_schedule(c)
+                changed = counts["created"] + counts["updated"] + counts["deleted"]
+                messages.success(request, f"Commitment updated; {changed} schedule line(s) changed, {counts['kept_paid']} paid kept.")
+                return redirect("budgeting:commitment_list")
     else:
         form = CommitmentFormFS(initial={
             "name": c.name,
@@ -843,6 +974,7 @@ def commitment_edit(request, pk):
             "start_date": c.start_date,
             "term_months": c.term_months,
             "frequency": c.frequency,
+            "interest_rate": c.interest_rate,
             "payment_amount": c.payment_amount,
             "balloon": c.balloon,
         })
@@ -850,13 +982,48 @@ def commitment_edit(request, pk):
 
 
 @login_required
+@conditional_user_page
 def financial_standing_list(request):
-    """List financial standing snapshots from Firestore."""
+    """List financial standing snapshots from Firestore, with the net worth trend chart."""
     uid = str(request.user.pk)
     standings = FinancialStandingFS.list_by_user(uid)
     return render(request, "budgeting/financial_standing_list.html", {"standings": standings})
 
 
+@login_required
+@conditional_user_page
+def financial_standing_series(request):
+    """Monthly net worth, liquidity and leverage series (JSON, for charting)."""
+    return JsonResponse(net_worth_series(request.user))
+
+
+@login_required
+@conditional_user_page
+def cash_flow(request):
+    """Projected income, expenses and commitment payments for the coming months. ?format=json returns the projection."""
+    today = date.today()
+    start = (today.year, today.month)
+    value = request.GET.get("start", "")
+    if len(value) == 7 and value[4] == "-" and value[:4].isdigit() and value[5:].isdigit() and 1 <= int(value[5:]) <= 12:
+        start = (int(value[:4]), int(value[5:]))
+    try:
+        months = int(request.GET.get("months", 12))
+        window = int(request.GET.get("window", 6))
+    except (TypeError, ValueError):
+        months, window = 12, 6
+    projection = project_cash_flow(request.user, start, months, window)
+    if request.GET.get("format") == "json":
+        return JsonResponse(projection)
+    rows = [
+        {"month": m, "income": i, "expense": e, "commitments": c, "net": n, "cumulative_net": cn}
+        for m, i, e, c, n, cn in zip(
+            projection["months"], projection["income"], projection["expense"],
+            projection["commitments"], projection["net"], projection["cumulative_net"],
+        )
+    ]
+    return render(request, "budgeting/cash_flow.html", {"projection": projection, "rows": rows})
+
+
 @login_required
 def financial_standing_add(request):
     if request.method == "POST":
@@ -0,0 +1,186 @@
+"""
+Content-addressed cache for rendered report charts.
+
+A chart is described by a plain "spec" dict (kind, labels, values/series, title, size, dpi, ...).
+Its key is the sha256 of the canonical JSON of that spec, so identical data always maps to the
+same bytes and any change in data, labels or size produces a new key; nothing is invalidated
+explicitly.
+
+Two tiers, both bounded by bytes:
+- in-process LRU (CHART_CACHE_MEMORY_BYTES)
+- files under LOCAL_DATA_DIR/charts (CHART_CACHE_DISK_BYTES), shared by web and report workers;
+  hits refresh the file mtime and pruning removes the least recently used files first.
+
+Only the "raster" REPORT_CHART_BACKEND goes through this cache. The default "vector" backend
+(expenses/vector_charts.py) draws each chart onto the PDF canvas straight from its spec: there
+are no bytes to store and drawing costs less than a cache lookup would save.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CACHE_FORMAT = 1
+PRUNE_INTERVAL = 60.0  # seconds between disk size checks
+
+
+def chart_key(spec: dict) -> str:
+    payload = json.dumps({"v": CACHE_FORMAT, "spec": spec}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryLRU:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._data[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+
+class DiskLRU:
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._written = 0
+        self._last_prune = 0.0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.bin")
+
+    def get(self, key) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)
+            return value
+        except OSError:
+            return None
+
+    def put(self, key, value: bytes):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)
+        except OSError:
+            logger.warning("Could not write chart cache file %s", path)
+            return
+        with self._lock:
+            self._written += len(value)
+            due = self._written > self.max_bytes // 10 or time.monotonic() - self._last_prune > PRUNE_INTERVAL
+        if due:
+            self.prune()
+
+    def prune(self):
+        """Remove least recently used files until the cache is under 90% of its budget."""
+        with self._lock:
+            self._written = 0
+            self._last_prune = time.monotonic()
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        if total <= self.max_bytes:
+            return
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= target:
+                break
+
+
+class ChartCache:
+    def __init__(self, root: str, memory_bytes: int, disk_bytes: int):
+        self.memory = MemoryLRU(memory_bytes)
+        self.disk = DiskLRU(root, disk_bytes) if disk_bytes > 0 else None
+        self.hits = self.misses = 0
+
+    def lookup(self, key) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def store(self, key, value: bytes):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def get_or_render(self, spec: dict, render: Callable[[dict], bytes]) -> bytes:
+        key = chart_key(spec)
+        value = self.lookup(key)
+        if value is None:
+            value = render(spec)
+            self.store(key, value)
+        return value
+
+
+_cache: Optional[ChartCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_chart_cache() -> ChartCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ChartCache(
+                    os.path.join(settings.LOCAL_DATA_DIR, "charts"),
+                    getattr(settings, "CHART_CACHE_MEMORY_BYTES", 32 * 1024 * 1024),
+                    getattr(settings, "CHART_CACHE_DISK_BYTES", 256 * 1024 * 1024),
+                )
+    return _cache
@@ -0,0 +1,177 @@
+"""
+Report chart specs and their renderers.
+
+A spec is a JSON-serialisable dict holding everything that affects the picture, so it doubles
+as the chart cache key (expenses/chart_cache.py). Values are rounded to cents when the spec is
+built: float sums that differ only in the last bits render identically and share a cache entry.
+
+Rendering uses matplotlib's object-oriented API (Figure + Agg canvas) and never touches pyplot,
+so there is no global figure state and it is safe in threaded servers. render_charts() renders
+the cache misses of a whole report in a process pool (CHART_RENDER_PROCESSES).
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from django.conf import settings
+
+from .chart_cache import chart_key, get_chart_cache
+
+logger = logging.getLogger(__name__)
+
+PALETTE = ["#36a2eb", "#ff6384", "#ffcd56", "#4bc0c0", "#9966ff", "#ff9f40"]
+
+
+def donut_spec(title, labels, values, size=(5.0, 3.6), dpi=100):
+    return {
+        "kind": "donut",
+        "title": title,
+        "labels": list(labels),
+        "values": [round(float(v), 2) for v in values],
+        "size": list(size),
+        "dpi": dpi,
+    }
+
+
+def stacked_bar_spec(title, x_labels, series, ylabel="", size=(7.5, 3.2), dpi=100):
+    """series: [(name, [value per x label]), ...] in stacking order."""
+    return {
+        "kind": "stacked_bar",
+        "title": title,
+        "x_labels": list(x_labels),
+        "series": [[name, [round(float(v), 2) for v in values]] for name, values in series],
+        "ylabel": ylabel,
+        "size": list(size),
+        "dpi": dpi,
+    }
+
+
+def _figure(spec):
+    # Imported here so the vector report path never loads matplotlib.
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=tuple(spec["size"]), dpi=spec["dpi"])
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+
+def _png(fig):
+    buf = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png", bbox_inches="tight", transparent=True)
+    return buf.getvalue()
+
+
+def _render_donut(spec):
+    fig, ax = _figure(spec)
+    wedges, _ = ax.pie(spec["values"], startangle=90, wedgeprops={"width": 0.4})
+    ax.legend(
+        wedges,
+        spec["labels"],
+        title="Category",
+        loc="center left",
+        bbox_to_anchor=(1.0, 0.5),
+        fontsize=8,
+        title_fontsize=8
+    )
+    ax.set_title(spec["title"])
+    ax.set_aspect("equal", adjustable="box")
+    return _png(fig)
+
+
+def _render_stacked_bar(spec):
+    fig, ax = _figure(spec)
+    bottoms = [0.0 for _ in spec["x_labels"]]
+    for idx, (name, values) in enumerate(spec["series"]):
+        ax.bar(spec["x_labels"], values, bottom=bottoms, color=PALETTE[idx % len(PALETTE)], label=name)
+        bottoms = [b + v for b, v in zip(bottoms, values)]
+    ax.set_ylabel(spec["ylabel"])
+    ax.set_title(spec["title"])
+    ax.grid(axis="y", linestyle="--", alpha=0.3)
+    ax.legend(loc="upper right", fontsize=7, title_fontsize=7)
+    return _png(fig)
+
+
+RENDERERS = {
+    "donut": _render_donut,
+    "stacked_bar": _render_stacked_bar,
+}
+
+
+def render_chart(spec) -> bytes:
+    """Render a spec to PNG bytes (no caching)."""
+    return RENDERERS[spec["kind"]](spec)
+
+
+# --- parallel rendering ---
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def render_processes() -> int:
+    configured = getattr(settings, "CHART_RENDER_PROCESSES", None)
+    if configured is not None:
+        return max(0, int(configured))
+    return min(4, os.cpu_count() or 1)
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """The shared pool, replaced when a caller asks for a different number of workers."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers != workers:
+            _pool.shutdown(wait=False)  # work already submitted to it still completes
+            _pool = None
+        if _pool is None:
+            # spawn: forking a threaded web server can deadlock the child
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool():
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool, _pool_workers = None, 0
+
+
+def render_many(specs, workers: Optional[int] = None) -> List[bytes]:
+    """Render specs (no caching); in the process pool when there is more than one and workers > 1."""
+    workers = render_processes() if workers is None else workers
+    if workers <= 1 or len(specs) <= 1:
+        return [render_chart(spec) for spec in specs]
+    try:
+        pool = _get_pool(workers)
+        return list(pool.map(render_chart, specs, chunksize=max(1, len(specs) // (workers * 4))))
+    except (BrokenProcessPool, OSError):
+        logger.exception("Chart process pool failed; rendering inline")
+        _reset_pool()
+        return [render_chart(spec) for spec in specs]
+
+
+def render_charts(specs, workers: Optional[int] = None) -> List[bytes]:
+    """PNG bytes for each spec: cached ones are reused, all misses are rendered in one parallel batch."""
+    cache = get_chart_cache()
+    keys = [chart_key(spec) for spec in specs]
+    out: List[Optional[bytes]] = [cache.lookup(key) for key in keys]
+    missing = {}
+    for idx, value in enumerate(out):
+        if value is None:
+            missing.setdefault(keys[idx], idx)
+    if missing:
+        rendered = render_many([specs[idx] for idx in missing.values()], workers)
+        by_key = dict(zip(missing, rendered))
+        for key, value in by_key.items():
+            cache.store(key, value)
+        out = [value if value is not None else by_key[key] for key, value in zip(keys, out)]
+    return out
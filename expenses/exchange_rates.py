@@ -0,0 +1,223 @@
+"""
+Date-effective exchange rates.
+
+Rates use the same convention as settings.EXCHANGE_RATES: USD per one unit of the currency.
+A feed (settings.EXCHANGE_RATES_FEED) lists dated rates; each applies from its date until the
+next entry for that currency. Dates before a currency's first entry, and currencies missing from
+the feed, fall back to the static settings.EXCHANGE_RATES.
+
+Feed formats:
+- CSV with header `currency,date,rate` (date as YYYY-MM-DD)
+- JSON `{"LBP": {"2024-01-01": 0.0000112, ...}, ...}` or a list of {"currency", "date", "rate"} objects
+
+Rates are parsed to Decimal once, at load time; lookups are a bisect over date ordinals.
+A change of the rates (feed file or settings) bumps the global data version, so pages and
+reports cached under it are recomputed with the new rates.
+"""
+import csv
+import hashlib
+import json
+import logging
+import os
+import threading
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from finance_tracker.data_version import bump_data_version
+
+logger = logging.getLogger(__name__)
+
+BASE_CURRENCY = "USD"
+CENTS = Decimal("0.01")
+ONE = Decimal("1")
+
+
+def _to_decimal(value) -> Optional[Decimal]:
+    try:
+        d = Decimal(str(value))
+    except (InvalidOperation, ValueError, TypeError):
+        return None
+    return d if d.is_finite() and d > 0 else None
+
+
+class RateStore:
+    """In-memory interval index of dated rates per currency."""
+
+    def __init__(self, static_rates: Optional[Dict[str, object]] = None):
+        self._static: Dict[str, Decimal] = {}
+        for cur, rate in (static_rates or {}).items():
+            d = _to_decimal(rate)
+            if d is not None:
+                self._static[cur.upper()] = d
+        self._static.setdefault(BASE_CURRENCY, ONE)
+        self._pending: Dict[str, Dict[int, Decimal]] = {}
+        self._ordinals: Dict[str, List[int]] = {}
+        self._rates: Dict[str, List[Decimal]] = {}
+
+    def add(self, currency: str, effective: date, rate) -> bool:
+        """Register a rate effective from `effective`. Call build() when done adding."""
+        d = _to_decimal(rate)
+        if not currency or effective is None or d is None:
+            return False
+        self._pending.setdefault(currency.upper(), {})[effective.toordinal()] = d
+        return True
+
+    def build(self):
+        for cur, by_ordinal in self._pending.items():
+            merged = dict(zip(self._ordinals.get(cur, []), self._rates.get(cur, [])))
+            merged.update(by_ordinal)
+            keys = sorted(merged)
+            self._ordinals[cur] = keys
+            self._rates[cur] = [merged[k] for k in keys]
+        self._pending = {}
+        return self
+
+    def currencies(self) -> List[str]:
+        return sorted(set(self._static) | set(self._ordinals))
+
+    def rate(self, currency: str, on: Optional[date] = None) -> Decimal:
+        """USD per one unit of `currency` on date `on` (latest known rate when `on` is None)."""
+        cur = (currency or BASE_CURRENCY).upper()
+        if cur == BASE_CURRENCY:
+            return ONE
+        ordinals = self._ordinals.get(cur)
+        if ordinals:
+            if on is None:
+                return self._rates[cur][-1]
+            idx = bisect_right(ordinals, on.toordinal()) - 1
+            if idx >= 0:
+                return self._rates[cur][idx]
+        return self._static.get(cur, ONE)
+
+    def factor(self, currency: str, on: Optional[date] = None, base: str = BASE_CURRENCY) -> Decimal:
+        """Multiplier converting `currency` into `base` on a date."""
+        f = self.rate(currency, on)
+        if (base or BASE_CURRENCY).upper() != BASE_CURRENCY:
+            f = f / self.rate(base, on)
+        return f
+
+    def convert(self, amount, currency: str, on: Optional[date] = None, base: str = BASE_CURRENCY) -> Decimal:
+        amt = amount if isinstance(amount, Decimal) else Decimal(str(amount or 0))
+        return (amt * self.factor(currency, on, base)).quantize(CENTS)
+
+    def convert_many(
+        self,
+        amounts: Iterable,
+        currencies: Iterable[str],
+        dates: Optional[Iterable[Optional[date]]] = None,
+        base: str = BASE_CURRENCY,
+    ) -> List[Decimal]:
+        """
+        Convert parallel sequences of amounts/currencies/dates into `base`, rounded to cents.
+        Factors are memoized per (currency, date) within the call, so thousands of rows cost
+        one bisect per distinct pair.
+        """
+        amounts = list(amounts)
+        currencies = list(currencies)
+        dates = list(dates) if dates is not None else [None] * len(amounts)
+        if not (len(amounts) == len(currencies) == len(dates)):
+            raise ValueError("amounts, currencies and dates must have the same length")
+        memo: Dict[tuple, Decimal] = {}
+        out = []
+        for amt, cur, on in zip(amounts, currencies, dates):
+            key = (cur, on)
+            f = memo.get(key)
+            if f is None:
+                f = memo[key] = self.factor(cur, on, base)
+            if not isinstance(amt, Decimal):
+                amt = Decimal(str(amt or 0))
+            out.append((amt * f).quantize(CENTS))
+        return out
+
+
+def _parse_date(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value).strip()[:10])
+    except ValueError:
+        return None
+
+
+def load_feed(store: RateStore, path: str) -> RateStore:
+    """Add every rate in a CSV or JSON feed file to `store` and build the index."""
+    loaded = 0
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            payload = json.load(f)
+        if isinstance(payload, dict):
+            for cur, series in payload.items():
+                for day, rate in (series or {}).items():
+                    loaded += store.add(cur, _parse_date(day), rate)
+        else:
+            for row in payload:
+                loaded += store.add(row.get("currency", ""), _parse_date(row.get("date")), row.get("rate"))
+    else:
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            for row in csv.DictReader(f):
+                loaded += store.add((row.get("currency") or "").strip(), _parse_date(row.get("date")), row.get("rate"))
+    logger.info("Loaded %d exchange rates from %s", loaded, path)
+    return store.build()
+
+
+_store: Optional[RateStore] = None
+_store_stamp = None
+_store_lock = threading.Lock()
+
+
+def get_rate_store() -> RateStore:
+    """Process-wide store; reloaded when settings or the feed file change."""
+    global _store, _store_stamp
+    static_rates = getattr(settings, "EXCHANGE_RATES", {}) or {}
+    feed = getattr(settings, "EXCHANGE_RATES_FEED", "") or ""
+    try:
+        mtime = os.stat(feed).st_mtime if feed else None
+    except OSError:
+        mtime = None
+    stamp = (feed, mtime, tuple(sorted((k, str(v)) for k, v in static_rates.items())))
+    if _store is not None and stamp == _store_stamp:
+        return _store
+    with _store_lock:
+        if _store is None or stamp != _store_stamp:
+            store = RateStore(static_rates)
+            if mtime is not None:
+                try:
+                    load_feed(store, feed)
+                except Exception:
+                    logger.exception("Could not load exchange-rate feed %s", feed)
+            _store, _store_stamp = store.build(), stamp
+            _note_rates(stamp)
+    return _store
+
+
+def _note_rates(stamp):
+    """Bump the global data version when the loaded rates differ from the last ones seen by any process."""
+    key = "exchange_rates_stamp"
+    digest = hashlib.sha1(repr(stamp).encode("utf-8")).hexdigest()
+    try:
+        if cache.get(key) != digest:
+            cache.set(key, digest, timeout=None)
+            bump_data_version()
+    except Exception:
+        logger.exception("Could not record exchange-rate change")
+
+
+def attach_base_amounts(items, base: str = BASE_CURRENCY):
+    """
+    Set `amount_base` on each consumption for reporting in `base`: the original amounts are
+    converted in one batch at the rates effective on each date, the same way for every base
+    (USD included, rather than the amount_usd stored when the expense was saved).
+    """
+    items = list(items)
+    converted = get_rate_store().convert_many(
+        (i.amount for i in items),
+        (i.currency for i in items),
+        (getattr(i, "date", None) for i in items),
+        base=base,
+    )
+    for i, amt in zip(items, converted):
+        i.amount_base = amt
+    return items
@@ -2,10 +2,10 @@ from decimal import Decimal
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 from firebase_client import get_firestore_client
-from django.conf import settings
+from finance_tracker.data_version import bump_data_version
+from finance_tracker import search as search_index
 from dataclasses import dataclass, field
-
-DEFAULT_EXCHANGE_RATES = getattr(settings, "EXCHANGE_RATES", {"USD": 1.0})
+from .exchange_rates import get_rate_store
 
 def _as_decimal(value):
     try:
@@ -30,6 +30,9 @@ class FirestoreModel:
     def from_dict(cls, doc_id: str, data: Dict[str, Any]):
         raise NotImplementedError
 
+    def owner_id(self) -> Optional[str]:
+        return getattr(self, "created_by", None)
+
     def save(self):
         col = self._collection()
         data = self.to_dict()
@@ -42,12 +45,14 @@ class FirestoreModel:
             doc_ref.set(data)
         else:
             col.document(self.pk).set(data)
+        bump_data_version(self.owner_id())
         return self
 
     def delete(self):
         if not self.pk:
             return
         self._collection().document(self.pk).delete()
+        bump_data_version(self.owner_id())
 
     @classmethod
     def get(cls, pk: str):
@@ -71,6 +76,54 @@ class FirestoreModel:
         docs = q.stream()
         return [cls.from_dict(d.id, d.to_dict()) for d in docs]
 
+    @classmethod
+    def query_where(cls, filters, limit: Optional[int] = None) -> List:
+        """AND of (field, op, value) filters; keep them equality-only to avoid composite indexes."""
+        db = get_firestore_client()
+        q = db.collection(cls.collection_name)
+        for f, op, v in filters:
+            q = q.where(f, op, v)
+        if limit:
+            q = q.limit(limit)
+        return [cls.from_dict(d.id, d.to_dict()) for d in q.stream()]
+
+    @classmethod
+    def iter_snapshot_pages(cls, filters=(), page_size: int = 500, start_after: Optional[str] = None, fields=None):
+        """
+        Yield lists of raw document snapshots, ordered by document id, one page per RPC.
+        filters: iterable of (field, op, value). fields: optional projection to cut payload size.
+        start_after: document id to resume after (e.g. from a checkpoint).
+        """
+        db = get_firestore_client()
+        col = db.collection(cls.collection_name)
+        q = col
+        for f, op, v in filters:
+            q = q.where(f, op, v)
+        if fields:
+            q = q.select(list(fields))
+        q = q.order_by("__name__")
+        cursor = None
+        if start_after:
+            cursor = col.document(start_after).get()
+            if not cursor.exists:
+                cursor = None
+                q = q.where("__name__", ">", col.document(start_after))
+        while True:
+            page_q = q.start_after(cursor) if cursor is not None else q
+            page = list(page_q.limit(page_size).stream())
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            cursor = page[-1]
+
+    @classmethod
+    def iter_pages(cls, filters=(), page_size: int = 500, start_after: Optional[str] = None):
+        """Like iter_snapshot_pages, but yields lists of model instances."""
+        for page in cls.iter_snapshot_pages(filters, page_size=page_size, start_after=start_after):
+            yield [cls.from_dict(d.id, d.to_dict()) for d in page]
+
 @dataclass
 class ConsumptionFS(FirestoreModel):
     collection_name: str = field(init=False, default="consumptions")
@@ -136,13 +189,23 @@ class ConsumptionFS(FirestoreModel):
             inst.modified_at = ma
         return inst
 
+    @classmethod
+    def list_by_user_dates(cls, user_id, first: date, last: date, filters=()) -> List:
+        """
+        The user's consumptions dated first..last (inclusive) in one query, plus optional
+        equality filters. Dates are stored as ISO strings, so the range compares as text.
+        created_by equality with a date range needs the composite index in firestore.indexes.json.
+        """
+        db = get_firestore_client()
+        q = db.collection(cls.collection_name).where("created_by", "==", str(user_id))
+        for f, op, v in filters:
+            q = q.where(f, op, v)
+        q = q.where("date", ">=", first.isoformat()).where("date", "<=", last.isoformat())
+        return [cls.from_dict(d.id, d.to_dict()) for d in q.stream()]
+
     def compute_amount_usd(self):
-        rates = getattr(settings, "EXCHANGE_RATES", DEFAULT_EXCHANGE_RATES)
-        try:
-            rate = Decimal(str(rates.get(self.currency, 1)))
-        except Exception:
-            rate = Decimal("1")
-        self.amount_usd = (self.amount * rate).quantize(Decimal("0.01"))
+        # Rate effective on the expense date, so history keeps the rate of its day.
+        self.amount_usd = get_rate_store().convert(self.amount, self.currency, self.date)
 
     def save(self):
         if isinstance(self.amount, (str, float, int)):
@@ -152,4 +215,10 @@ class ConsumptionFS(FirestoreModel):
         if not self.created_at:
             self.created_at = now
         self.modified_at = now
-        return super().save()
\ No newline at end of file
+        super().save()
+        search_index.index_consumption(self)
+        return self
+
+    def delete(self):
+        super().delete()
+        search_index.remove_document(self.created_by, search_index.KIND_CONSUMPTION, self.pk)
\ No newline at end of file
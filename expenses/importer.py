@@ -0,0 +1,217 @@
+"""
+Bulk CSV import of consumptions into Firestore.
+
+Expected header (case-insensitive, any column order):
+    date, amount, currency, type, country, note
+`date` is YYYY-MM-DD (DD/MM/YYYY also accepted); `type` may be spelled `consumption_type` and
+`note` may be `description`. `type` defaults to "other", `country` to the importer's default.
+
+The file is read row by row. Valid rows are buffered into batches of up to 500 (the Firestore
+batch limit); amount_usd is computed per batch with RateStore.convert_many and each batch is a
+single commit, several in flight at once. Rows count as imported once their batch is
+committed; if a batch fails the import stops, the batches already in flight still finish and
+caches are invalidated for whatever was written. With dry_run nothing is written, so the same
+pass doubles as a preview.
+"""
+import csv
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, List, Optional, Tuple
+
+from firebase_client import get_firestore_client
+from finance_tracker.data_version import bump_data_version
+from finance_tracker import search as search_index
+
+from .exchange_rates import get_rate_store
+from .firestore_models import ConsumptionFS
+from .forms import TYPE_CHOICES
+from .models import COUNTRIES, Currency
+
+MAX_BATCH_WRITES = 500
+REQUIRED_COLUMNS = ("date", "amount", "currency")
+COLUMN_ALIASES = {"consumption_type": "type", "description": "note"}
+
+_TYPES = {value for value, _ in TYPE_CHOICES}
+_COUNTRIES = {c.value: c.value for c in COUNTRIES}
+_COUNTRIES.update({c.label.lower(): c.value for c in COUNTRIES})
+
+
+def _parse_day(value: str) -> Optional[date]:
+    value = (value or "").strip()[:10]
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    imported: int = 0
+    error_count: int = 0
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    preview: List[ConsumptionFS] = field(default_factory=list)
+    total_usd: Decimal = Decimal("0.00")
+    elapsed: float = 0.0
+    dry_run: bool = False
+
+
+class ConsumptionImporter:
+    def __init__(
+        self,
+        user_id: str,
+        default_country: str = "",
+        dry_run: bool = False,
+        batch_size: int = MAX_BATCH_WRITES,
+        writers: int = 4,
+        preview_size: int = 20,
+        max_errors: int = 200,
+    ):
+        self.user_id = str(user_id)
+        self.default_country = default_country or ""
+        self.dry_run = dry_run
+        self.batch_size = max(1, min(batch_size, MAX_BATCH_WRITES))
+        self.writers = max(1, writers)
+        self.preview_size = preview_size
+        self.max_errors = max_errors
+        self.result: Optional[ImportResult] = None  # of the last run, also when it raised
+
+    def run(self, lines: Iterable[str]) -> ImportResult:
+        """Import from an iterable of CSV text lines (an open text file, a TextIOWrapper over an upload, ...)."""
+        started = time.perf_counter()
+        result = self.result = ImportResult(dry_run=self.dry_run)
+        reader = csv.DictReader(lines)
+        columns = {self._column(name) for name in (reader.fieldnames or [])}
+        missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+        if missing:
+            self._error(result, 1, f"missing column(s): {', '.join(missing)}")
+            return result
+
+        now = datetime.utcnow()
+        buffer: List[ConsumptionFS] = []
+        in_flight = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.writers) as pool:
+                for line_no, raw in enumerate(reader, start=2):
+                    row = {self._column(k): (v or "").strip() for k, v in raw.items() if k}
+                    if not any(row.values()):
+                        continue
+                    result.rows += 1
+                    parsed = self._parse(row, now)
+                    if isinstance(parsed, str):
+                        self._error(result, line_no, parsed)
+                        continue
+                    buffer.append(parsed)
+                    if len(buffer) >= self.batch_size:
+                        in_flight.append(self._flush(buffer, result, pool))
+                        buffer = []
+                        # Bound memory: wait for the oldest commit once enough are queued.
+                        while len(in_flight) > self.writers * 2:
+                            self._count(in_flight.pop(0).result(), result)
+                if buffer:
+                    in_flight.append(self._flush(buffer, result, pool))
+                while in_flight:
+                    self._count(in_flight.pop(0).result(), result)
+        finally:
+            # After a failure the pool has still waited for the batches in flight; count the
+            # ones that were committed and drop caches for anything written.
+            for fut in in_flight:
+                if not fut.cancelled() and fut.exception() is None:
+                    self._count(fut.result(), result)
+            if result.imported and not self.dry_run:
+                bump_data_version(self.user_id)
+                search_index.invalidate(self.user_id)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+    # --- parsing ---
+
+    @staticmethod
+    def _column(name: str) -> str:
+        name = (name or "").strip().lower()
+        return COLUMN_ALIASES.get(name, name)
+
+    def _parse(self, row, now):
+        day = _parse_day(row.get("date"))
+        if day is None:
+            return f"invalid date {row.get('date')!r}"
+        try:
+            amount = Decimal((row.get("amount") or "").replace(",", ""))
+            if amount.is_finite():
+                amount = amount.quantize(Decimal("0.01"))
+        except InvalidOperation:
+            return f"invalid amount {row.get('amount')!r}"
+        if not amount.is_finite() or amount <= 0:
+            return f"amount must be positive, got {row.get('amount')!r}"
+        currency = (row.get("currency") or "").upper()
+        if currency not in Currency.values:
+            return f"unknown currency {row.get('currency')!r}"
+        ctype = (row.get("type") or "other").lower()
+        if ctype not in _TYPES:
+            return f"unknown type {row.get('type')!r}"
+        country_raw = row.get("country") or ""
+        if country_raw:
+            country = _COUNTRIES.get(country_raw.upper()) or _COUNTRIES.get(country_raw.lower())
+            if country is None:
+                return f"unknown country {country_raw!r}"
+        else:
+            country = self.default_country
+        return ConsumptionFS(
+            pk=str(uuid.uuid4()),
+            date=day,
+            amount=amount,
+            currency=currency,
+            consumption_type=ctype,
+            note=(row.get("note") or "")[:1000],
+            country=country,
+            created_by=self.user_id,
+            created_at=now,
+            modified_at=now,
+            record_status="active",
+        )
+
+    def _error(self, result: ImportResult, line_no: int, message: str):
+        result.error_count += 1
+        if len(result.errors) < self.max_errors:
+            result.errors.append((line_no, message))
+
+    # --- writing ---
+
+    def _flush(self, batch: List[ConsumptionFS], result: ImportResult, pool):
+        converted = get_rate_store().convert_many(
+            (c.amount for c in batch), (c.currency for c in batch), (c.date for c in batch)
+        )
+        for c, usd in zip(batch, converted):
+            c.amount_usd = usd
+        room = self.preview_size - len(result.preview)
+        if room > 0:
+            result.preview.extend(batch[:room])
+        if self.dry_run:
+            return pool.submit(self._totals, batch)
+        return pool.submit(self._commit, batch)
+
+    @staticmethod
+    def _totals(batch: List[ConsumptionFS]) -> Tuple[int, Decimal]:
+        return len(batch), sum((c.amount_usd for c in batch), Decimal("0.00"))
+
+    @staticmethod
+    def _count(totals: Tuple[int, Decimal], result: ImportResult):
+        rows, usd = totals
+        result.imported += rows
+        result.total_usd += usd
+
+    @classmethod
+    def _commit(cls, batch: List[ConsumptionFS]) -> Tuple[int, Decimal]:
+        db = get_firestore_client()
+        col = db.collection(ConsumptionFS.collection_name)
+        wb = db.batch()
+        for c in batch:
+            wb.set(col.document(c.pk), c.to_dict())
+        wb.commit()
+        return cls._totals(batch)
@@ -0,0 +1,170 @@
+"""
+Background PDF report jobs.
+
+Web requests call enqueue_report(), which returns a ReportJob row in the local SQLite database;
+identical requests (same user, parameters and data version) while one is queued, running or
+still downloadable share that job. `manage.py report_worker` processes claim queued jobs with an
+atomic status update, render them with expenses.reports.render_report into
+LOCAL_DATA_DIR/reports, and record progress for the status endpoint. Finished files expire after
+REPORT_JOB_TTL seconds and are purged by the workers.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from finance_tracker.data_version import get_data_version
+
+from .models import ReportJob
+from .reports import ReportParams, render_report
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL = 0.5  # seconds between progress writes
+
+
+def reports_dir():
+    return os.path.join(settings.LOCAL_DATA_DIR, "reports")
+
+
+def job_ttl():
+    return timedelta(seconds=getattr(settings, "REPORT_JOB_TTL", 3600))
+
+
+def job_key(params: ReportParams) -> str:
+    payload = params.to_dict()
+    payload["_versions"] = [get_data_version(params.user_id), get_data_version()]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def enqueue_report(user, params: ReportParams) -> ReportJob:
+    """Return the live job for these parameters, or queue a new one."""
+    key = job_key(params)
+    now = timezone.now()
+    live = (
+        ReportJob.objects.filter(user=user, key=key)
+        .filter(Q(status__in=[ReportJob.Status.QUEUED, ReportJob.Status.RUNNING]) | Q(status=ReportJob.Status.DONE, expires_at__gt=now))
+        .order_by("-created_at")
+    )
+    for job in live:
+        if job.status != ReportJob.Status.DONE or os.path.exists(job.file_path):
+            return job
+    return ReportJob.objects.create(user=user, key=key, params=params.to_dict(), filename=params.filename)
+
+
+def requeue_stale():
+    """Jobs left running by a worker that died go back to the queue (or fail after MAX_ATTEMPTS)."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "REPORT_JOB_TIMEOUT", 600))
+    stale = ReportJob.objects.filter(status=ReportJob.Status.RUNNING, started_at__lt=cutoff)
+    stale.filter(attempts__lt=MAX_ATTEMPTS).update(status=ReportJob.Status.QUEUED, message="Retrying")
+    stale.update(status=ReportJob.Status.FAILED, message="Timed out", finished_at=timezone.now())
+
+
+def claim_next():
+    """Atomically move the oldest queued job to running; None when the queue is empty."""
+    candidates = ReportJob.objects.filter(status=ReportJob.Status.QUEUED).order_by("created_at").values_list("pk", flat=True)[:10]
+    for pk in candidates:
+        claimed = ReportJob.objects.filter(pk=pk, status=ReportJob.Status.QUEUED).update(
+            status=ReportJob.Status.RUNNING,
+            started_at=timezone.now(),
+            attempts=F("attempts") + 1,
+            progress=0,
+        )
+        if claimed:
+            return ReportJob.objects.get(pk=pk)
+    return None
+
+
+def _finish(job, path):
+    now = timezone.now()
+    ReportJob.objects.filter(pk=job.pk).update(
+        status=ReportJob.Status.DONE,
+        progress=100,
+        message="",
+        file_path=path,
+        finished_at=now,
+        expires_at=now + job_ttl(),
+    )
+
+
+def run_job(job: ReportJob):
+    # A duplicate queued before the first one finished can reuse its file.
+    twin = (
+        ReportJob.objects.filter(key=job.key, status=ReportJob.Status.DONE, expires_at__gt=timezone.now())
+        .exclude(pk=job.pk).first()
+    )
+    if twin and os.path.exists(twin.file_path):
+        _finish(job, twin.file_path)
+        return
+
+    os.makedirs(reports_dir(), exist_ok=True)
+    path = os.path.join(reports_dir(), f"{job.pk}.pdf")
+    tmp = path + ".part"
+    last_write = [0.0]
+
+    def progress(pct, message):
+        now = time.monotonic()
+        if pct < 100 and now - last_write[0] < PROGRESS_INTERVAL:
+            return
+        last_write[0] = now
+        ReportJob.objects.filter(pk=job.pk).update(progress=min(pct, 99), message=message[:255])
+
+    try:
+        with open(tmp, "wb") as f:
+            render_report(ReportParams.from_dict(job.params), f, progress)
+        os.replace(tmp, path)
+    except Exception as e:
+        logger.exception("Report job %s failed", job.pk)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        retry = job.attempts < MAX_ATTEMPTS
+        ReportJob.objects.filter(pk=job.pk).update(
+            status=ReportJob.Status.QUEUED if retry else ReportJob.Status.FAILED,
+            message=str(e)[:255],
+            finished_at=None if retry else timezone.now(),
+        )
+        return
+    _finish(job, path)
+
+
+def purge_expired():
+    """Delete expired report files and old finished rows."""
+    now = timezone.now()
+    expired = ReportJob.objects.filter(
+        Q(status=ReportJob.Status.DONE, expires_at__lt=now)
+        | Q(status=ReportJob.Status.FAILED, finished_at__lt=now - job_ttl())
+    )
+    in_use = set(
+        ReportJob.objects.filter(status=ReportJob.Status.DONE, expires_at__gte=now).values_list("file_path", flat=True)
+    )
+    removed = 0
+    for job in expired.only("pk", "file_path"):
+        if job.file_path and job.file_path not in in_use and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        job.delete()
+        removed += 1
+    return removed
+
+
+def work(poll: float = 1.0, once: bool = False, purge_every: float = 60.0):
+    """Worker loop: claim and run jobs until the queue is empty (once) or forever."""
+    last_purge = 0.0
+    while True:
+        if time.monotonic() - last_purge > purge_every:
+            requeue_stale()
+            purge_expired()
+            last_purge = time.monotonic()
+        job = claim_next()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll)
+            continue
+        run_job(job)
@@ -0,0 +1,74 @@
+"""
+Compare chart rendering strategies for a yearly report.
+Run: python manage.py benchmark_charts --months 12 --countries 3 --workers 4
+
+Builds the donut specs of a synthetic report (one chart per month per country) plus the yearly
+stacked bar, then times rendering them one by one in this process against rendering them in a
+process pool. The chart cache is bypassed, so every run renders everything.
+"""
+import multiprocessing
+import random
+import time
+from calendar import month_name
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from expenses.charts import donut_spec, render_chart, stacked_bar_spec
+
+CATEGORIES = ["Market", "Transport", "Food", "Other"]
+COUNTRY_CODES = ["LB", "SA", "AE", "FR", "US", "GB"]
+
+
+def build_specs(months, countries, year=2025, seed=7):
+    rng = random.Random(seed)
+    specs = []
+    stacked = {c: [0.0] * months for c in CATEGORIES}
+    for m in range(1, months + 1):
+        for country in COUNTRY_CODES[:countries]:
+            values = [rng.uniform(20, 900) for _ in CATEGORIES]
+            for c, v in zip(CATEGORIES, values):
+                stacked[c][m - 1] += v
+            specs.append(donut_spec(f"{month_name[m]} {year} • {country}", CATEGORIES, values))
+    specs.append(stacked_bar_spec(
+        "Monthly Totals (Stacked)",
+        [month_name[m][:3] for m in range(1, months + 1)],
+        [(c, stacked[c]) for c in CATEGORIES],
+        ylabel="USD",
+    ))
+    return specs
+
+
+class Command(BaseCommand):
+    help = "Benchmark sequential vs process-pool chart rendering"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", type=int, default=12)
+        parser.add_argument("--countries", type=int, default=3)
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--repeat", type=int, default=3, help="Best of N runs")
+
+    def handle(self, *args, **opts):
+        specs = build_specs(max(1, min(opts["months"], 12)), max(1, min(opts["countries"], len(COUNTRY_CODES))))
+        workers = max(2, opts["workers"])
+        self.stdout.write(f"{len(specs)} charts, best of {opts['repeat']} run(s)")
+
+        render_chart(specs[0])  # warm up fonts and caches in this process
+        sequential = self._best(opts["repeat"], lambda: [render_chart(s) for s in specs])
+        self.stdout.write(f"sequential:           {sequential * 1000:8.1f} ms")
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(render_chart, specs[:workers]))  # start and warm up the workers
+            chunk = max(1, len(specs) // (workers * 4))
+            parallel = self._best(opts["repeat"], lambda: list(pool.map(render_chart, specs, chunksize=chunk)))
+        self.stdout.write(f"process pool ({workers}):     {parallel * 1000:8.1f} ms")
+        self.stdout.write(self.style.SUCCESS(f"speed-up: {sequential / parallel:.2f}x"))
+
+    @staticmethod
+    def _best(repeat, fn):
+        best = float("inf")
+        for _ in range(max(1, repeat)):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        return best
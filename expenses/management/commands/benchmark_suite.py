@@ -0,0 +1,73 @@
+"""
+Benchmark the dashboards and the PDF report against synthetic data in an in-memory Firestore.
+Run: python manage.py benchmark_suite [--sizes 1000,10000,100000] [--output bench.json] [--compare old.json]
+
+Scenarios: expenses_dashboard, budgeting_dashboard, report_pdf (see finance_tracker/benchmarks.py).
+Writes JSON with latency percentiles, per-phase medians and peak memory per scenario and size;
+--compare prints the p50 change against an earlier result file.
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from finance_tracker.benchmarks import SCENARIOS, SIZES, compare, run_suite
+
+
+def _int_list(value):
+    try:
+        return [int(v.replace("_", "")) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise CommandError(f"Not a comma-separated list of numbers: {value}")
+
+
+class Command(BaseCommand):
+    help = "Benchmark report generation and dashboard aggregation on synthetic data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default=",".join(str(s) for s in SIZES), help="Dataset sizes (consumptions and transactions)")
+        parser.add_argument("--scenario", action="append", dest="scenarios", choices=sorted(SCENARIOS), help="Repeatable; default all")
+        parser.add_argument("--repeat", type=int, default=5, help="Timed runs per scenario and size")
+        parser.add_argument("--warmup", type=int, default=1)
+        parser.add_argument("--year", type=int, default=2025)
+        parser.add_argument("--month", type=int, default=6)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--chart-backend", choices=["vector", "raster"], help="Default: REPORT_CHART_BACKEND")
+        parser.add_argument("--output", help="Write the JSON result here instead of stdout")
+        parser.add_argument("--compare", help="Earlier result file to compare p50 latencies against")
+
+    def handle(self, *args, **opts):
+        if opts["repeat"] < 1:
+            raise CommandError("--repeat must be at least 1")
+        if not 1 <= opts["month"] <= 12:
+            raise CommandError("--month must be 1-12")
+        baseline = None
+        if opts["compare"]:
+            try:
+                with open(opts["compare"], encoding="utf-8") as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Cannot read {opts['compare']}: {e}")
+
+        result = run_suite(
+            sizes=_int_list(opts["sizes"]),
+            scenarios=opts["scenarios"] or list(SCENARIOS),
+            repeat=opts["repeat"],
+            warmup=max(0, opts["warmup"]),
+            year=opts["year"],
+            month=opts["month"],
+            seed=opts["seed"],
+            chart_backend=opts["chart_backend"],
+            log=lambda msg: self.stderr.write(f"running {msg}"),
+        )
+        payload = json.dumps(result, indent=2)
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as f:
+                f.write(payload + "\n")
+            self.stderr.write(self.style.SUCCESS(f"Wrote {opts['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        if baseline is not None:
+            for scenario, size, before, after, change in compare(result, baseline):
+                delta = f"{change:+.1f}%" if change is not None else "n/a"
+                self.stderr.write(f"{scenario:<22} {size:>8,}  p50 {before:10.1f} ms -> {after:10.1f} ms  {delta}")
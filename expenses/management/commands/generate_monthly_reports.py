@@ -0,0 +1,207 @@
+"""
+Pre-build every active user's monthly expense report.
+Run: python manage.py generate_monthly_reports --year 2025 --month 9 [--output bucket] [--resume]
+
+Pipeline: users are read from the auth table in id order; each user's month is fetched from
+Firestore on a bounded thread pool (--fetch-concurrency), rendered to PDF in a spawned
+ProcessPoolExecutor (--processes) and, with --output bucket, uploaded to the storage bucket.
+Fetches are only started while fewer than 2 x processes reports wait for rendering, so memory
+stays bounded however many users there are.
+
+Output goes to LOCAL_DATA_DIR/monthly_reports/YYYY-MM/ (or --dir):
+- <user_id>.pdf (removed after upload with --output bucket)
+- progress.jsonl: one line per finished user; it is the checkpoint read by --resume, which
+  skips users already done and retries failed ones (fetch, render or upload errors)
+- manifest.json: written at the end from progress.jsonl
+"""
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date, datetime
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.models import Currency
+from expenses.reports import ReportParams, fetch_period_items, init_render_worker, render_report_file
+
+
+def _previous_month(today):
+    return (today.year - 1, 12) if today.month == 1 else (today.year, today.month - 1)
+
+
+class Command(BaseCommand):
+    help = "Render monthly PDF reports for all active users (process pool, resumable)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int)
+        parser.add_argument("--month", type=int, help="Defaults to the previous calendar month")
+        parser.add_argument("--user", action="append", dest="users", help="Only these user ids (repeatable)")
+        parser.add_argument("--base", default="USD", help="Reporting currency")
+        parser.add_argument("--fetch-concurrency", type=int, default=8)
+        parser.add_argument("--processes", type=int, default=os.cpu_count() or 2)
+        parser.add_argument("--output", choices=["local", "bucket"], default="local")
+        parser.add_argument("--dir", help="Output directory (default LOCAL_DATA_DIR/monthly_reports/YYYY-MM)")
+        parser.add_argument("--prefix", default="reports", help="Bucket path prefix")
+        parser.add_argument("--skip-empty", action="store_true", help="No report for users without expenses that month")
+        parser.add_argument("--resume", action="store_true", help="Skip users already in progress.jsonl")
+
+    def handle(self, *args, **opts):
+        default_year, default_month = _previous_month(date.today())
+        year = opts["year"] or default_year
+        month = opts["month"] or default_month
+        if not 1 <= month <= 12:
+            raise CommandError("--month must be 1-12")
+        base = opts["base"].upper()
+        if base not in Currency.values:
+            raise CommandError(f"--base must be one of {', '.join(Currency.values)}")
+        self.period = f"{year}-{month:02d}"
+        self.out_dir = opts["dir"] or os.path.join(settings.LOCAL_DATA_DIR, "monthly_reports", self.period)
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.progress_path = os.path.join(self.out_dir, "progress.jsonl")
+        self.bucket = None
+        if opts["output"] == "bucket":
+            from firebase_client import get_storage_bucket
+            self.bucket = get_storage_bucket()
+        self.prefix = f"{opts['prefix'].strip('/')}/{self.period}"
+
+        done = self._load_progress() if opts["resume"] else {}
+        if not opts["resume"] and os.path.exists(self.progress_path):
+            os.remove(self.progress_path)
+        users = get_user_model().objects.filter(is_active=True).order_by("pk")
+        if opts["users"]:
+            users = users.filter(pk__in=opts["users"])
+        queue = deque(
+            ReportParams(
+                user_id=str(u.pk),
+                year=year,
+                month=month,
+                base_currency=base,
+                extractor_name=u.get_full_name() or u.username,
+            )
+            for u in users.iterator()
+            if str(u.pk) not in done
+        )
+        self.stdout.write(f"{self.period}: {len(queue)} user(s) to render, {len(done)} already done")
+        self.counts = {"ok": 0, "empty": 0, "failed": 0}
+        started = time.perf_counter()
+        self._run(queue, opts["skip_empty"], max(1, opts["fetch_concurrency"]), max(1, opts["processes"]), started)
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self._write_manifest()
+        self.stdout.write(self.style.SUCCESS(
+            f"{self.counts['ok']} report(s), {self.counts['empty']} empty skipped, {self.counts['failed']} failed "
+            f"in {elapsed:.1f}s ({self.counts['ok'] / elapsed:.2f} reports/s). Manifest: {self._manifest_path()}"
+        ))
+
+    def _run(self, queue, skip_empty, fetch_n, processes, started):
+        fetching, rendering, uploading = {}, {}, {}
+        render_limit = processes * 2
+        with ThreadPoolExecutor(max_workers=fetch_n) as io_pool, ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_render_worker,
+        ) as render_pool:
+            while queue or fetching or rendering or uploading:
+                while queue and len(fetching) < fetch_n and len(fetching) + len(rendering) < render_limit + fetch_n:
+                    params = queue.popleft()
+                    fetching[io_pool.submit(fetch_period_items, params)] = params
+                finished, _ = wait(list(fetching) + list(rendering) + list(uploading), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    if fut in fetching:
+                        params = fetching.pop(fut)
+                        try:
+                            items = fut.result()
+                        except Exception as e:
+                            self._record(params, "failed", error=f"fetch: {e}")
+                            continue
+                        if not items and skip_empty:
+                            self._record(params, "empty")
+                            continue
+                        path = os.path.join(self.out_dir, f"{params.user_id}.pdf")
+                        rendering[render_pool.submit(render_report_file, params.to_dict(), items, path)] = (params, path)
+                    elif fut in rendering:
+                        params, path = rendering.pop(fut)
+                        try:
+                            summary = fut.result()
+                        except Exception as e:
+                            self._record(params, "failed", error=f"render: {e}")
+                            continue
+                        if self.bucket is not None:
+                            uploading[io_pool.submit(self._upload, params, path)] = (params, summary)
+                        else:
+                            self._record(params, "ok", file=os.path.basename(path), **summary)
+                    else:
+                        params, summary = uploading.pop(fut)
+                        try:
+                            blob_name = fut.result()
+                        except Exception as e:
+                            self._record(params, "failed", error=f"upload: {e}")
+                            continue
+                        self._record(params, "ok", blob=blob_name, **summary)
+                    total = sum(self.counts.values())
+                    if total and total % 100 == 0:
+                        elapsed = max(time.perf_counter() - started, 1e-9)
+                        self.stdout.write(f"  {total} done ({self.counts['ok'] / elapsed:.2f} reports/s)")
+
+    def _upload(self, params, path):
+        blob_name = f"{self.prefix}/{params.user_id}.pdf"
+        blob = self.bucket.blob(blob_name)
+        blob.upload_from_filename(path, content_type="application/pdf")
+        os.remove(path)
+        return blob_name
+
+    # --- progress / manifest ---
+
+    def _record(self, params, status, **fields):
+        self.counts[status] += 1
+        entry = {"user_id": params.user_id, "status": status, "at": datetime.utcnow().isoformat(timespec="seconds")}
+        entry.update(fields)
+        with open(self.progress_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        if status == "failed":
+            self.stderr.write(f"user {params.user_id}: {fields.get('error')}")
+
+    def _load_progress(self):
+        """Latest entry per user; failed users are retried on resume."""
+        entries = {}
+        try:
+            with open(self.progress_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line after a crash
+                    entries[entry["user_id"]] = entry
+        except OSError:
+            return {}
+        return {uid: e for uid, e in entries.items() if e.get("status") != "failed"}
+
+    def _manifest_path(self):
+        return os.path.join(self.out_dir, "manifest.json")
+
+    def _write_manifest(self):
+        entries = {}
+        try:
+            with open(self.progress_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    entries[entry["user_id"]] = entry
+        except OSError:
+            pass
+        manifest = {
+            "period": self.period,
+            "generated_at": datetime.utcnow().isoformat(timespec="seconds"),
+            "storage": "bucket" if self.bucket is not None else "local",
+            "reports": sorted(entries.values(), key=lambda e: e["user_id"]),
+        }
+        tmp = self._manifest_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, self._manifest_path())
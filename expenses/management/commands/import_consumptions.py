@@ -0,0 +1,62 @@
+"""
+Import expenses for one user from a CSV file.
+Run: python manage.py import_consumptions history.csv --user alice --country LB [--dry-run]
+
+Columns: date, amount, currency, type, country, note (see expenses/importer.py).
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.importer import MAX_BATCH_WRITES, ConsumptionImporter
+from expenses.models import COUNTRIES
+
+
+class Command(BaseCommand):
+    help = "Bulk import consumptions from CSV into Firestore (batched writes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file")
+        parser.add_argument("--user", required=True, help="Username or user id that owns the expenses")
+        parser.add_argument("--country", default="", help="Country code for rows without one")
+        parser.add_argument("--batch-size", type=int, default=MAX_BATCH_WRITES)
+        parser.add_argument("--writers", type=int, default=4, help="Concurrent batch commits")
+        parser.add_argument("--dry-run", action="store_true", help="Validate and convert without writing")
+
+    def handle(self, *args, **opts):
+        User = get_user_model()
+        ident = opts["user"]
+        user = User.objects.filter(username=ident).first()
+        if user is None and ident.isdigit():
+            user = User.objects.filter(pk=int(ident)).first()
+        if user is None:
+            raise CommandError(f"No user {ident!r}")
+        country = (opts["country"] or "").upper()
+        if country and country not in COUNTRIES.values:
+            raise CommandError(f"--country must be one of {', '.join(COUNTRIES.values)}")
+
+        importer = ConsumptionImporter(
+            user.id,
+            default_country=country,
+            dry_run=opts["dry_run"],
+            batch_size=opts["batch_size"],
+            writers=opts["writers"],
+            preview_size=5,
+        )
+        try:
+            with open(opts["path"], newline="", encoding="utf-8-sig", errors="replace") as f:
+                result = importer.run(f)
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for line_no, message in result.errors:
+            self.stderr.write(f"line {line_no}: {message}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... {result.error_count - len(result.errors)} more errors")
+        for c in result.preview:
+            self.stdout.write(f"  {c.date} {c.consumption_type:<9} {c.amount} {c.currency} -> ${c.amount_usd} {c.note[:40]}")
+        verb = "Would import" if result.dry_run else "Imported"
+        rate = result.rows / max(result.elapsed, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.imported} of {result.rows} rows (${result.total_usd:,.2f}), "
+            f"{result.error_count} rejected, in {result.elapsed:.1f}s ({rate:,.0f} rows/s)."
+        ))
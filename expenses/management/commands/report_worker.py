@@ -0,0 +1,47 @@
+"""
+Process queued PDF report jobs (expenses.jobs).
+Run: python manage.py report_worker --workers 2
+
+Each worker is a separate process (matplotlib's pyplot state is per process), claiming jobs from
+the ReportJob table. --once drains the queue and exits, e.g. from cron.
+"""
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from expenses import jobs
+
+
+def _worker(poll, once):
+    connections.close_all()  # never share the parent's SQLite connection
+    jobs.work(poll=poll, once=once)
+
+
+class Command(BaseCommand):
+    help = "Render queued PDF reports in a pool of worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--poll", type=float, default=1.0, help="Seconds between queue polls when idle")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+
+    def handle(self, *args, **opts):
+        workers = max(1, opts["workers"])
+        self.stdout.write(f"Report worker: {workers} process(es), reports in {jobs.reports_dir()}")
+        if workers == 1:
+            jobs.work(poll=opts["poll"], once=opts["once"])
+            return
+        connections.close_all()
+        procs = [
+            multiprocessing.Process(target=_worker, args=(opts["poll"], opts["once"]))
+            for _ in range(workers)
+        ]
+        for proc in procs:
+            proc.start()
+        try:
+            for proc in procs:
+                proc.join()
+        except KeyboardInterrupt:
+            for proc in procs:
+                proc.terminate()
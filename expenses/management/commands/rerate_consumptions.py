@@ -0,0 +1,239 @@
+"""
+Recompute stored amount_usd after exchange rates change.
+Run: python manage.py rerate_consumptions --currency LBP --from 2024-01-01 --to 2024-12-31
+
+Streams `consumptions` documents page by page (cursor pagination on document id, projected to
+the fields needed), recomputes amount_usd with the date-effective rate in exact Decimal math and
+writes only changed values back with batched partial updates. DjangoConsumption rows are
+re-rated with bulk_update. Progress is checkpointed after every committed page so an
+interrupted run continues with --resume.
+
+The owners of every committed page get their data version bumped and their search index
+dropped right away. The checkpoint also lists every user whose amounts may have been
+rewritten, and --resume refreshes them first, so a crash between a commit and that refresh
+is repaired too.
+"""
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.exchange_rates import CENTS, get_rate_store
+from expenses.firestore_models import ConsumptionFS, _as_decimal
+from expenses.models import DjangoConsumption
+from finance_tracker.data_version import bump_data_version
+from finance_tracker import search as search_index
+from firebase_client import get_firestore_client
+
+MAX_BATCH_WRITES = 500
+
+
+def _parse_day(value, flag):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"{flag} must be YYYY-MM-DD, got {value!r}")
+
+
+class Command(BaseCommand):
+    help = "Recompute amount_usd on consumptions (Firestore and Django) with the current exchange rates"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--currency", action="append", help="Currency to re-rate (repeatable). Default: all non-USD.")
+        parser.add_argument("--from", dest="date_from", help="First expense date (YYYY-MM-DD), inclusive")
+        parser.add_argument("--to", dest="date_to", help="Last expense date (YYYY-MM-DD), inclusive")
+        parser.add_argument("--page-size", type=int, default=MAX_BATCH_WRITES)
+        parser.add_argument("--writers", type=int, default=4, help="Concurrent batch commits")
+        parser.add_argument("--checkpoint", default=os.path.join(settings.LOCAL_DATA_DIR, "rerate_checkpoint.json"))
+        parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint file")
+        parser.add_argument("--dry-run", action="store_true", help="Count changes without writing")
+        parser.add_argument("--skip-django", action="store_true", help="Only re-rate Firestore documents")
+
+    def handle(self, *args, **opts):
+        self.store = get_rate_store()
+        self.date_from = _parse_day(opts["date_from"], "--from")
+        self.date_to = _parse_day(opts["date_to"], "--to")
+        currencies = [c.upper() for c in (opts["currency"] or [])] or [c for c in self.store.currencies() if c != "USD"]
+        self.page_size = max(1, min(opts["page_size"], MAX_BATCH_WRITES))
+        self.dry_run = opts["dry_run"]
+        self.checkpoint_path = opts["checkpoint"]
+        state = self._load_checkpoint() if opts["resume"] else {}
+        self._refresh_users(state.get("touched", []))
+
+        started = time.perf_counter()
+        scanned = updated = 0
+        for cur in currencies:
+            if state.get("done", {}).get(cur):
+                self.stdout.write(f"{cur}: already done (checkpoint)")
+                continue
+            s, u = self._rerate_firestore(cur, state, opts["writers"])
+            scanned += s
+            updated += u
+            if not opts["skip_django"]:
+                s, u = self._rerate_django(cur, state)
+                scanned += s
+                updated += u
+            state.setdefault("done", {})[cur] = True
+            state.pop("cursor", None)
+            self._save_checkpoint(state)
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned}, {'would update' if self.dry_run else 'updated'} {updated} "
+            f"in {elapsed:.1f}s ({scanned / elapsed:,.0f} docs/s)."
+        ))
+        if not self.dry_run and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    # --- Firestore ---
+
+    def _in_range(self, day):
+        if day is None:
+            return False
+        if self.date_from and day < self.date_from:
+            return False
+        if self.date_to and day > self.date_to:
+            return False
+        return True
+
+    def _rerate_firestore(self, currency, state, writers):
+        db = get_firestore_client()
+        col = db.collection(ConsumptionFS.collection_name)
+        start_after = state.get("cursor", {}).get(currency)
+        factors = {}
+        scanned = updated = 0
+        t0 = time.perf_counter()
+        # (future, last_doc_id, owners) in page order, so the checkpoint never skips an uncommitted page
+        pending = deque()
+
+        def advance(in_flight):
+            # Record finished pages in order; block on the oldest while more than `in_flight` are queued.
+            while pending and (len(pending) > in_flight or pending[0][0].done()):
+                fut, last_id, users = pending.popleft()
+                fut.result()
+                self._refresh_users(users)
+                state.setdefault("cursor", {})[currency] = last_id
+                self._save_checkpoint(state)
+
+        with ThreadPoolExecutor(max_workers=max(1, writers)) as pool:
+            pages = ConsumptionFS.iter_snapshot_pages(
+                [("currency", "==", currency)],
+                page_size=self.page_size,
+                start_after=start_after,
+                fields=["date", "amount", "amount_usd", "created_by"],
+            )
+            for page in pages:
+                changes = []
+                users = set()
+                for snap in page:
+                    data = snap.to_dict() or {}
+                    try:
+                        day = date.fromisoformat(data.get("date") or "")
+                    except ValueError:
+                        day = None
+                    if not self._in_range(day):
+                        continue
+                    f = factors.get(day)
+                    if f is None:
+                        f = factors[day] = self.store.factor(currency, day)
+                    new_usd = (_as_decimal(data.get("amount", "0")) * f).quantize(CENTS)
+                    if _as_decimal(data.get("amount_usd", "0")) != new_usd:
+                        changes.append((snap.id, str(new_usd)))
+                        if data.get("created_by"):
+                            users.add(data["created_by"])
+                scanned += len(page)
+                updated += len(changes)
+                if changes and not self.dry_run:
+                    self._note_touched(state, users)
+                    pending.append((pool.submit(self._commit, db, col, changes), page[-1].id, users))
+                else:
+                    pending.append((pool.submit(lambda: None), page[-1].id, ()))
+                advance(writers * 2)
+                elapsed = max(time.perf_counter() - t0, 1e-9)
+                self.stdout.write(f"{currency}: scanned {scanned}, changed {updated} ({scanned / elapsed:,.0f} docs/s)")
+            advance(0)
+        return scanned, updated
+
+    @staticmethod
+    def _commit(db, col, changes):
+        batch = db.batch()
+        for doc_id, amount_usd in changes:
+            batch.update(col.document(doc_id), {"amount_usd": amount_usd})
+        batch.commit()
+
+    # --- Django ORM ---
+
+    def _rerate_django(self, currency, state):
+        qs = DjangoConsumption.objects.filter(currency=currency)
+        if self.date_from:
+            qs = qs.filter(date__gte=self.date_from)
+        if self.date_to:
+            qs = qs.filter(date__lte=self.date_to)
+        qs = qs.only("pk", "date", "amount", "amount_usd", "created_by_id").order_by("pk")
+        scanned = 0
+        changed = []
+        total_changed = 0
+        for row in qs.iterator(chunk_size=2000):
+            scanned += 1
+            new_usd = self.store.convert(row.amount or Decimal("0"), currency, row.date)
+            if row.amount_usd != new_usd:
+                row.amount_usd = new_usd
+                changed.append(row)
+            if len(changed) >= 2000:
+                total_changed += self._flush_django(changed, state)
+                changed = []
+        total_changed += self._flush_django(changed, state)
+        if scanned:
+            self.stdout.write(f"{currency}: {scanned} Django rows scanned, {total_changed} changed")
+        return scanned, total_changed
+
+    def _flush_django(self, rows, state):
+        if rows and not self.dry_run:
+            users = {str(row.created_by_id) for row in rows if row.created_by_id}
+            self._note_touched(state, users)
+            # bulk_update skips post_save, so the Firestore copy is handled by the Firestore pass.
+            DjangoConsumption.objects.bulk_update(rows, ["amount_usd"], batch_size=500)
+            self._refresh_users(users)
+        return len(rows)
+
+    # --- Cached views of the rewritten users ---
+
+    def _note_touched(self, state, users):
+        """Record users before their amounts are written, so --resume can refresh them."""
+        touched = set(state.get("touched", []))
+        if not users <= touched:
+            state["touched"] = sorted(touched | users)
+            self._save_checkpoint(state)
+
+    def _refresh_users(self, users):
+        if self.dry_run:
+            return
+        for uid in users:
+            bump_data_version(uid)
+            search_index.invalidate(uid)  # indexed amounts are amount_usd
+
+    # --- Checkpoint ---
+
+    def _load_checkpoint(self):
+        try:
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_checkpoint(self, state):
+        if self.dry_run:
+            return
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
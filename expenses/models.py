@@ -3,6 +3,8 @@ from django.conf import settings
 from decimal import Decimal
 from django.utils import timezone
 from zoneinfo import ZoneInfo
+import uuid
+from .exchange_rates import get_rate_store
 
 class Currency(models.TextChoices):
     USD = "USD", "US Dollar"
@@ -84,14 +86,39 @@ class DjangoConsumption(models.Model):
         }
 
     def save(self, *args, **kwargs):
-        rates = getattr(settings, 'EXCHANGE_RATES', {}) or {}
-        try:
-            rate = Decimal(str(rates.get(self.currency, 1)))
-        except Exception:
-            rate = Decimal('1')
         amt = self.amount if isinstance(self.amount, Decimal) else Decimal(self.amount or 0)
-        self.amount_usd = (amt * rate).quantize(Decimal('0.01'))
+        self.amount_usd = get_rate_store().convert(amt, self.currency, self.date)
         super().save(*args, **kwargs)
 
     def __str__(self):
-        return f"{self.date}: {self.amount} {self.currency} - {self.get_consumption_type_display()}"
\ No newline at end of file
+        return f"{self.date}: {self.amount} {self.currency} - {self.get_consumption_type_display()}"
+
+class ReportJob(models.Model):
+    """Queued PDF report; processed by `manage.py report_worker` (see expenses/jobs.py)."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='report_jobs')
+    key = models.CharField(max_length=64, db_index=True, help_text="Hash of user, parameters and data version")
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED, db_index=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    message = models.CharField(max_length=255, blank=True, default='')
+    file_path = models.CharField(max_length=500, blank=True, default='')
+    filename = models.CharField(max_length=200, blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.filename or self.key[:12]} ({self.status})"
@@ -0,0 +1,576 @@
+"""
+PDF expense reports (dashboard "Download report").
+
+render_report() draws the whole document for a ReportParams into any binary file object. It is
+used both synchronously by the dashboard_pdf view and by the background report workers
+(expenses/jobs.py), which write into LOCAL_DATA_DIR/reports. Charts are vector drawings by
+default; REPORT_CHART_BACKEND = "raster" embeds matplotlib PNGs instead.
+
+Scope "range" covers any span of months across years (render_range_report): expenses are
+aggregated page by page while reading Firestore and charts are drawn one at a time.
+"""
+import io
+import os
+from calendar import month_name, monthrange
+from dataclasses import asdict, dataclass
+from datetime import date, datetime
+from typing import Callable, Optional, Tuple
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from .chart_cache import get_chart_cache
+from .charts import donut_spec, render_chart, render_charts, stacked_bar_spec
+from .vector_charts import draw_chart
+from .exchange_rates import attach_base_amounts
+from .firestore_models import ConsumptionFS
+from .models import Currency
+
+SCOPES = ("month", "months", "year", "range")
+CHART_BACKENDS = ("vector", "raster")
+MAX_RANGE_YEARS = 20  # longest span accepted for scope "range"
+
+
+def chart_backend():
+    """"vector": reportlab.graphics drawn on the canvas; "raster": cached matplotlib PNGs."""
+    backend = getattr(settings, "REPORT_CHART_BACKEND", "vector")
+    return backend if backend in CHART_BACKENDS else "vector"
+
+
+def _parse_year_month(value, default):
+    """"YYYY-MM" (as sent by <input type="month">) -> (year, month)."""
+    try:
+        year, month = (int(part) for part in (value or "").split("-"))
+    except ValueError:
+        return default
+    return (year, month) if 1 <= month <= 12 and 1900 <= year <= 9999 else default
+
+
+@dataclass(frozen=True)
+class ReportParams:
+    user_id: str
+    year: int
+    month: int
+    scope: str = "month"
+    months: Tuple[int, ...] = ()
+    base_currency: str = "USD"
+    extractor_name: str = ""
+    end_year: int = 0  # scope "range": last month of the span (year/month is the first)
+    end_month: int = 0
+
+    @classmethod
+    def from_request(cls, request):
+        """Parameters from the dashboard form; ValueError when a range spans over MAX_RANGE_YEARS."""
+        now = datetime.now()
+        try:
+            month = int(request.GET.get("month", now.month))
+            year = int(request.GET.get("year", now.year))
+        except ValueError:
+            month, year = now.month, now.year
+        if not 1 <= month <= 12:
+            month = now.month
+        scope = request.GET.get("scope", "month").lower()
+        if scope not in SCOPES:
+            scope = "month"
+        months = tuple(sorted({
+            int(m) for m in request.GET.getlist("months")
+            if str(m).isdigit() and 1 <= int(m) <= 12
+        }))
+        base = (request.GET.get("base") or "USD").upper()
+        end_year, end_month = 0, 0
+        if scope == "range":
+            (year, month), (end_year, end_month) = sorted([
+                _parse_year_month(request.GET.get("from"), (year, 1)),
+                _parse_year_month(request.GET.get("to"), (year, month)),
+            ])
+            if (end_year - year) * 12 + end_month - month >= MAX_RANGE_YEARS * 12:
+                raise ValueError(f"Report ranges are limited to {MAX_RANGE_YEARS} years.")
+        return cls(
+            user_id=str(request.user.id),
+            year=year,
+            month=month,
+            scope=scope,
+            months=months if scope == "months" else (),
+            base_currency=base if base in Currency.values else "USD",
+            extractor_name=request.user.get_full_name() or request.user.username,
+            end_year=end_year,
+            end_month=end_month,
+        )
+
+    def to_dict(self):
+        d = asdict(self)
+        d["months"] = list(self.months)
+        return d
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data["months"] = tuple(data.get("months") or ())
+        return cls(**data)
+
+    @property
+    def selected_months(self) -> bool:
+        return self.scope == "months" and bool(self.months)
+
+    def period_months(self):
+        """Months covered by the report, in order."""
+        if self.scope == "year":
+            return list(range(1, 13))
+        if self.selected_months:
+            return list(self.months)
+        return [self.month]
+
+    def period(self):
+        """(year, month) pairs covered by the report, in order."""
+        if self.scope != "range":
+            return [(self.year, m) for m in self.period_months()]
+        first = self.year * 12 + self.month - 1
+        last = self.end_year * 12 + self.end_month - 1
+        return [(i // 12, i % 12 + 1) for i in range(first, last + 1)]
+
+    @property
+    def title(self):
+        if self.scope == "range":
+            return "Multi-Period Expense Report"
+        if self.scope == "year":
+            return "Yearly Expense Report"
+        if self.selected_months:
+            return "Selected Months Report"
+        return "Monthly Expense Report"
+
+    @property
+    def subtitle(self):
+        if self.scope == "range":
+            return f"{month_name[self.month][:3]} {self.year} – {month_name[self.end_month][:3]} {self.end_year}"
+        if self.scope == "year":
+            return f"{self.year}"
+        if self.selected_months:
+            return f"{', '.join(month_name[m][:3] for m in self.months)} {self.year}"
+        return f"{month_name[self.month]} {self.year}"
+
+    @property
+    def filename(self):
+        if self.scope == "range":
+            return f"Finance_Dashboard_{self.year}-{self.month:02d}_to_{self.end_year}-{self.end_month:02d}.pdf"
+        if self.scope == "year":
+            return f"Finance_Dashboard_Year_{self.year}.pdf"
+        if self.selected_months:
+            labels = "-".join(month_name[m][:3] for m in self.months)
+            return f"Finance_Dashboard_Selected_{labels}_{self.year}.pdf"
+        return f"Finance_Dashboard_{month_name[self.month]}_{self.year}.pdf"
+
+
+def fetch_period_items(params: ReportParams):
+    """Active consumptions of the report months; only their date span is read from Firestore."""
+    months = set(params.period())
+    (first_year, first_month), (last_year, last_month) = min(months), max(months)
+    items = ConsumptionFS.list_by_user_dates(
+        params.user_id,
+        date(first_year, first_month, 1),
+        date(last_year, last_month, monthrange(last_year, last_month)[1]),
+    )
+    period_items = [
+        i for i in items
+        if i.record_status == "active"
+        and getattr(i, "date", None) is not None
+        and (i.date.year, i.date.month) in months
+    ]
+    return attach_base_amounts(period_items, params.base_currency)
+
+
+class ReportCanvas:
+    """
+    A4 report canvas with the shared header band, footer and layout helpers.
+
+    Charts are placed one at a time: `image` may be a pre-rendered ImageReader (raster batch),
+    otherwise the chart is drawn as vectors or, for the raster backend, rendered through the
+    chart cache right before it is placed and released afterwards.
+    """
+
+    def __init__(self, out, params: ReportParams, extracted_at: str):
+        self.params = params
+        self.vector = chart_backend() == "vector"
+        self.p = canvas.Canvas(out, pagesize=A4, pageCompression=1)
+        self.width, self.height = A4
+        self.margin_x, self.margin_y = 25 * mm, 20 * mm
+        self.header_h = 22 * mm
+        p, width, height = self.p, self.width, self.height
+        margin_x, margin_y, header_h = self.margin_x, self.margin_y, self.header_h
+
+        # Header band and footer are the same on every page: define them once as form XObjects.
+        p.beginForm("footer")
+        p.setStrokeColor(colors.lightgrey)
+        p.setLineWidth(0.5)
+        p.line(margin_x, margin_y + 10, width - margin_x, margin_y + 10)
+        p.setFont("Helvetica", 8)
+        p.drawString(margin_x, margin_y, f"Generated by: {params.extractor_name}")
+        p.drawRightString(width - margin_x, margin_y, f"Extracted: {extracted_at}")
+        p.endForm()
+
+        p.beginForm("header")
+        p.setFillColorRGB(0.12, 0.44, 0.71)  # dark blue
+        p.rect(0, height - header_h, width, header_h, fill=1, stroke=0)
+        p.setFillColor(colors.white)
+        p.setFont("Helvetica-Bold", 18)
+        p.drawString(margin_x, height - header_h + 8, "Finance Tracker")
+        p.setFont("Helvetica", 10)
+        p.drawRightString(width - margin_x, height - header_h + 12, params.title)
+        p.drawRightString(width - margin_x, height - header_h + 2, extracted_at)
+        p.endForm()
+
+    @property
+    def top(self):
+        return self.height - self.margin_y
+
+    def footer(self):
+        self.p.doForm("footer")
+
+    def new_page(self):
+        self.footer()
+        self.p.showPage()
+        return self.top
+
+    def ensure_space(self, y, needed):
+        """Start a new page when less than `needed` points are left above the footer."""
+        return self.new_page() if y - needed < self.margin_y + 40 else y
+
+    def place_chart(self, spec, x, y, w, h, image=None):
+        if self.vector:
+            draw_chart(self.p, spec, x, y, w, h)
+            return
+        if image is None:
+            image = ImageReader(io.BytesIO(get_chart_cache().get_or_render(spec, render_chart)))
+        self.p.drawImage(image, x, y, w, h, mask="auto")
+
+    def title_block(self, total, count, base_currency):
+        """Header band, subtitle and summary box on the first page; returns the y below them."""
+        p, width, margin_x = self.p, self.width, self.margin_x
+        p.doForm("header")
+        y = self.height - self.header_h - 15
+        p.setFillColor(colors.black)
+        p.setFont("Helvetica-Bold", 13)
+        p.drawString(margin_x, y, self.params.subtitle)
+        y -= 20
+
+        p.setFillColor(colors.whitesmoke)
+        p.roundRect(margin_x, y - 30, width - 2 * margin_x, 30, 6, fill=1, stroke=1)
+        p.setFillColor(colors.black)
+        p.setFont("Helvetica-Bold", 11)
+        p.drawString(margin_x + 10, y - 12, f"Total Expenses: {total:,.2f} {base_currency}")
+        p.setFont("Helvetica", 10)
+        p.drawString(margin_x + 10, y - 24, f"Number of Records: {count}")
+        return y - 50
+
+    def section_heading(self, y, text):
+        y = self.ensure_space(y, 30)
+        self.p.setFillColor(colors.black)
+        self.p.setFont("Helvetica-Bold", 12)
+        self.p.drawString(self.margin_x, y - 12, text)
+        return y - 24
+
+    def wide_chart(self, y, spec, image=None):
+        chart_w, chart_h = 170 * mm, 70 * mm
+        y = self.ensure_space(y, chart_h)
+        chart_y = y - chart_h
+        self.place_chart(spec, (self.width - chart_w) / 2, chart_y, chart_w, chart_h, image)
+        return chart_y - 16
+
+    def breakdown_table(self, start_y, breakdown_totals, overall_total, title="Breakdown"):
+        p, width, margin_x = self.p, self.width, self.margin_x
+        y_local = start_y
+        if not breakdown_totals or overall_total <= 0:
+            return y_local
+        p.setFont("Helvetica-Bold", 10)
+        p.drawString(margin_x, y_local, title)
+        y_local -= 12
+        p.setFont("Helvetica-Bold", 9)
+        p.drawString(margin_x, y_local, "Type")
+        p.drawRightString(width - margin_x - 80, y_local, "Amount")
+        p.drawRightString(width - margin_x, y_local, "%")
+        y_local -= 10
+        p.setStrokeColor(colors.grey)
+        p.line(margin_x, y_local, width - margin_x, y_local)
+        y_local -= 12
+        p.setFont("Helvetica", 9)
+        for label, amt in breakdown_totals.items():
+            percent = (amt / overall_total) * 100
+            p.drawString(margin_x, y_local, label)
+            p.drawRightString(width - margin_x - 80, y_local, f"{amt:,.2f}")
+            p.drawRightString(width - margin_x, y_local, f"{percent:.1f}%")
+            y_local -= 12
+            if y_local < self.margin_y + 50:
+                y_local = self.new_page()
+                p.setFont("Helvetica", 9)
+        return y_local
+
+    def chart_grid(self, y, charts):
+        """
+        Donut charts two per row, each row followed by the breakdown of its right-hand chart
+        (and of the last chart when the count is odd). `charts` may be a generator.
+        """
+        gap = 8 * mm
+        chart_w = (self.width - 2 * self.margin_x - gap) / 2
+        chart_h = 70 * mm
+        col = 0
+        chart_y = y
+        chart_meta = None
+        for chart_meta in charts:
+            if col == 0:
+                chart_y = y - chart_h
+                if chart_y < self.margin_y + 40:
+                    y = self.new_page()
+                    chart_y = y - chart_h
+            chart_x = self.margin_x + col * (chart_w + gap)
+            self.place_chart(chart_meta["spec"], chart_x, chart_y, chart_w, chart_h, chart_meta.get("image"))
+            if col == 1:
+                y = chart_y - 10
+                y = self.breakdown_table(y, chart_meta["totals"], chart_meta["total"], title="Breakdown")
+                y -= 10
+            col = (col + 1) % 2
+        if col == 1:
+            y = chart_y - 10
+            y = self.breakdown_table(y, chart_meta["totals"], chart_meta["total"], title="Breakdown")
+            y -= 10
+        return y
+
+    def save(self):
+        self.footer()
+        self.p.save()
+
+
+def render_report(
+    params: ReportParams,
+    out,
+    progress: Optional[Callable[[int, str], None]] = None,
+    items=None,
+    chart_workers: Optional[int] = None,
+):
+    """
+    Write the PDF report for `params` into the binary file object `out`.
+    `items`: the period's consumptions with amount_base set (fetch_period_items); fetched when omitted.
+    `chart_workers`: processes for raster charts (0 renders inline); CHART_RENDER_PROCESSES when omitted.
+    """
+    if params.scope == "range":
+        return render_range_report(params, out, progress)
+    report = progress or (lambda pct, msg: None)
+    report(5, "Loading expenses")
+    period_items = fetch_period_items(params) if items is None else items
+    base_currency = params.base_currency
+    total_usd = sum([float(i.amount_base) for i in period_items]) if period_items else 0.0
+    total_count = len(period_items)
+
+    totals = {}
+    for i in period_items:
+        key = (i.consumption_type or "other").capitalize()
+        totals[key] = totals.get(key, 0.0) + float(i.amount_base)
+
+    # --- Monthly Charts (one per country per month) ---
+    report(20, "Rendering charts")
+    monthly_charts = []
+    months_for_charts = params.period_months()
+    for m in months_for_charts:
+        month_items = [i for i in period_items if i.date.month == m]
+        items_by_country = {}
+        for i in month_items:
+            country = (getattr(i, "country", "") or "Unknown").upper()
+            items_by_country.setdefault(country, []).append(i)
+        for country_code, items in items_by_country.items():
+            month_totals = {}
+            for i in items:
+                key = (i.consumption_type or "other").capitalize()
+                month_totals[key] = month_totals.get(key, 0.0) + float(i.amount_base)
+            if not month_totals:
+                continue
+            labels = list(month_totals.keys())
+            monthly_charts.append({
+                "spec": donut_spec(
+                    f"{month_name[m]} {params.year} • {country_code}",
+                    labels,
+                    [month_totals[k] for k in labels],
+                ),
+                "totals": month_totals,
+                "total": sum(month_totals.values()),
+            })
+
+    # --- Yearly Chart (stacked bar) ---
+    yearly_spec = None
+    if params.scope in ("year", "months"):
+        months_for_chart = params.months if params.selected_months else list(range(1, 13))
+        month_totals = {m: 0.0 for m in months_for_chart}
+        for item in period_items:
+            month_num = item.date.month
+            if month_num in month_totals:
+                month_totals[month_num] += float(item.amount_base)
+        month_labels = [month_name[m][:3] for m in months_for_chart]
+        month_values = [month_totals[m] for m in months_for_chart]
+        category_order = []
+        category_totals = {}
+        for item in period_items:
+            month_num = item.date.month
+            if month_num not in month_totals:
+                continue
+            key = (item.consumption_type or "other").capitalize()
+            if key not in category_totals:
+                category_totals[key] = {m: 0.0 for m in months_for_chart}
+                category_order.append(key)
+            category_totals[key][month_num] += float(item.amount_base)
+        if any(month_values):
+            yearly_spec = stacked_bar_spec(
+                "Monthly Totals (Stacked)",
+                month_labels,
+                [(key, [category_totals[key][m] for m in months_for_chart]) for key in category_order],
+                ylabel=base_currency,
+            )
+
+    yearly_image = None
+    if chart_backend() == "raster":
+        # All charts of the report in one batch: cache hits reused, misses rendered in parallel.
+        specs = [c["spec"] for c in monthly_charts] + ([yearly_spec] if yearly_spec else [])
+        images = [ImageReader(io.BytesIO(png)) for png in render_charts(specs, chart_workers)]
+        for chart_meta, image in zip(monthly_charts, images):
+            chart_meta["image"] = image
+        yearly_image = images[-1] if yearly_spec else None
+
+    # --- PDF ---
+    report(85, "Writing PDF")
+    doc = ReportCanvas(out, params, datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC"))
+    y = doc.title_block(total_usd, total_count, base_currency)
+    if yearly_spec:
+        y = doc.wide_chart(y, yearly_spec, yearly_image)
+        y = doc.breakdown_table(y, totals, total_usd, title="Yearly Breakdown")
+        y -= 10
+    doc.chart_grid(y, monthly_charts)
+    doc.save()
+    report(100, "Done")
+    return out
+
+
+# --- multi-year reports ---
+
+class PeriodAggregate:
+    """Running totals of a report period, filled page by page so no consumption is kept."""
+
+    def __init__(self, period):
+        self.period = list(period)
+        self._in_period = set(self.period)
+        self._months_by_year = {}  # year -> months of the period in that year, in order
+        for y, m in self.period:
+            self._months_by_year.setdefault(y, []).append(m)
+        self.total = 0.0
+        self.count = 0
+        self.types = {}
+        self.months = {}  # (year, month) -> {country: {type: amount}}
+
+    def add(self, items):
+        for i in items:
+            amount = float(i.amount_base)
+            key = (i.consumption_type or "other").capitalize()
+            country = (getattr(i, "country", "") or "Unknown").upper()
+            by_type = self.months.setdefault((i.date.year, i.date.month), {}).setdefault(country, {})
+            by_type[key] = by_type.get(key, 0.0) + amount
+            self.types[key] = self.types.get(key, 0.0) + amount
+            self.total += amount
+            self.count += 1
+
+    def in_period(self, item):
+        d = getattr(item, "date", None)
+        return item.record_status == "active" and d is not None and (d.year, d.month) in self._in_period
+
+    def years(self):
+        return sorted(self._months_by_year)
+
+    def year_spec(self, year, base_currency):
+        """Stacked monthly totals by type for the months of `year` inside the period, or None."""
+        months = self._months_by_year.get(year, [])
+        series = {}
+        for m in months:
+            for by_type in self.months.get((year, m), {}).values():
+                for key, amt in by_type.items():
+                    series.setdefault(key, dict.fromkeys(months, 0.0))[m] += amt
+        if not series:
+            return None, {}
+        year_totals = {key: sum(values.values()) for key, values in series.items()}
+        spec = stacked_bar_spec(
+            f"{year} Monthly Totals (Stacked)",
+            [month_name[m][:3] for m in months],
+            [(key, [values[m] for m in months]) for key, values in series.items()],
+            ylabel=base_currency,
+        )
+        return spec, year_totals
+
+    def month_charts(self, year):
+        """Donut chart metas for each month and country of `year`, built only when consumed."""
+        for m in self._months_by_year.get(year, []):
+            for country_code, by_type in self.months.get((year, m), {}).items():
+                labels = list(by_type)
+                yield {
+                    "spec": donut_spec(f"{month_name[m]} {year} • {country_code}", labels, [by_type[k] for k in labels]),
+                    "totals": by_type,
+                    "total": sum(by_type.values()),
+                }
+
+
+def aggregate_period(params: ReportParams, page_size: int = 500) -> PeriodAggregate:
+    """Stream the user's consumptions page by page into a PeriodAggregate."""
+    agg = PeriodAggregate(params.period())
+    for page in ConsumptionFS.iter_pages([("created_by", "==", params.user_id)], page_size=page_size):
+        agg.add(attach_base_amounts([i for i in page if agg.in_period(i)], params.base_currency))
+    return agg
+
+
+def render_range_report(params: ReportParams, out, progress: Optional[Callable[[int, str], None]] = None):
+    """
+    Multi-year report (scope "range"): totals are aggregated while paging through Firestore and
+    each chart is built, drawn and dropped in turn, so memory depends on the number of
+    (month, country, type) totals rather than on the number of records or charts.
+    """
+    report = progress or (lambda pct, msg: None)
+    report(5, "Loading expenses")
+    agg = aggregate_period(params)
+    base_currency = params.base_currency
+
+    report(20, "Writing PDF")
+    doc = ReportCanvas(out, params, datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC"))
+    y = doc.title_block(agg.total, agg.count, base_currency)
+    y = doc.breakdown_table(y, agg.types, agg.total, title="Period Breakdown")
+    y -= 10
+    years = agg.years()
+    for idx, year in enumerate(years):
+        year_spec, year_totals = agg.year_spec(year, base_currency)
+        if year_spec is None:
+            continue
+        y = doc.section_heading(y, str(year))
+        y = doc.wide_chart(y, year_spec)
+        y = doc.breakdown_table(y, year_totals, sum(year_totals.values()), title=f"{year} Breakdown")
+        y -= 10
+        y = doc.chart_grid(y, agg.month_charts(year))
+        report(20 + int(75 * (idx + 1) / len(years)), f"Wrote {year}")
+    doc.save()
+    report(100, "Done")
+    return out
+
+
+# --- batch rendering in worker processes ---
+
+def init_render_worker():
+    """ProcessPoolExecutor initializer for spawned report renderers."""
+    import django
+    django.setup()
+
+
+def render_report_file(params_dict, items, path):
+    """Render one report to `path` (atomically); returns a small summary for manifests."""
+    params = ReportParams.from_dict(params_dict)
+    tmp = f"{path}.part"
+    with open(tmp, "wb") as f:
+        render_report(params, f, items=items, chart_workers=0)  # already in a pool; charts inline
+    os.replace(tmp, path)
+    return {
+        "bytes": os.path.getsize(path),
+        "records": len(items),
+        "total": round(sum(float(i.amount_base) for i in items), 2),
+    }
@@ -3,6 +3,8 @@ from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import DjangoConsumption
 from firebase_client import get_firestore_client
+from finance_tracker.data_version import bump_data_version
+from finance_tracker import search as search_index
 from firebase_admin import firestore
 import logging
 
@@ -15,6 +17,8 @@ def sync_consumption_to_firestore(sender, instance, **kwargs):
         db = get_firestore_client()
         if db:
             db.collection("consumptions").document(str(instance.pk)).set(instance.to_dict())
+            bump_data_version(instance.created_by_id and str(instance.created_by_id))
+            search_index.invalidate(instance.created_by_id and str(instance.created_by_id))
     except Exception as e:
         logger.exception("Failed to sync consumption %s to Firestore: %s", instance.pk, e)
 
@@ -24,6 +28,8 @@ def delete_consumption_from_firestore(sender, instance, **kwargs):
         db = get_firestore_client()
         if db:
             db.collection("consumptions").document(str(instance.pk)).delete()
+            bump_data_version(instance.created_by_id and str(instance.created_by_id))
+            search_index.invalidate(instance.created_by_id and str(instance.created_by_id))
     except Exception as e:
         logger.exception("Failed to delete consumption %s from Firestore: %s", instance.pk, e)
 
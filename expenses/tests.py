@@ -1,3 +1,546 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from finance_tracker import search as search_index
+from finance_tracker.data_version import bump_data_version, get_data_version, user_data_etag
+from finance_tracker.export import csv_response, xlsx_response
+from finance_tracker.listing import ListQuery
+from finance_tracker.memory_firestore import WriteBatch
+from finance_tracker.testing import LOCMEM_CACHE, LocalDataDirMixin, MemoryFirestoreMixin
+
+from . import charts, jobs
+from .chart_cache import ChartCache, DiskLRU, MemoryLRU, chart_key
+from .exchange_rates import RateStore, attach_base_amounts, get_rate_store
+from .firestore_models import ConsumptionFS
+from .importer import ConsumptionImporter
+from .models import ReportJob
+from .reports import MAX_RANGE_YEARS, PeriodAggregate, ReportParams, fetch_period_items
+from .views import _import_upload_path, _purge_import_uploads, report_download, report_status
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class UserDataEtagTests(SimpleTestCase):
+    def request(self, csrf="secret-a", user_pk=1):
+        request = RequestFactory().get("/list/", {"month": "3"})
+        request.user = SimpleNamespace(pk=user_pk, is_authenticated=True)
+        SessionMiddleware(lambda r: None).process_request(request)
+        MessageMiddleware(lambda r: None).process_request(request)
+        request.META["CSRF_COOKIE"] = csrf
+        return request
+
+    def test_stable_until_data_changes(self):
+        etag = user_data_etag(self.request())
+        self.assertEqual(user_data_etag(self.request()), etag)
+        bump_data_version("1")
+        self.assertNotEqual(user_data_etag(self.request()), etag)
+
+    def test_depends_on_user_and_csrf_secret(self):
+        etag = user_data_etag(self.request())
+        self.assertNotEqual(user_data_etag(self.request(csrf="secret-b")), etag)
+        self.assertNotEqual(user_data_etag(self.request(user_pk=2)), etag)
+
+    def test_no_etag_while_messages_are_pending(self):
+        request = self.request()
+        messages.info(request, "Saved.")
+        self.assertIsNone(user_data_etag(request))
+        self.assertEqual(len(list(messages.get_messages(request))), 1)  # still shown afterwards
+
+
+class RateStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = RateStore({"EUR": "1.10", "LBP": "0.00002"})
+        self.store.add("EUR", date(2025, 1, 1), "1.05")
+        self.store.add("EUR", date(2025, 6, 1), "1.20")
+        self.store.build()
+
+    def test_dated_rate_applies_until_the_next_entry(self):
+        self.assertEqual(self.store.rate("EUR", date(2025, 1, 1)), Decimal("1.05"))
+        self.assertEqual(self.store.rate("EUR", date(2025, 5, 31)), Decimal("1.05"))
+        self.assertEqual(self.store.rate("EUR", date(2025, 6, 1)), Decimal("1.20"))
+        self.assertEqual(self.store.rate("EUR"), Decimal("1.20"))
+
+    def test_static_rate_before_first_entry_and_for_unlisted_currencies(self):
+        self.assertEqual(self.store.rate("EUR", date(2024, 12, 31)), Decimal("1.10"))
+        self.assertEqual(self.store.rate("lbp", date(2025, 3, 1)), Decimal("0.00002"))
+        self.assertEqual(self.store.rate("USD", date(2025, 3, 1)), Decimal("1"))
+
+    def test_cross_rates_and_batch_conversion(self):
+        self.assertEqual(self.store.convert(Decimal("10"), "USD", date(2025, 7, 1), base="EUR"), Decimal("8.33"))
+        self.assertEqual(
+            self.store.convert_many(["100", "100"], ["EUR", "EUR"], [date(2025, 2, 1), date(2025, 7, 1)]),
+            [Decimal("105.00"), Decimal("120.00")],
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHE, EXCHANGE_RATES={"EUR": "1.10"}, EXCHANGE_RATES_FEED="")
+class AttachBaseAmountsTests(SimpleTestCase):
+    def item(self):
+        # amount_usd as stored with an older rate; reports must not mix it with fresh conversions
+        return SimpleNamespace(amount=Decimal("100"), currency="EUR", date=date(2025, 1, 1), amount_usd=Decimal("99"))
+
+    def test_every_base_is_converted_from_the_original_amount(self):
+        self.assertEqual(attach_base_amounts([self.item()])[0].amount_base, Decimal("110.00"))
+        self.assertEqual(attach_base_amounts([self.item()], "EUR")[0].amount_base, Decimal("100.00"))
+
+    def test_rate_change_bumps_global_data_version(self):
+        get_rate_store()
+        before = get_data_version()
+        with self.settings(EXCHANGE_RATES={"EUR": "1.12"}):
+            get_rate_store()
+        self.assertNotEqual(get_data_version(), before)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, EXCHANGE_RATES={"SAR": "0.25"}, EXCHANGE_RATES_FEED="")
+class RerateConsumptionsTests(MemoryFirestoreMixin, LocalDataDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.db.load("consumptions", {
+            f"c{i}": ConsumptionFS(date=day, amount=Decimal("100"), currency="SAR", amount_usd=Decimal("20"), created_by=uid).to_dict()
+            for i, (day, uid) in enumerate([(date(2025, 1, 5), "u1"), (date(2025, 2, 5), "u1"), (date(2025, 3, 5), "u2")])
+        })
+
+    def rerate(self, *args):
+        call_command("rerate_consumptions", "--currency", "SAR", "--skip-django", "--page-size", "1", *args, stdout=io.StringIO())
+
+    def amounts(self):
+        return [self.db.collection("consumptions").document(f"c{i}").get().to_dict()["amount_usd"] for i in range(3)]
+
+    def test_date_range_and_owner_refresh(self):
+        versions = get_data_version("u1"), get_data_version("u2")
+        self.rerate("--from", "2025-02-01", "--to", "2025-03-31")
+        self.assertEqual(self.amounts(), ["20", "25.00", "25.00"])
+        self.assertNotEqual(get_data_version("u1"), versions[0])
+        self.assertNotEqual(get_data_version("u2"), versions[1])
+        self.assertFalse(os.path.exists(os.path.join(settings.LOCAL_DATA_DIR, "rerate_checkpoint.json")))
+
+    def test_dry_run_writes_nothing(self):
+        version = get_data_version("u1")
+        self.rerate("--dry-run")
+        self.assertEqual(self.amounts(), ["20", "20", "20"])
+        self.assertEqual(get_data_version("u1"), version)
+
+    def test_resume_continues_after_the_cursor_and_refreshes_touched_users(self):
+        checkpoint = os.path.join(settings.LOCAL_DATA_DIR, "rerate_checkpoint.json")
+        with open(checkpoint, "w", encoding="utf-8") as f:
+            json.dump({"cursor": {"SAR": "c1"}, "touched": ["u1"]}, f)
+        version = get_data_version("u1")
+        with mock.patch.object(search_index, "invalidate") as invalidate:
+            self.rerate("--resume")
+        self.assertEqual(self.amounts(), ["20", "20", "25.00"])
+        self.assertNotEqual(get_data_version("u1"), version)  # written before the interruption
+        self.assertEqual(sorted(c.args[0] for c in invalidate.call_args_list), ["u1", "u2"])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SearchIndexTests(MemoryFirestoreMixin, LocalDataDirMixin, SimpleTestCase):
+    def consumption(self, pk, note, day=date(2025, 3, 2), amount="12.50"):
+        self.db.load("consumptions", {pk: ConsumptionFS(
+            date=day, amount=Decimal(amount), amount_usd=Decimal(amount), note=note, created_by="7",
+        ).to_dict()})
+
+    def ids(self, query, **filters):
+        return [hit["id"] for hit in search_index.search("7", query, **filters)]
+
+    def test_built_on_first_search_with_and_prefix_matching(self):
+        self.consumption("a", "Café Nero coffee")
+        self.consumption("b", "Coffee beans from the market")
+        self.consumption("c", "Train ticket")
+        self.assertEqual(sorted(self.ids("coff")), ["a", "b"])
+        self.assertEqual(self.ids("cafe coffee"), ["a"])  # accents folded, every term required
+        self.assertEqual(self.ids("coffee", min_amount=20), [])
+
+    def test_model_hooks_update_an_existing_index(self):
+        self.consumption("a", "Coffee")
+        self.assertEqual(self.ids("coffee"), ["a"])
+        c = ConsumptionFS.get("a")
+        c.note = "Groceries"
+        c.save()
+        self.assertEqual(self.ids("coffee"), [])
+        self.assertEqual(self.ids("groceries"), ["a"])
+        c.delete()
+        self.assertEqual(self.ids("groceries"), [])
+
+    def test_invalidate_rebuilds_from_firestore(self):
+        self.consumption("a", "Coffee")
+        self.assertEqual(self.ids("coffee"), ["a"])
+        self.consumption("b", "Coffee again")  # bypasses the model hooks
+        self.assertEqual(self.ids("coffee"), ["a"])
+        search_index.invalidate("7")
+        self.assertEqual(sorted(self.ids("coffee")), ["a", "b"])
+
+    def test_batch_applies_hook_changes_with_one_write(self):
+        self.consumption("a", "Coffee")
+        self.assertEqual(self.ids("coffee"), ["a"])
+        with mock.patch.object(search_index, "_store", wraps=search_index._store) as store:
+            with search_index.batch():
+                for n in range(5):
+                    ConsumptionFS(pk=f"n{n}", date=date(2025, 3, 3), amount=Decimal("1"), note="Coffee refill", created_by="7").save()
+                self.assertEqual(self.ids("refill"), [])  # applied when the block ends
+        self.assertEqual(store.call_count, 1)
+        self.assertEqual(len(self.ids("refill")), 5)
+
+
+class ListQueryTests(MemoryFirestoreMixin, SimpleTestCase):
+    SORT_OPTIONS = {
+        "-amount": ("amount_usd", True, Decimal("0")),
+        "date": ("date", False, date.min),
+    }
+
+    def query(self, **params):
+        return ListQuery.from_params(
+            params,
+            equality={"type": ("consumption_type", ["market", "transport"]), "currency": ("currency", None)},
+            sort_options=self.SORT_OPTIONS,
+            default_sort="date",
+            amount_attr="amount_usd",
+            text_attr="note",
+        )
+
+    def test_only_allowed_equality_filters_are_pushed_down(self):
+        q = self.query(type="bogus", currency="EUR", min="5", q="bread", sort="nope")
+        self.assertEqual(q.pushdown(), [("currency", "==", "EUR")])
+        self.assertEqual(q.sort, "date")
+        self.assertEqual(q.querystring(), "currency=EUR&min=5.0&q=bread&sort=date")
+
+    def test_pushdown_then_residual_filters_and_sort(self):
+        rows = {
+            "a": ("market", "EUR", "4.00", "Bread"),
+            "b": ("market", "EUR", "9.00", "bread and milk"),
+            "c": ("market", "USD", "30.00", "Bread"),
+            "d": ("transport", "EUR", "20.00", "Bread bus"),
+        }
+        for pk, (kind, currency, amount, note) in rows.items():
+            self.db.load("consumptions", {pk: ConsumptionFS(
+                date=date(2025, 1, 1), consumption_type=kind, currency=currency, amount=Decimal(amount),
+                amount_usd=Decimal(amount), note=note, created_by="7",
+            ).to_dict()})
+        q = self.query(type="market", currency="EUR", min="5", q="BREAD", sort="-amount")
+        fetched = ConsumptionFS.query_where([("created_by", "==", "7")] + q.pushdown())
+        self.assertEqual(sorted(c.pk for c in fetched), ["a", "b"])
+        self.assertEqual([c.pk for c in q.apply(fetched)], ["b"])
+        self.assertEqual([c.pk for c in self.query(sort="-amount").apply(ConsumptionFS.query_where([]))], ["c", "d", "b", "a"])
+
+    def test_month_range_query_with_residual_equality(self):
+        for pk, (day, kind) in {"a": (date(2025, 1, 31), "market"), "b": (date(2025, 2, 1), "market"),
+                                "c": (date(2025, 1, 1), "transport")}.items():
+            self.db.load("consumptions", {pk: ConsumptionFS(date=day, consumption_type=kind, created_by="7").to_dict()})
+        fetched = ConsumptionFS.list_by_user_dates("7", date(2025, 1, 1), date(2025, 1, 31))
+        self.assertEqual(sorted(c.pk for c in fetched), ["a", "c"])
+        self.assertEqual([c.pk for c in self.query(type="market").apply(fetched, check_equals=True)], ["a"])
+        self.assertEqual(len(self.query(type="market").apply(fetched)), 2)  # equality left to Firestore
+
+
+class ExportTests(SimpleTestCase):
+    def test_csv_cells_never_start_a_formula(self):
+        response = csv_response("x", ["note", "amount"], [["=HYPERLINK(\"http://evil\")", Decimal("-3.50")], ["@SUM(A1)", 1], ["plain", None]])
+        body = b"".join(response.streaming_content).decode("utf-8").lstrip("\ufeff")
+        self.assertEqual(list(csv.reader(io.StringIO(body))), [
+            ["note", "amount"], ["'=HYPERLINK(\"http://evil\")", "-3.50"], ["'@SUM(A1)", "1"], ["plain", ""],
+        ])
+
+    def test_xlsx_strings_are_not_formulas(self):
+        try:
+            import xlsxwriter  # noqa: F401
+        except ImportError:
+            self.skipTest("xlsxwriter not installed")
+        response = xlsx_response("x", ["note"], [["=1+1"]])
+        with zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content))) as xlsx:
+            sheet = xlsx.read("xl/worksheets/sheet1.xml").decode("utf-8")
+        self.assertNotIn("<f>", sheet)
+
+
+@override_settings(CACHES=LOCMEM_CACHE, EXCHANGE_RATES={"SAR": "0.25"}, EXCHANGE_RATES_FEED="")
+class ImporterTests(MemoryFirestoreMixin, SimpleTestCase):
+    def lines(self, count):
+        return ["date,amount,currency,note"] + [f"2025-01-{i % 28 + 1:02d},10,SAR,row {i}" for i in range(count)]
+
+    def test_import_and_preview(self):
+        preview = ConsumptionImporter("7", dry_run=True, batch_size=10).run(self.lines(25) + ["bad,1,SAR,x"])
+        self.assertEqual((preview.imported, preview.error_count, preview.total_usd), (25, 1, Decimal("62.50")))
+        self.assertEqual(self.db.count("consumptions"), 0)
+        result = ConsumptionImporter("7", batch_size=10).run(self.lines(25))
+        self.assertEqual(result.imported, 25)
+        self.assertEqual(self.db.count("consumptions"), 25)
+
+    def test_unrepresentable_amounts_reject_only_their_row(self):
+        rows = ["date,amount,currency", "2025-01-02,1e30,SAR", "2025-01-02,0.001,SAR", "2025-01-02,inf,SAR",
+                "2025-01-02,NaN,SAR", "2025-01-03,4.005,SAR"]
+        result = ConsumptionImporter("7").run(rows)
+        self.assertEqual((result.imported, result.error_count), (1, 4))
+        self.assertEqual(result.preview[0].amount, Decimal("4.00"))
+
+    def test_failed_batch_counts_only_committed_rows_and_still_invalidates(self):
+        commit, calls = WriteBatch.commit, []
+
+        def flaky_commit(batch):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("unavailable")
+            commit(batch)
+
+        before = get_data_version("7")
+        importer = ConsumptionImporter("7", batch_size=10, writers=1)
+        with mock.patch.object(WriteBatch, "commit", flaky_commit), self.assertRaises(RuntimeError):
+            importer.run(self.lines(50))
+        self.assertEqual(importer.result.imported, self.db.count("consumptions"))
+        self.assertLess(importer.result.imported, 50)
+        self.assertNotEqual(get_data_version("7"), before)
+
+
+class ReportRangeTests(SimpleTestCase):
+    def params(self, start, end):
+        request = RequestFactory().get("/dashboard/pdf/", {"scope": "range", "from": start, "to": end})
+        request.user = SimpleNamespace(id=7, username="u", get_full_name=lambda: "")
+        return ReportParams.from_request(request)
+
+    def test_range_limit(self):
+        params = self.params("2025-12", f"{2025 - MAX_RANGE_YEARS + 1}-01")  # given in either order
+        self.assertEqual(len(params.period()), MAX_RANGE_YEARS * 12)
+        self.assertEqual(params.period()[0], (2025 - MAX_RANGE_YEARS + 1, 1))
+        with self.assertRaises(ValueError):
+            self.params("1900-01", "9999-12")
+
+    def test_period_aggregate_by_year(self):
+        agg = PeriodAggregate(self.params("2024-11", "2025-02").period())
+        agg.add([
+            SimpleNamespace(amount_base=Decimal("5"), consumption_type="market", country="lb", date=date(2024, 12, 3)),
+            SimpleNamespace(amount_base=Decimal("7"), consumption_type="transport", country="", date=date(2025, 2, 1)),
+        ])
+        self.assertEqual(agg.years(), [2024, 2025])
+        spec, totals = agg.year_spec(2024, "USD")
+        self.assertEqual(totals, {"Market": 5.0})
+        self.assertEqual(spec["x_labels"], ["Nov", "Dec"])
+        self.assertEqual([c["totals"] for c in agg.month_charts(2025)], [{"Transport": 7.0}])
+
+
+@override_settings(CACHES=LOCMEM_CACHE, EXCHANGE_RATES_FEED="")
+class FetchPeriodItemsTests(MemoryFirestoreMixin, SimpleTestCase):
+    def test_only_the_report_months_are_fetched(self):
+        rows = [(date(2025, 1, 31), "7", "active"), (date(2025, 2, 1), "7", "active"), (date(2025, 3, 1), "7", "active"),
+                (date(2024, 12, 31), "7", "active"), (date(2025, 2, 10), "7", "deleted"), (date(2025, 2, 10), "8", "active")]
+        self.db.load("consumptions", {
+            f"c{i}": ConsumptionFS(date=day, amount=Decimal("1"), amount_usd=Decimal("1"), created_by=uid, record_status=status).to_dict()
+            for i, (day, uid, status) in enumerate(rows)
+        })
+        items = fetch_period_items(ReportParams(user_id="7", year=2025, month=1, scope="months", months=(1, 2)))
+        self.assertEqual(sorted(i.pk for i in items), ["c0", "c1"])
+        items = fetch_period_items(ReportParams(user_id="7", year=2024, month=12, scope="range", end_year=2025, end_month=3))
+        self.assertEqual(sorted(i.pk for i in items), ["c0", "c1", "c2", "c3"])
+
+
+@override_settings(IMPORT_UPLOAD_TTL=3600)
+class ImportUploadPurgeTests(LocalDataDirMixin, SimpleTestCase):
+    def test_only_old_uploads_are_removed(self):
+        old, recent = _import_upload_path("7", "a" * 32), _import_upload_path("7", "b" * 32)
+        os.makedirs(os.path.dirname(old))
+        for path in (old, recent):
+            open(path, "w").close()
+        os.utime(old, (0, 0))
+        _purge_import_uploads()
+        self.assertEqual((os.path.exists(old), os.path.exists(recent)), (False, True))
+
+
+@override_settings(CACHES=LOCMEM_CACHE, REPORT_JOB_TIMEOUT=600)
+class ReportJobTests(MemoryFirestoreMixin, LocalDataDirMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = get_user_model().objects.create(username="u7")
+        self.params = ReportParams(user_id=str(self.user.pk), year=2025, month=3)
+
+    def finished(self, job, expires_in=60, content=b"%PDF"):
+        os.makedirs(jobs.reports_dir(), exist_ok=True)
+        path = os.path.join(jobs.reports_dir(), f"{job.pk}.pdf")
+        with open(path, "wb") as f:
+            f.write(content)
+        jobs._finish(job, path)
+        ReportJob.objects.filter(pk=job.pk).update(expires_at=timezone.now() + timedelta(seconds=expires_in))
+        job.refresh_from_db()
+        return job
+
+    def request(self, **query):
+        request = RequestFactory().get("/reports/", query)
+        request.user = self.user
+        SessionMiddleware(lambda r: None).process_request(request)
+        MessageMiddleware(lambda r: None).process_request(request)
+        return request
+
+    def test_same_key_shares_the_live_job(self):
+        job = jobs.enqueue_report(self.user, self.params)
+        self.assertEqual(jobs.enqueue_report(self.user, self.params).pk, job.pk)
+        other = jobs.enqueue_report(self.user, ReportParams(user_id=str(self.user.pk), year=2025, month=4))
+        self.assertNotEqual(other.pk, job.pk)
+
+        self.finished(job)
+        self.assertEqual(jobs.enqueue_report(self.user, self.params).pk, job.pk)
+        bump_data_version(str(self.user.pk))  # new data: new key, new job
+        self.assertNotEqual(jobs.enqueue_report(self.user, self.params).pk, job.pk)
+
+    def test_done_job_without_file_is_not_reused(self):
+        job = self.finished(jobs.enqueue_report(self.user, self.params))
+        os.remove(job.file_path)
+        self.assertNotEqual(jobs.enqueue_report(self.user, self.params).pk, job.pk)
+
+    def test_claim_next_claims_each_job_once(self):
+        first = jobs.enqueue_report(self.user, self.params)
+        jobs.enqueue_report(self.user, ReportParams(user_id=str(self.user.pk), year=2025, month=4))
+        claimed = jobs.claim_next()
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertEqual((claimed.status, claimed.attempts), (ReportJob.Status.RUNNING, 1))
+        self.assertNotEqual(jobs.claim_next().pk, first.pk)
+        self.assertIsNone(jobs.claim_next())
+
+    def test_requeue_stale_retries_then_fails(self):
+        job = jobs.enqueue_report(self.user, self.params)
+        jobs.claim_next()
+        jobs.requeue_stale()
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).status, ReportJob.Status.RUNNING)  # not stale yet
+
+        long_ago = timezone.now() - timedelta(seconds=601)
+        ReportJob.objects.filter(pk=job.pk).update(started_at=long_ago)
+        jobs.requeue_stale()
+        self.assertEqual(ReportJob.objects.get(pk=job.pk).status, ReportJob.Status.QUEUED)
+
+        ReportJob.objects.filter(pk=job.pk).update(status=ReportJob.Status.RUNNING, started_at=long_ago, attempts=jobs.MAX_ATTEMPTS)
+        jobs.requeue_stale()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message), (ReportJob.Status.FAILED, "Timed out"))
+
+    def test_purge_expired_keeps_files_still_in_use(self):
+        expired = self.finished(jobs.enqueue_report(self.user, self.params), expires_in=-1)
+        shared = jobs.enqueue_report(self.user, ReportParams(user_id=str(self.user.pk), year=2025, month=4))
+        jobs._finish(shared, expired.file_path)  # a twin reusing the expired job's file
+        alone = self.finished(jobs.enqueue_report(self.user, ReportParams(user_id=str(self.user.pk), year=2025, month=5)), expires_in=-1)
+
+        self.assertEqual(jobs.purge_expired(), 2)
+        self.assertEqual(list(ReportJob.objects.values_list("pk", flat=True)), [shared.pk])
+        self.assertTrue(os.path.exists(expired.file_path))
+        self.assertFalse(os.path.exists(alone.file_path))
+
+    def test_status_and_download_views(self):
+        job = jobs.enqueue_report(self.user, self.params)
+        data = json.loads(report_status(self.request(format="json"), job_id=job.pk).content)
+        self.assertEqual((data["status"], data["download_url"]), ("queued", None))
+        self.assertEqual(report_download(self.request(), job_id=job.pk).status_code, 302)  # back to the status page
+
+        self.finished(job, content=b"%PDF-report")
+        data = json.loads(report_status(self.request(format="json"), job_id=job.pk).content)
+        self.assertEqual(data["status"], "done")
+        self.assertTrue(data["download_url"].endswith(f"/reports/{job.pk}/download/"))
+        response = report_download(self.request(), job_id=job.pk)
+        self.assertEqual(b"".join(response.streaming_content), b"%PDF-report")
+        response.close()
+
+        ReportJob.objects.filter(pk=job.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(report_download(self.request(), job_id=job.pk).url, "/")
+
+    def test_other_users_jobs_are_not_found(self):
+        job = jobs.enqueue_report(self.user, self.params)
+        request = self.request(format="json")
+        request.user = get_user_model().objects.create(username="u8")
+        with self.assertRaises(Http404):
+            report_status(request, job_id=job.pk)
+
+
+class ChartCacheTests(LocalDataDirMixin, SimpleTestCase):
+    def test_key_is_stable_and_follows_the_data(self):
+        spec = {"kind": "donut", "labels": ["Food", "Rent"], "values": [1.5, 2.0], "size": [4, 3]}
+        self.assertEqual(chart_key(spec), chart_key(dict(reversed(list(spec.items())))))
+        self.assertEqual(chart_key(spec), chart_key(json.loads(json.dumps(spec))))
+        self.assertNotEqual(chart_key(spec), chart_key({**spec, "values": [1.5, 2.5]}))
+        self.assertNotEqual(chart_key(spec), chart_key({**spec, "size": [4, 4]}))
+
+    def test_memory_lru_evicts_least_recently_used_by_bytes(self):
+        lru = MemoryLRU(10)
+        lru.put("a", b"aaaa")
+        lru.put("b", b"bbbb")
+        lru.get("a")
+        lru.put("c", b"cccc")  # 12 bytes: "b" is the least recently used
+        self.assertEqual((lru.get("a"), lru.get("b"), lru.get("c")), (b"aaaa", None, b"cccc"))
+        lru.put("a", b"a")  # replacing frees the old size
+        lru.put("d", b"ddddd")
+        self.assertEqual((lru.get("a"), lru.get("c"), lru.get("d")), (b"a", b"cccc", b"ddddd"))
+        lru.put("big", b"x" * 11)  # larger than the whole cache: not stored, nothing evicted
+        self.assertIsNone(lru.get("big"))
+        self.assertEqual(lru.get("d"), b"ddddd")
+
+    def test_disk_prune_removes_oldest_files_below_budget(self):
+        disk = DiskLRU(os.path.join(settings.LOCAL_DATA_DIR, "charts"), 1000)
+        keys = [chart_key({"n": n}) for n in range(4)]
+        with mock.patch.object(DiskLRU, "prune"):
+            for age, key in zip((40, 10, 30, 20), keys):
+                disk.put(key, b"x" * 300)
+                os.utime(disk._path(key), (1000 - age, 1000 - age))
+        disk.get(keys[0])  # a hit makes the oldest file the most recent
+        disk.prune()  # 1200 bytes > 1000: drop the oldest until under 900
+        self.assertEqual([disk.get(k) is not None for k in keys], [True, True, False, True])
+        disk.prune()  # 900 bytes: within budget
+        self.assertEqual(sum(disk.get(k) is not None for k in keys), 3)
+
+    def test_get_or_render_renders_each_spec_once(self):
+        root = os.path.join(settings.LOCAL_DATA_DIR, "charts")
+        render = mock.Mock(side_effect=lambda spec: json.dumps(spec).encode())
+        cache = ChartCache(root, memory_bytes=1024, disk_bytes=1024)
+        first = cache.get_or_render({"n": 1}, render)
+        self.assertEqual(cache.get_or_render({"n": 1}, render), first)
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+        other_process = ChartCache(root, memory_bytes=1024, disk_bytes=1024)  # cold memory, shared disk
+        self.assertEqual(other_process.get_or_render({"n": 1}, render), first)
+        self.assertEqual(render.call_count, 1)
+        other_process.get_or_render({"n": 2}, render)
+        self.assertEqual(render.call_count, 2)
+
+
+class ChartRenderTests(LocalDataDirMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(charts._reset_pool)
+        self.specs = [charts.donut_spec("Food", ["a", "b"], [1, 2]), charts.stacked_bar_spec("Months", ["Jan"], [("a", [1])])]
+
+    def test_pool_follows_the_worker_count(self):
+        with mock.patch.object(charts, "ProcessPoolExecutor", side_effect=lambda **kwargs: mock.Mock()) as executor:
+            first = charts._get_pool(2)
+            self.assertIs(charts._get_pool(2), first)
+            second = charts._get_pool(3)
+        self.assertIsNot(second, first)
+        self.assertEqual([c.kwargs["max_workers"] for c in executor.call_args_list], [2, 3])
+        first.shutdown.assert_called_once_with(wait=False)
+
+    def test_render_many_inline_and_fallback(self):
+        inline = charts.render_many(self.specs, workers=1)
+        self.assertEqual([png[:8] for png in inline], [b"\x89PNG\r\n\x1a\n"] * 2)
+        broken = mock.Mock()
+        broken.map.side_effect = charts.BrokenProcessPool("worker died")
+        with mock.patch.multiple(charts, _pool=broken, _pool_workers=2), self.assertLogs("expenses.charts", "ERROR"):
+            self.assertEqual(charts.render_many(self.specs, workers=2), inline)
+            self.assertIsNone(charts._pool)  # the broken pool is dropped
+        broken.shutdown.assert_called_once_with(wait=False, cancel_futures=True)
+
+    def test_render_charts_renders_each_missing_spec_once(self):
+        cache = ChartCache(os.path.join(settings.LOCAL_DATA_DIR, "charts"), 1024 * 1024, 0)
+        cache.store(chart_key(self.specs[0]), b"cached")
+        fake = mock.Mock(side_effect=lambda specs, workers: [s["kind"].encode() for s in specs])
+        with mock.patch.object(charts, "get_chart_cache", return_value=cache), mock.patch.object(charts, "render_many", fake):
+            out = charts.render_charts([self.specs[0], self.specs[1], dict(self.specs[1])], workers=2)
+            self.assertEqual(out, [b"cached", b"stacked_bar", b"stacked_bar"])
+            fake.assert_called_once_with([self.specs[1]], 2)
+            self.assertEqual(charts.render_charts(self.specs), [b"cached", b"stacked_bar"])
+        fake.assert_called_once()
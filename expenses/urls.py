@@ -7,9 +7,14 @@ urlpatterns = [
     path("register/", views.register, name="register"),
     path("add/", views.add_expense, name="add_expense"),
     path("list/", views.monthly_list, name="monthly_list"),
+    path("search/", views.search, name="search"),
+    path("export/", views.export_consumptions, name="export_consumptions"),
+    path("import/", views.import_expenses, name="import_expenses"),
     path("", views.dashboard, name="dashboard"),
     path("edit/<uuid:pk>/", views.edit_expense, name="edit_expense"),
     path("delete/<uuid:pk>/", views.delete_expense, name="delete_expense"),
     path("firebase-token-login/", views.firebase_token_login, name="firebase_token_login"),
     path("dashboard/pdf/", views.download_dashboard_pdf, name="dashboard_pdf"),
+    path("reports/<uuid:job_id>/", views.report_status, name="report_status"),
+    path("reports/<uuid:job_id>/download/", views.report_download, name="report_download"),
 ]
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+Report charts drawn as native PDF vector graphics with reportlab.graphics.
+
+Takes the same specs as expenses/charts.py (donut_spec / stacked_bar_spec) and draws them
+straight onto a ReportLab canvas at the size of the box they occupy: no matplotlib figure, no
+PNG encoding, and text stays selectable. Used when REPORT_CHART_BACKEND is "vector".
+"""
+from reportlab.graphics import renderPDF
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.doughnut import Doughnut
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.textlabels import Label
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+
+from .charts import PALETTE
+
+_COLORS = [colors.HexColor(c) for c in PALETTE]
+TITLE_H = 14
+
+
+def _color(idx):
+    return _COLORS[idx % len(_COLORS)]
+
+
+def _legend(pairs, x, y, font_size=7):
+    legend = Legend()
+    legend.x = x
+    legend.y = y
+    legend.boxAnchor = "w"
+    legend.alignment = "right"
+    legend.fontName = "Helvetica"
+    legend.fontSize = font_size
+    legend.dx = legend.dy = 6
+    legend.deltay = font_size + 3
+    legend.columnMaximum = 12
+    legend.strokeColor = None
+    legend.colorNamePairs = pairs
+    return legend
+
+
+def _title(drawing, text, width, height):
+    drawing.add(String(width / 2, height - 10, text, fontName="Helvetica-Bold", fontSize=9, textAnchor="middle"))
+
+
+def donut_drawing(spec, width, height) -> Drawing:
+    d = Drawing(width, height)
+    _title(d, spec["title"], width, height)
+    values = spec["values"]
+    size = max(10, min(width * 0.55, height - TITLE_H - 8))
+    pie = Doughnut()
+    pie.x = 4
+    pie.y = (height - TITLE_H - size) / 2
+    pie.width = pie.height = size
+    pie.data = values
+    pie.innerRadiusFraction = 0.6
+    pie.startAngle = 90
+    pie.direction = "anticlockwise"
+    pie.slices.strokeColor = colors.white
+    pie.slices.strokeWidth = 0.5
+    for idx in range(len(values)):
+        pie.slices[idx].fillColor = _color(idx)
+    d.add(pie)
+    d.add(_legend(
+        [(_color(idx), label) for idx, label in enumerate(spec["labels"])],
+        pie.x + size + 10,
+        pie.y + size / 2,
+    ))
+    return d
+
+
+def stacked_bar_drawing(spec, width, height) -> Drawing:
+    d = Drawing(width, height)
+    _title(d, spec["title"], width, height)
+    legend_w = 70
+    chart = VerticalBarChart()
+    chart.x = 36
+    chart.y = 18
+    chart.width = width - chart.x - legend_w - 8
+    chart.height = height - chart.y - TITLE_H - 6
+    chart.data = [values for _, values in spec["series"]] or [[0] * len(spec["x_labels"])]
+    chart.categoryAxis.categoryNames = spec["x_labels"]
+    chart.categoryAxis.style = "stacked"
+    chart.categoryAxis.labels.fontName = "Helvetica"
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontName = "Helvetica"
+    chart.valueAxis.labels.fontSize = 7
+    chart.valueAxis.visibleGrid = True
+    chart.valueAxis.gridStrokeColor = colors.lightgrey
+    chart.valueAxis.gridStrokeDashArray = (2, 2)
+    chart.bars.strokeColor = None
+    for idx in range(len(spec["series"])):
+        chart.bars[idx].fillColor = _color(idx)
+    d.add(chart)
+    if spec.get("ylabel"):
+        label = Label()
+        label.setOrigin(8, chart.y + chart.height / 2)
+        label.angle = 90
+        label.fontName = "Helvetica"
+        label.fontSize = 8
+        label.setText(spec["ylabel"])
+        d.add(label)
+    d.add(_legend(
+        [(_color(idx), name) for idx, (name, _) in enumerate(spec["series"])],
+        chart.x + chart.width + 8,
+        chart.y + chart.height / 2,
+    ))
+    return d
+
+
+DRAWINGS = {
+    "donut": donut_drawing,
+    "stacked_bar": stacked_bar_drawing,
+}
+
+
+def draw_chart(canvas, spec, x, y, width, height):
+    """Draw a chart spec into the box (x, y, width, height) of a ReportLab canvas."""
+    renderPDF.draw(DRAWINGS[spec["kind"]](spec, width, height), canvas, x, y)
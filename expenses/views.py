@@ -4,33 +4,38 @@ from django.contrib.auth import authenticate, login, get_user_model, update_sess
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib import messages
 from django.core.paginator import Paginator
-from django.http import HttpResponse, JsonResponse
+from django.http import FileResponse, Http404, JsonResponse
+from django.urls import reverse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 
 from firebase_admin import auth as fb_auth, firestore
 from firebase_client import get_firestore_client, get_storage_bucket
+from finance_tracker.data_version import conditional_user_page
+from finance_tracker import search as search_index
+from finance_tracker.listing import ListQuery
+from finance_tracker.export import FORMATS as EXPORT_FORMATS, export_response
 
 from .firestore_models import ConsumptionFS as Consumption
 from .forms import ExpenseDateForm, ExpenseLineItemForm, ConsumptionEditForm, UserRegisterForm, UserUpdateForm
+from .forms import TYPE_CHOICES as CONSUMPTION_TYPE_CHOICES
 from .models import TZ_TO_COUNTRY, Currency, COUNTRIES
+from .exchange_rates import attach_base_amounts
+from .importer import ConsumptionImporter
+from .jobs import enqueue_report
+from .models import ReportJob
+from .reports import ReportParams, render_report
 
 from datetime import datetime, date
-from calendar import month_name
+from calendar import month_name, monthrange
 from decimal import Decimal
 import json
-import io
+import os
+import re
+import tempfile
+import time
 import uuid
 
-# PDF + chart generation
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import mm
-from reportlab.lib.utils import ImageReader
-from reportlab.lib import colors
-
-import matplotlib
-matplotlib.use("Agg")   # for headless servers
-import matplotlib.pyplot as plt
 from django.conf import settings
 from django.forms import formset_factory
 
@@ -167,28 +172,29 @@ def add_expense(request):
             created_count = 0
             expense_date = date_form.cleaned_data["date"]
             selected_country = request.POST.get("country") or default_country
-            for item_form in items_formset:
-                if not item_form.cleaned_data:
-                    continue
-                amount = item_form.cleaned_data.get("amount")
-                if amount is None:
-                    continue
-                c = Consumption(
-                    pk=str(uuid.uuid4()),
-                    date=expense_date,
-                    amount=Decimal(str(amount)),
-                    currency=item_form.cleaned_data.get("currency"),
-                    consumption_type=item_form.cleaned_data.get("consumption_type"),
-                    note=item_form.cleaned_data.get("note", ""),
-                    country=selected_country,
-                    created_by=str(request.user.id) if request.user else None,
-                    created_at=datetime.utcnow(),
-                    modified_by=None,
-                    modified_at=None,
-                    record_status="active"
-                )
-                c.save()  # Triggers compute_amount_usd and saves to Firestore
-                created_count += 1
+            with search_index.batch():  # one index write for all lines
+                for item_form in items_formset:
+                    if not item_form.cleaned_data:
+                        continue
+                    amount = item_form.cleaned_data.get("amount")
+                    if amount is None:
+                        continue
+                    c = Consumption(
+                        pk=str(uuid.uuid4()),
+                        date=expense_date,
+                        amount=Decimal(str(amount)),
+                        currency=item_form.cleaned_data.get("currency"),
+                        consumption_type=item_form.cleaned_data.get("consumption_type"),
+                        note=item_form.cleaned_data.get("note", ""),
+                        country=selected_country,
+                        created_by=str(request.user.id) if request.user else None,
+                        created_at=datetime.utcnow(),
+                        modified_by=None,
+                        modified_at=None,
+                        record_status="active"
+                    )
+                    c.save()  # Triggers compute_amount_usd and saves to Firestore
+                    created_count += 1
             if created_count == 0:
                 messages.error(request, "Please add at least one expense.")
             else:
@@ -208,7 +214,14 @@ def add_expense(request):
     })
     
     
+def _base_currency(request):
+    """Reporting currency from ?base=, limited to the supported currencies."""
+    base = (request.GET.get("base") or "USD").upper()
+    return base if base in Currency.values else "USD"
+
+
 @login_required
+@conditional_user_page
 def dashboard(request):
     months = [(i, month_name[i]) for i in range(1, 13)]
     current_year = 2025
@@ -219,6 +232,7 @@ def dashboard(request):
     selected_year = int(request.GET.get("year", datetime.now().year))
     selected_month_name = month_name[selected_month]
     show_monthly_only = request.GET.get("show_monthly") == "1"
+    base_currency = _base_currency(request)
 
     try:
         all_items = Consumption.list(limit=2000)
@@ -233,11 +247,12 @@ def dashboard(request):
         and getattr(i, "date", None) is not None
         and i.date.year == selected_year
     ]
+    attach_base_amounts(yearly_items, base_currency)
     month_totals = {m: 0.0 for m, _ in months}
     month_counts = {m: 0 for m, _ in months}
     for item in yearly_items:
         month_num = item.date.month
-        month_totals[month_num] += float(item.amount_usd)
+        month_totals[month_num] += float(item.amount_base)
         month_counts[month_num] += 1
     yearly_overview = [
         (m, name, month_totals[m], month_counts[m]) for m, name in months
@@ -254,16 +269,16 @@ def dashboard(request):
         and i.date.month == selected_month
     ]
 
-    total_usd = sum([float(i.amount_usd) for i in monthly]) if monthly else 0.0
+    total_usd = sum([float(i.amount_base) for i in monthly]) if monthly else 0.0
     total_count = len(monthly)
-    yearly_total_usd = sum([float(i.amount_usd) for i in yearly_items]) if yearly_items else 0.0
+    yearly_total_usd = sum([float(i.amount_base) for i in yearly_items]) if yearly_items else 0.0
     yearly_total_count = len(yearly_items)
     yearly_average = (yearly_total_usd / yearly_total_count) if yearly_total_count else 0.0
 
     totals = {}
     for i in monthly:
         key = (i.consumption_type or "other").capitalize()
-        totals[key] = totals.get(key, 0.0) + float(i.amount_usd)
+        totals[key] = totals.get(key, 0.0) + float(i.amount_base)
 
     labels = list(totals.keys())
     values = [totals[k] for k in labels]
@@ -288,10 +303,39 @@ def dashboard(request):
         "labels": json.dumps(labels),
         "values": json.dumps(values),
         "breakdown": breakdown,
+        "base_currency": base_currency,
+        "base_prefix": "$" if base_currency == "USD" else f"{base_currency} ",
+        "currency_choices": Currency.choices,
     }
     return render(request, "expenses/dashboard.html", context)
 
+# sort param -> (attribute, reverse, value for missing, label)
+CONSUMPTION_SORT_OPTIONS = {
+    "-date": ("date", True, date.min, "Newest first"),
+    "date": ("date", False, date.min, "Oldest first"),
+    "-amount": ("amount_usd", True, Decimal("0"), "Amount: high to low"),
+    "amount": ("amount_usd", False, Decimal("0"), "Amount: low to high"),
+    "type": ("consumption_type", False, "", "Type"),
+}
+
+
+def _consumption_list_query(request):
+    return ListQuery.from_params(
+        request.GET,
+        equality={
+            "type": ("consumption_type", [c for c, _ in CONSUMPTION_TYPE_CHOICES]),
+            "currency": ("currency", Currency.values),
+            "country": ("country", COUNTRIES.values),
+        },
+        sort_options=CONSUMPTION_SORT_OPTIONS,
+        default_sort="-date",
+        amount_attr="amount_usd",
+        text_attr="note",
+    )
+
+
 @login_required
+@conditional_user_page
 def monthly_list(request):
     months = [(i, month_name[i]) for i in range(1, 13)]
     current_year = datetime.now().year
@@ -302,21 +346,21 @@ def monthly_list(request):
     selected_month_name = month_name[selected_month]
     page_size_param = (request.GET.get("page_size") or "10").lower()
 
+    list_query = _consumption_list_query(request)
+
+    # Owner and month run in Firestore (created_by + date range index); the month's rows are then
+    # checked against the equality, amount and note filters in one pass.
     try:
-        all_items = Consumption.list(limit=2000)
+        candidates = Consumption.list_by_user_dates(
+            request.user.id,
+            date(selected_year, selected_month, 1),
+            date(selected_year, selected_month, monthrange(selected_year, selected_month)[1]),
+        )
     except Exception as e:
         print(f"Error fetching Firestore data: {e}")
-        all_items = []
+        candidates = []
 
-    qs = [
-        i for i in all_items
-        if i.record_status == "active"
-        and i.created_by == str(request.user.id)
-        and getattr(i, "date", None) is not None
-        and i.date.year == selected_year
-        and i.date.month == selected_month
-    ]
-    qs.sort(key=lambda x: getattr(x, "date", datetime.min), reverse=True)
+    qs = list_query.apply(candidates, extra=lambda i: i.record_status == "active", check_equals=True)
 
     total_usd = sum([float(i.amount_usd) for i in qs]) if qs else Decimal('0.00')
 
@@ -359,6 +403,165 @@ def monthly_list(request):
         'breakdown': breakdown,
         'consumption_choices': [(c, c.capitalize()) for c in ['market', 'transport' , 'food', 'other']],
         'currency_choices': Currency.choices,
+        'country_choices': COUNTRIES.choices,
+        'sort_choices': [(k, v[3]) for k, v in CONSUMPTION_SORT_OPTIONS.items()],
+        'list_query': list_query,
+        'filter_query': list_query.querystring(),
+        'month_start': date(selected_year, selected_month, 1),
+        'month_end': date(selected_year, selected_month, monthrange(selected_year, selected_month)[1]),
+    })
+
+def _import_upload_path(user_id, token):
+    return os.path.join(settings.LOCAL_DATA_DIR, "imports", f"{user_id}-{token}.csv")
+
+
+def _purge_import_uploads():
+    """Delete previewed uploads that were never imported, once older than IMPORT_UPLOAD_TTL seconds."""
+    folder = os.path.join(settings.LOCAL_DATA_DIR, "imports")
+    cutoff = time.time() - getattr(settings, "IMPORT_UPLOAD_TTL", 86400)
+    try:
+        entries = list(os.scandir(folder))
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            pass  # imported or purged concurrently
+
+
+@login_required
+def import_expenses(request):
+    """
+    Bulk CSV import. "Preview" validates the whole file without writing and keeps the upload
+    server-side under a token; "Import" then writes it (or an upload sent directly) in batches.
+    """
+    uid = str(request.user.id)
+    country_choices = sorted(COUNTRIES.choices, key=lambda x: x[1])
+    context = {"country_choices": country_choices, "default_country": request.POST.get("country", "")}
+    if request.method != "POST":
+        return render(request, "expenses/import_expenses.html", context)
+
+    country = request.POST.get("country", "")
+    if country not in COUNTRIES.values:
+        country = ""
+    token = request.POST.get("token", "")
+    if token and not re.fullmatch(r"[0-9a-f]{32}", token):
+        token = ""
+    upload = request.FILES.get("file")
+    if upload is not None:
+        if not upload.name.lower().endswith(".csv"):
+            messages.error(request, "Only CSV is supported. Save Excel as CSV first.")
+            return render(request, "expenses/import_expenses.html", context)
+        _purge_import_uploads()
+        token = uuid.uuid4().hex
+        path = _import_upload_path(uid, token)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as out:
+            for chunk in upload.chunks():
+                out.write(chunk)
+    path = _import_upload_path(uid, token) if token else None
+    if not path or not os.path.exists(path):
+        messages.error(request, "Please choose a CSV file.")
+        return render(request, "expenses/import_expenses.html", context)
+
+    dry_run = request.POST.get("action") == "preview"
+    importer = ConsumptionImporter(uid, default_country=country, dry_run=dry_run)
+    try:
+        with open(path, newline="", encoding="utf-8-sig", errors="replace") as f:
+            result = importer.run(f)
+    except Exception as e:
+        print(f"Import error: {e}")
+        written = importer.result.imported if importer.result and not dry_run else 0
+        messages.error(request, f"Import failed; {written} expense(s) written before the error were kept.")
+        result = None
+    if not dry_run or result is None:
+        os.remove(path)
+    if result is not None and not dry_run:
+        messages.success(request, f"Imported {result.imported} expense(s); {result.error_count} row(s) rejected.")
+        if result.error_count == 0:
+            return redirect("monthly_list")
+    context.update({"result": result, "token": token if dry_run else "", "default_country": country})
+    return render(request, "expenses/import_expenses.html", context)
+
+
+CONSUMPTION_EXPORT_HEADER = ["Date", "Type", "Country", "Amount", "Currency", "Amount (USD)", "Note"]
+
+
+@login_required
+def export_consumptions(request):
+    """
+    Download the user's active expenses as CSV or XLSX (?fmt=), optionally limited to ?from= / ?to=
+    (YYYY-MM-DD) and to the monthly list filters. Rows are read page by page while the file is
+    written, in document order.
+    """
+    fmt = request.GET.get("fmt", "csv")
+    if fmt not in EXPORT_FORMATS:
+        fmt = "csv"
+    date_from = _parse_date(request.GET.get("from"))
+    date_to = _parse_date(request.GET.get("to"))
+    list_query = _consumption_list_query(request)
+    filters = [("created_by", "==", str(request.user.id))] + list_query.pushdown()
+
+    def in_range(c):
+        if c.record_status != "active" or c.date is None:
+            return False
+        return (date_from is None or c.date >= date_from) and (date_to is None or c.date <= date_to)
+
+    def rows():
+        items = (c for page in Consumption.iter_pages(filters) for c in page)
+        for c in list_query.iter_matching(items, extra=in_range):
+            yield [c.date, c.consumption_type, c.country, c.amount, c.currency, c.amount_usd, c.note]
+
+    span = f"{date_from or 'start'}_{date_to or date.today()}"
+    return export_response(fmt, f"expenses_{span}", CONSUMPTION_EXPORT_HEADER, rows(), sheet="Expenses")
+
+
+def _parse_float(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+@login_required
+@conditional_user_page
+def search(request):
+    """Full-text search over expense notes and budgeting transaction descriptions."""
+    query = (request.GET.get("q") or "").strip()
+    kind = request.GET.get("kind") or ""
+    if kind not in (search_index.KIND_CONSUMPTION, search_index.KIND_TRANSACTION):
+        kind = ""
+    filters = {
+        "kind": kind or None,
+        "min_amount": _parse_float(request.GET.get("min")),
+        "max_amount": _parse_float(request.GET.get("max")),
+        "date_from": _parse_date(request.GET.get("from")),
+        "date_to": _parse_date(request.GET.get("to")),
+    }
+    results = []
+    if query:
+        try:
+            results = search_index.search(str(request.user.id), query, limit=200, **filters)
+        except Exception as e:
+            print(f"Search error: {e}")
+            messages.error(request, "Search is temporarily unavailable.")
+    return render(request, "expenses/search.html", {
+        "query": query,
+        "kind": kind,
+        "min_amount": request.GET.get("min", ""),
+        "max_amount": request.GET.get("max", ""),
+        "date_from": request.GET.get("from", ""),
+        "date_to": request.GET.get("to", ""),
+        "results": results,
     })
 
 @login_required
@@ -467,309 +670,61 @@ def firebase_token_login(request):
 @login_required
 def download_dashboard_pdf(request):
     """
-    Generate a professional PDF report for the dashboard (month + year).
-    Includes summary, styled breakdown table, pie chart, and footer.
+    PDF report for the dashboard (month, selected months, year or a multi-year range).
+    Queued for the report workers and followed on the status page; rendered inline when
+    REPORT_JOBS_ENABLED is off (the default), see _dashboard_pdf_inline().
     """
-
-    selected_month = int(request.GET.get("month", datetime.now().month))
-    selected_year = int(request.GET.get("year", datetime.now().year))
-    scope = request.GET.get("scope", "month").lower()
-    months_param = request.GET.getlist("months")
-    selected_months = sorted({
-        int(m) for m in months_param
-        if str(m).isdigit() and 1 <= int(m) <= 12
-    })
-
-    # --- Fetch Data ---
     try:
-        all_items = Consumption.list(limit=2000)
-    except Exception as e:
-        print(f"Error fetching Firestore data: {e}")
-        all_items = []
-
-    if scope == "year":
-        period_items = [
-            i for i in all_items
-            if i.record_status == "active"
-            and i.created_by == str(request.user.id)
-            and getattr(i, "date", None) is not None
-            and i.date.year == selected_year
-        ]
-    elif scope == "months" and selected_months:
-        period_items = [
-            i for i in all_items
-            if i.record_status == "active"
-            and i.created_by == str(request.user.id)
-            and getattr(i, "date", None) is not None
-            and i.date.year == selected_year
-            and i.date.month in selected_months
-        ]
-    else:
-        period_items = [
-            i for i in all_items
-            if i.record_status == "active"
-            and i.created_by == str(request.user.id)
-            and getattr(i, "date", None) is not None
-            and i.date.year == selected_year
-            and i.date.month == selected_month
-        ]
-
-    total_usd = sum([float(i.amount_usd) for i in period_items]) if period_items else 0.0
-    total_count = len(period_items)
-
-    totals = {}
-    for i in period_items:
-        key = (i.consumption_type or "other").capitalize()
-        totals[key] = totals.get(key, 0.0) + float(i.amount_usd)
+        params = ReportParams.from_request(request)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect("dashboard")
+    if not getattr(settings, "REPORT_JOBS_ENABLED", False):
+        return _dashboard_pdf_inline(request, params)
+    job = enqueue_report(request.user, params)
+    if job.status == ReportJob.Status.DONE:
+        return redirect("report_download", job_id=job.pk)
+    return redirect("report_status", job_id=job.pk)
+
+
+@conditional_user_page
+def _dashboard_pdf_inline(request, params):
+    """Render into a temporary file that is streamed back in chunks; 304 while the data is unchanged."""
+    out = tempfile.TemporaryFile()
+    render_report(params, out)
+    out.seek(0)
+    return FileResponse(out, as_attachment=True, filename=params.filename, content_type="application/pdf")
+
+
+def _user_job(request, job_id):
+    job = ReportJob.objects.filter(pk=job_id, user=request.user).first()
+    if job is None:
+        raise Http404("Report not found")
+    return job
 
-    # --- Metadata ---
-    extracted_at = datetime.utcnow().strftime("%Y-%m-%d %H:%M UTC")
-    extractor_name = request.user.get_full_name() or request.user.username
 
-    # --- Pie Chart removed (stacked bars used instead) ---
-    pie_image = None
+@login_required
+def report_status(request, job_id):
+    """Progress of a queued report: JSON for polling (?format=json), otherwise a page that polls."""
+    job = _user_job(request, job_id)
+    if request.GET.get("format") == "json":
+        done = job.status == ReportJob.Status.DONE
+        return JsonResponse({
+            "id": str(job.pk),
+            "status": job.status,
+            "progress": job.progress,
+            "message": job.message,
+            "download_url": reverse("report_download", args=[job.pk]) if done else None,
+        })
+    return render(request, "expenses/report_status.html", {"job": job})
 
-    # --- Monthly Charts (one per country per month) ---
-    monthly_charts = []
-    if scope == "month":
-        months_for_charts = [selected_month]
-    else:
-        months_for_charts = selected_months if (scope == "months" and selected_months) else list(range(1, 13))
-
-    for m in months_for_charts:
-        month_items = [
-            i for i in period_items
-            if getattr(i, "date", None) is not None and i.date.month == m
-        ]
-        if not month_items:
-            continue
-        items_by_country = {}
-        for i in month_items:
-            country = (getattr(i, "country", "") or "Unknown").upper()
-            items_by_country.setdefault(country, []).append(i)
-        for country_code, items in items_by_country.items():
-            month_totals = {}
-            for i in items:
-                key = (i.consumption_type or "other").capitalize()
-                month_totals[key] = month_totals.get(key, 0.0) + float(i.amount_usd)
-            if not month_totals:
-                continue
-            labels = list(month_totals.keys())
-            values = [month_totals[k] for k in labels]
-            fig, ax = plt.subplots(figsize=(5.0, 3.6), dpi=100)
-            wedges, _ = ax.pie(
-                values,
-                startangle=90,
-                wedgeprops={"width": 0.4}
-            )
-            ax.legend(
-                wedges,
-                labels,
-                title="Category",
-                loc="center left",
-                bbox_to_anchor=(1.0, 0.5),
-                fontsize=8,
-                title_fontsize=8
-            )
-            ax.set_title(f"{month_name[m]} {selected_year} • {country_code}")
-            ax.set_aspect("equal", adjustable="box")
-            buf = io.BytesIO()
-            plt.tight_layout()
-            plt.savefig(buf, format="png", bbox_inches="tight", transparent=True)
-            plt.close(fig)
-            buf.seek(0)
-            monthly_charts.append({
-                "image": ImageReader(buf),
-                "totals": month_totals,
-                "total": sum(month_totals.values()),
-            })
 
-    # --- Yearly Chart (stacked bar) ---
-    yearly_image = None
-    if scope in ("year", "months"):
-        if scope == "months" and selected_months:
-            months_for_chart = selected_months
-        else:
-            months_for_chart = list(range(1, 13))
-        month_totals = {m: 0.0 for m in months_for_chart}
-        for item in period_items:
-            month_num = item.date.month
-            if month_num in month_totals:
-                month_totals[month_num] += float(item.amount_usd)
-        month_labels = [month_name[m][:3] for m in months_for_chart]
-        month_values = [month_totals[m] for m in months_for_chart]
-        category_order = []
-        category_totals = {}
-        for item in period_items:
-            month_num = item.date.month
-            if month_num not in month_totals:
-                continue
-            key = (item.consumption_type or "other").capitalize()
-            if key not in category_totals:
-                category_totals[key] = {m: 0.0 for m in months_for_chart}
-                category_order.append(key)
-            category_totals[key][month_num] += float(item.amount_usd)
-        if any(month_values):
-            fig, ax = plt.subplots(figsize=(7.5, 3.2), dpi=100)
-            bottoms = [0.0 for _ in months_for_chart]
-            colors_list = ["#36a2eb", "#ff6384", "#ffcd56", "#4bc0c0", "#9966ff", "#ff9f40"]
-            for idx, key in enumerate(category_order):
-                values = [category_totals[key][m] for m in months_for_chart]
-                ax.bar(
-                    month_labels,
-                    values,
-                    bottom=bottoms,
-                    color=colors_list[idx % len(colors_list)],
-                    label=key
-                )
-                bottoms = [b + v for b, v in zip(bottoms, values)]
-            ax.set_ylabel("USD")
-            ax.set_title("Monthly Totals (Stacked)")
-            ax.grid(axis="y", linestyle="--", alpha=0.3)
-            ax.legend(loc="upper right", fontsize=7, title_fontsize=7)
-            buf = io.BytesIO()
-            plt.tight_layout()
-            plt.savefig(buf, format="png", bbox_inches="tight", transparent=True)
-            plt.close(fig)
-            buf.seek(0)
-            yearly_image = ImageReader(buf)
-
-    # --- PDF Setup ---
-    buffer = io.BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    margin_x, margin_y = 25 * mm, 20 * mm
-    y = height - margin_y
-
-    def draw_footer():
-        p.setStrokeColor(colors.lightgrey)
-        p.setLineWidth(0.5)
-        p.line(margin_x, margin_y + 10, width - margin_x, margin_y + 10)
-        p.setFont("Helvetica", 8)
-        p.drawString(margin_x, margin_y, f"Generated by: {extractor_name}")
-        p.drawRightString(width - margin_x, margin_y, f"Extracted: {extracted_at}")
-
-    def draw_breakdown_table(start_y, breakdown_totals, overall_total, title="Breakdown"):
-        y_local = start_y
-        if not breakdown_totals or overall_total <= 0:
-            return y_local
-        p.setFont("Helvetica-Bold", 10)
-        p.drawString(margin_x, y_local, title)
-        y_local -= 12
-        p.setFont("Helvetica-Bold", 9)
-        p.drawString(margin_x, y_local, "Type")
-        p.drawRightString(width - margin_x - 80, y_local, "Amount")
-        p.drawRightString(width - margin_x, y_local, "%")
-        y_local -= 10
-        p.setStrokeColor(colors.grey)
-        p.line(margin_x, y_local, width - margin_x, y_local)
-        y_local -= 12
-        p.setFont("Helvetica", 9)
-        for label, amt in breakdown_totals.items():
-            percent = (amt / overall_total) * 100
-            p.drawString(margin_x, y_local, label)
-            p.drawRightString(width - margin_x - 80, y_local, f"{amt:,.2f}")
-            p.drawRightString(width - margin_x, y_local, f"{percent:.1f}%")
-            y_local -= 12
-            if y_local < margin_y + 50:
-                draw_footer()
-                p.showPage()
-                y_local = height - margin_y
-        return y_local
-
-    # --- Header (colored band) ---
-    header_h = 22 * mm
-    p.setFillColorRGB(0.12, 0.44, 0.71)  # dark blue
-    p.rect(0, height - header_h, width, header_h, fill=1, stroke=0)
-    p.setFillColor(colors.white)
-    p.setFont("Helvetica-Bold", 18)
-    p.drawString(margin_x, height - header_h + 8, "Finance Tracker")
-    p.setFont("Helvetica", 10)
-    if scope == "year":
-        title = "Yearly Expense Report"
-    elif scope == "months" and selected_months:
-        title = "Selected Months Report"
-    else:
-        title = "Monthly Expense Report"
-    p.drawRightString(width - margin_x, height - header_h + 12, title)
-    p.drawRightString(width - margin_x, height - header_h + 2, extracted_at)    
-    # --- Subtitle ---
-    y = height - header_h - 15
-    p.setFillColor(colors.black)
-    p.setFont("Helvetica-Bold", 13)
-    if scope == "year":
-        subtitle = f"{selected_year}"
-    elif scope == "months" and selected_months:
-        month_labels = ", ".join([month_name[m][:3] for m in selected_months])
-        subtitle = f"{month_labels} {selected_year}"
-    else:
-        subtitle = f"{month_name[selected_month]} {selected_year}"
-    p.drawString(margin_x, y, subtitle)
-    y -= 20
-
-    # --- Summary box ---
-    p.setFillColor(colors.whitesmoke)
-    p.roundRect(margin_x, y - 30, width - 2 * margin_x, 30, 6, fill=1, stroke=1)
-    p.setFillColor(colors.black)
-    p.setFont("Helvetica-Bold", 11)
-    p.drawString(margin_x + 10, y - 12, f"Total Expenses: {total_usd:,.2f} USD")
-    p.setFont("Helvetica", 10)
-    p.drawString(margin_x + 10, y - 24, f"Number of Records: {total_count}")
-    y -= 50
-
-    if yearly_image:
-        chart_w, chart_h = 170 * mm, 70 * mm
-        chart_x = (width - chart_w) / 2
-        chart_y = y - chart_h
-        p.drawImage(yearly_image, chart_x, chart_y, chart_w, chart_h, mask="auto")
-        y = chart_y - 16
-        y = draw_breakdown_table(y, totals, total_usd, title="Yearly Breakdown")
-        y -= 10
-
-    # --- Selected Months Charts ---
-    if monthly_charts:
-        gap = 8 * mm
-        chart_w = (width - 2 * margin_x - gap) / 2
-        chart_h = 70 * mm
-        col = 0
-        for chart_meta in monthly_charts:
-            if col == 0:
-                chart_y = y - chart_h
-                if chart_y < margin_y + 40:
-                    draw_footer()
-                    p.showPage()
-                    y = height - margin_y
-                    chart_y = y - chart_h
-            chart_x = margin_x + col * (chart_w + gap)
-            p.drawImage(chart_meta["image"], chart_x, chart_y, chart_w, chart_h, mask="auto")
-            if col == 1:
-                y = chart_y - 10
-                y = draw_breakdown_table(y, chart_meta["totals"], chart_meta["total"], title="Breakdown")
-                y -= 10
-            col = (col + 1) % 2
-        if col == 1:
-            y = chart_y - 10
-            y = draw_breakdown_table(y, chart_meta["totals"], chart_meta["total"], title="Breakdown")
-            y -= 10
-
-    # --- Pie chart removed ---
-
-    # Overall breakdown removed; rendered per chart
-
-    # --- Footer ---
-    draw_footer()
-
-    # Save
-    p.save()
-    buffer.seek(0)
-
-    if scope == "year":
-        filename = f"Finance_Dashboard_Year_{selected_year}.pdf"
-    elif scope == "months" and selected_months:
-        month_labels = "-".join([month_name[m][:3] for m in selected_months])
-        filename = f"Finance_Dashboard_Selected_{month_labels}_{selected_year}.pdf"
-    else:
-        filename = f"Finance_Dashboard_{month_name[selected_month]}_{selected_year}.pdf"
-    response = HttpResponse(buffer, content_type="application/pdf")
-    response["Content-Disposition"] = f'attachment; filename=\"{filename}\"'
-    return response
+@login_required
+def report_download(request, job_id):
+    job = _user_job(request, job_id)
+    if job.status != ReportJob.Status.DONE:
+        return redirect("report_status", job_id=job.pk)
+    if (job.expires_at and job.expires_at < timezone.now()) or not os.path.exists(job.file_path):
+        messages.error(request, "This report has expired. Please request it again.")
+        return redirect("dashboard")
+    return FileResponse(open(job.file_path, "rb"), as_attachment=True, filename=job.filename, content_type="application/pdf")
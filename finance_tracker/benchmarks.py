@@ -0,0 +1,375 @@
+"""
+Reproducible benchmarks for report generation and the two dashboards.
+
+Each scenario runs the real code path (the expenses and budgeting dashboard views through a
+RequestFactory request, and render_report for the yearly PDF) against a synthetic dataset
+loaded into MemoryFirestore, so numbers depend only on this code and the machine.
+
+Per scenario and dataset size the result holds latency percentiles over the timed runs, the
+median time per phase and the tracemalloc peak of one extra traced run. Phases are measured
+exclusively (a chart drawn inside a PDF helper counts as "chart", not "pdf"):
+
+- fetch:       MemoryFirestore queries and document gets (scan/filter cost, no network latency)
+- deserialize: snapshot.to_dict() and the models' from_dict()
+- chart:       placing/rendering report charts
+- pdf:         ReportCanvas drawing and saving
+- template:    Django template rendering
+- aggregate:   everything else (filtering, currency conversion, totals)
+
+Run with: python manage.py benchmark_suite (see that command for options).
+"""
+import contextlib
+import io
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.test import RequestFactory, override_settings
+
+from .memory_firestore import DocumentReference, DocumentSnapshot, MemoryFirestore, Query, use_memory_firestore
+
+SIZES = (1_000, 10_000, 100_000)
+PHASES = ("fetch", "deserialize", "aggregate", "chart", "pdf", "template")
+BENCH_USER_ID = "1"
+RESULT_FORMAT = 1
+
+CONSUMPTION_TYPES = ["market", "transport", "food", "other"]
+COUNTRY_CODES = ["LB", "SA", "AE"]
+CURRENCIES = ["USD", "LBP", "SAR"]
+
+
+# --- phase timing ---
+
+class PhaseTimer:
+    """Exclusive wall time per phase; entering a nested phase pauses the enclosing one."""
+
+    def __init__(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self._stack = []
+
+    def _enter(self, name):
+        now = time.perf_counter()
+        if self._stack:
+            parent, started = self._stack[-1]
+            self.totals[parent] += now - started
+        self._stack.append((name, now))
+
+    def _exit(self):
+        now = time.perf_counter()
+        name, started = self._stack.pop()
+        self.totals[name] += now - started
+        if self._stack:
+            self._stack[-1] = (self._stack[-1][0], now)
+
+    def wrap(self, func, name):
+        def timed(*args, **kwargs):
+            self._enter(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit()
+        return timed
+
+    def reset(self):
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self._stack = []
+
+
+def _model_classes():
+    from budgeting.firestore_models import BudgetingFirestoreModel
+    from expenses.firestore_models import FirestoreModel
+
+    seen, todo = [], [FirestoreModel, BudgetingFirestoreModel]
+    while todo:
+        cls = todo.pop()
+        if cls not in seen:
+            seen.append(cls)
+            todo.extend(cls.__subclasses__())
+    return seen
+
+
+@contextlib.contextmanager
+def instrument(timer: PhaseTimer):
+    """Route the entry points of each phase through `timer` while the block runs."""
+    import budgeting.views
+    import expenses.reports
+    import expenses.views
+
+    patches = [
+        (Query, "stream", "fetch"),
+        (DocumentReference, "get", "fetch"),
+        (DocumentSnapshot, "to_dict", "deserialize"),
+        (expenses.reports, "render_charts", "chart"),
+        (expenses.reports.ReportCanvas, "place_chart", "chart"),
+        (expenses.views, "render", "template"),
+        (budgeting.views, "render", "template"),
+    ]
+    patches += [
+        (expenses.reports.ReportCanvas, name, "pdf")
+        for name in ("__init__", "title_block", "section_heading", "wide_chart", "breakdown_table", "chart_grid", "save")
+    ]
+    originals = []
+    for owner, attr, phase in patches:
+        original = owner.__dict__[attr] if isinstance(owner, type) else getattr(owner, attr)
+        originals.append((owner, attr, original))
+        setattr(owner, attr, timer.wrap(original, phase))
+    for cls in _model_classes():
+        original = cls.__dict__.get("from_dict")
+        if isinstance(original, classmethod):
+            originals.append((cls, "from_dict", original))
+            setattr(cls, "from_dict", classmethod(timer.wrap(original.__func__, "deserialize")))
+    try:
+        yield timer
+    finally:
+        for owner, attr, original in reversed(originals):
+            setattr(owner, attr, original)
+
+
+# --- synthetic data ---
+
+def build_dataset(client: MemoryFirestore, size: int, year: int, seed: int = 42):
+    """
+    `size` consumptions and `size` budgeting transactions for BENCH_USER_ID spread over `year`
+    and the year before, plus the default groups/categories and a budget per category and month.
+    """
+    from budgeting.firestore_models import BudgetFS, CategoryFS, GroupFS, TransactionFS
+    from budgeting.management.commands.seed_firestore_budgeting import DEFAULT_CATEGORIES, DEFAULT_GROUPS
+    from expenses.firestore_models import ConsumptionFS
+
+    rng = random.Random(seed)
+    uid = BENCH_USER_ID
+    groups = {f"g{idx}": GroupFS(pk=f"g{idx}", name=name, order=order) for idx, (name, order) in enumerate(DEFAULT_GROUPS)}
+    group_ids = {g.name: g.pk for g in groups.values()}
+    categories = {
+        f"c{idx}": CategoryFS(pk=f"c{idx}", name=name, group_id=group_ids[group], include_in_reports=include, order=order)
+        for idx, (name, group, include, order) in enumerate(DEFAULT_CATEGORIES)
+    }
+    client.load(GroupFS.collection_name, {pk: g.to_dict() for pk, g in groups.items()})
+    client.load(CategoryFS.collection_name, {pk: c.to_dict() for pk, c in categories.items()})
+
+    def random_day():
+        d = date(year - rng.randint(0, 1), rng.randint(1, 12), rng.randint(1, 28))
+        return d, datetime(d.year, d.month, d.day, rng.randint(0, 23), rng.randint(0, 59))
+
+    consumptions = {}
+    for idx in range(size):
+        day, stamp = random_day()
+        amount = Decimal(rng.randint(100, 50_000)) / 100
+        consumptions[f"cons{idx:07d}"] = ConsumptionFS(
+            date=day,
+            amount=amount,
+            currency=rng.choice(CURRENCIES),
+            amount_usd=amount,
+            consumption_type=rng.choice(CONSUMPTION_TYPES),
+            note=f"Synthetic expense {idx}",
+            country=rng.choice(COUNTRY_CODES),
+            created_at=stamp,
+            created_by=uid,
+            modified_at=stamp,
+            modified_by=uid,
+            record_status="active" if rng.random() > 0.02 else "deleted",
+        ).to_dict()
+    client.load(ConsumptionFS.collection_name, consumptions)
+
+    category_ids = list(categories)
+    transactions = {}
+    for idx in range(size):
+        day, stamp = random_day()
+        income = rng.random() < 0.1
+        transactions[f"txn{idx:07d}"] = TransactionFS(
+            user_id=uid,
+            date=day,
+            month=day.strftime("%Y-%m"),
+            description=f"Synthetic transaction {idx}",
+            category_id=None if income else rng.choice(category_ids),
+            amount=Decimal(rng.randint(100, 200_000)) / 100,
+            direction="income" if income else "expense",
+            external_id=f"bench-{idx}",
+            created_at=stamp,
+            updated_at=stamp,
+        ).to_dict()
+    client.load(TransactionFS.collection_name, transactions)
+
+    budgets = {}
+    for y in (year - 1, year):
+        for m in range(1, 13):
+            for cid in category_ids:
+                budgets[f"b{y}{m:02d}{cid}"] = BudgetFS(
+                    user_id=uid, category_id=cid, year=y, month=m, forecast=Decimal(rng.randint(50, 2_000))
+                ).to_dict()
+    client.load(BudgetFS.collection_name, budgets)
+    return client
+
+
+# --- scenarios ---
+
+def _bench_user():
+    from django.contrib.auth import get_user_model
+
+    return get_user_model()(pk=int(BENCH_USER_ID), username="bench", first_name="Benchmark")
+
+
+def _view_request(path, params):
+    request = RequestFactory().get(path, params)
+    request.user = _bench_user()
+    return request
+
+
+def expenses_dashboard(year, month):
+    from expenses import views
+
+    response = views.dashboard(_view_request("/", {"year": year, "month": month}))
+    assert response.status_code == 200, response.status_code
+
+
+def budgeting_dashboard(year, month):
+    from budgeting import views
+
+    response = views.dashboard(_view_request("/budgeting/", {"year": year, "month": month}))
+    assert response.status_code == 200, response.status_code
+
+
+def report_pdf(year, month):
+    from expenses.reports import ReportParams, render_report
+
+    params = ReportParams(user_id=BENCH_USER_ID, year=year, month=month, scope="year", extractor_name="Benchmark")
+    with tempfile.TemporaryFile() as out:
+        render_report(params, out)
+
+
+SCENARIOS = {
+    "expenses_dashboard": expenses_dashboard,
+    "budgeting_dashboard": budgeting_dashboard,
+    "report_pdf": report_pdf,
+}
+
+
+# --- running ---
+
+def percentile(sorted_values, pct):
+    """Linear interpolation between closest ranks; `sorted_values` must be sorted."""
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * pct / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+
+def run_scenario(fn, client, year, month, repeat=5, warmup=1):
+    timer = PhaseTimer()
+    latencies, phase_runs = [], []
+    with instrument(timer), contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(warmup):
+            fn(year, month)
+        reads_before = client.reads
+        for _ in range(repeat):
+            timer.reset()
+            started = time.perf_counter()
+            fn(year, month)
+            elapsed = time.perf_counter() - started
+            phases = dict(timer.totals)
+            phases["aggregate"] += max(0.0, elapsed - sum(phases.values()))
+            latencies.append(elapsed)
+            phase_runs.append(phases)
+        reads = (client.reads - reads_before) // max(1, repeat)
+
+        # Memory in its own run: tracing slows everything down and would skew the timings.
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        fn(year, month)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "runs": repeat,
+        "latency_ms": {
+            "min": _ms(latencies[0]),
+            "mean": _ms(sum(latencies) / len(latencies)),
+            "p50": _ms(percentile(latencies, 50)),
+            "p90": _ms(percentile(latencies, 90)),
+            "p95": _ms(percentile(latencies, 95)),
+            "p99": _ms(percentile(latencies, 99)),
+            "max": _ms(latencies[-1]),
+        },
+        "phases_ms": {
+            phase: _ms(percentile(sorted(run[phase] for run in phase_runs), 50)) for phase in PHASES
+        },
+        "peak_memory_mb": round(peak / (1024 * 1024), 2),
+        "firestore_queries": reads,
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_suite(sizes=SIZES, scenarios=tuple(SCENARIOS), repeat=5, warmup=1, year=2025, month=6, seed=42,
+              chart_backend=None, log=None):
+    """Run every scenario on every dataset size; returns the JSON-serialisable result."""
+    settings_overrides = {
+        # Hermetic: nothing shared with a running server or earlier benchmark runs.
+        "CACHES": {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+        "LOCAL_DATA_DIR": tempfile.mkdtemp(prefix="bench-"),
+    }
+    if chart_backend:
+        settings_overrides["REPORT_CHART_BACKEND"] = chart_backend
+    results = []
+    with override_settings(**settings_overrides):
+        from expenses.reports import chart_backend as current_backend
+
+        backend = current_backend()
+        for size in sizes:
+            client = build_dataset(MemoryFirestore(), size, year, seed)
+            with use_memory_firestore(client):
+                for name in scenarios:
+                    if log:
+                        log(f"{name} @ {size:,}")
+                    result = run_scenario(SCENARIOS[name], client, year, month, repeat, warmup)
+                    results.append({"scenario": name, "size": size, **result})
+    return {
+        "format": RESULT_FORMAT,
+        "meta": {
+            "generated_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "chart_backend": backend,
+            "year": year,
+            "month": month,
+            "seed": seed,
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline):
+    """Rows (scenario, size, baseline p50, current p50, change %) for entries present in both."""
+    before = {(r["scenario"], r["size"]): r for r in baseline.get("results", [])}
+    rows = []
+    for r in current["results"]:
+        old = before.get((r["scenario"], r["size"]))
+        if old is None:
+            continue
+        a, b = old["latency_ms"]["p50"], r["latency_ms"]["p50"]
+        rows.append((r["scenario"], r["size"], a, b, ((b - a) / a * 100) if a else None))
+    return rows
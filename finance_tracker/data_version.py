@@ -0,0 +1,112 @@
+"""
+Per-user data versions for HTTP conditional requests (ETag / Last-Modified).
+
+Every Firestore write for a user bumps that user's version; writes to shared
+reference data (groups, categories, global merchant links) bump the global
+version. Views wrapped with `conditional_user_page` derive their validators
+from these versions, so an unchanged page answers 304 before any Firestore
+query or chart rendering runs.
+"""
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SCOPE = "_global_"
+
+
+def _key(user_id):
+    return f"data_version:{user_id or GLOBAL_SCOPE}"
+
+
+def get_data_version(user_id=None):
+    """Return the current version (a UNIX timestamp) for a user, or the global one. None if the cache is unavailable."""
+    key = _key(user_id)
+    try:
+        version = cache.get(key)
+        if version is None:
+            version = time.time()
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+        return version
+    except Exception:
+        logger.exception("Could not read data version %s", key)
+        return None
+
+
+def bump_data_version(user_id=None):
+    """Mark a user's data (or the global reference data when user_id is falsy) as changed."""
+    key = _key(user_id)
+    try:
+        cache.set(key, time.time(), timeout=None)
+    except Exception:
+        logger.exception("Could not bump data version %s", key)
+
+
+def _versions(request):
+    if not request.user.is_authenticated:
+        return None
+    user_version = get_data_version(str(request.user.pk))
+    global_version = get_data_version()
+    if user_version is None or global_version is None:
+        return None
+    return user_version, global_version
+
+
+def _has_pending_messages(request):
+    # Pending flash messages (cookie, session or any other storage) must be rendered, so never
+    # short-circuit with a 304. len() loads them without marking them as shown.
+    return len(get_messages(request)) > 0
+
+
+def user_data_etag(request, *args, **kwargs):
+    """ETag = hash(user, session, CSRF secret, data versions, today, path, query parameters)."""
+    if _has_pending_messages(request):
+        return None
+    versions = _versions(request)
+    if versions is None:
+        return None
+    query = urlencode(sorted((k, v) for k, values in request.GET.lists() for v in values))
+    session = getattr(request, "session", None)
+    parts = [
+        str(request.user.pk),
+        # A new login or a rotated CSRF token must not revive a page holding the old token.
+        getattr(session, "session_key", None) or "",
+        request.META.get("CSRF_COOKIE", ""),
+        repr(versions[0]),
+        repr(versions[1]),
+        # Pages default to the current month, so the same URL changes meaning at midnight.
+        datetime.now(timezone.utc).date().isoformat(),
+        request.path,
+        query,
+    ]
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def user_data_last_modified(request, *args, **kwargs):
+    """Last-Modified = latest of the user's version, the global version and midnight UTC today."""
+    if _has_pending_messages(request):
+        return None
+    versions = _versions(request)
+    if versions is None:
+        return None
+    midnight = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    changed = datetime.fromtimestamp(max(versions), tz=timezone.utc)
+    return max(changed, midnight)
+
+
+def conditional_user_page(view_func):
+    """
+    Answer GET/HEAD with 304 Not Modified when the user's data has not changed.
+    Apply inside @login_required. Responses are private and always revalidated.
+    """
+    conditional = condition(etag_func=user_data_etag, last_modified_func=user_data_last_modified)(view_func)
+    return cache_control(private=True, no_cache=True)(conditional)
@@ -0,0 +1,92 @@
+"""
+Tabular exports (CSV / XLSX) that never hold the full dataset in memory.
+
+Views pass a header and a lazy row iterator, typically built over a model's iter_pages() so that
+Firestore is read one page per RPC while the response is being sent.
+- CSV is produced row by row into a StreamingHttpResponse; the first bytes go out with the
+  first page.
+- XLSX is a zip container, so it cannot be emitted before the last row is known. xlsxwriter's
+  constant_memory mode flushes each row to disk as it is written; the finished workbook is
+  then streamed from a temporary file in chunks (FileResponse) and removed when closed.
+
+Text is never exported as a formula: CSV cells starting with a formula character are prefixed
+with an apostrophe and XLSX strings are always written as strings.
+"""
+import csv
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Sequence
+
+from django.http import FileResponse, StreamingHttpResponse
+
+FORMATS = ("csv", "xlsx")
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class _Echo:
+    """File-like object whose write() returns the value, so csv.writer yields encoded rows."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_response(filename: str, header: Sequence[str], rows: Iterable[Sequence]) -> StreamingHttpResponse:
+    writer = csv.writer(_Echo())
+
+    def generate():
+        yield "\ufeff"  # BOM so Excel opens UTF-8 notes correctly
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow([_cell(v) for v in row])
+
+    response = StreamingHttpResponse(generate(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(filename: str, header: Sequence[str], rows: Iterable[Sequence], sheet: str = "Export") -> FileResponse:
+    import xlsxwriter  # optional; only needed for XLSX exports
+
+    tmp = tempfile.TemporaryFile(suffix=".xlsx")
+    workbook = xlsxwriter.Workbook(tmp, {"constant_memory": True, "in_memory": False, "strings_to_formulas": False})
+    ws = workbook.add_worksheet(sheet[:31])
+    bold = workbook.add_format({"bold": True})
+    date_fmt = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    money_fmt = workbook.add_format({"num_format": "#,##0.00"})
+    ws.write_row(0, 0, header, bold)
+    r = 0
+    for r, row in enumerate(rows, start=1):
+        for c, value in enumerate(row):
+            if isinstance(value, (date, datetime)):
+                ws.write_datetime(r, c, datetime(value.year, value.month, value.day), date_fmt)
+            elif isinstance(value, Decimal):
+                ws.write_number(r, c, float(value), money_fmt)
+            elif value is None:
+                continue
+            elif isinstance(value, str):
+                ws.write_string(r, c, value)
+            else:
+                ws.write(r, c, value)
+    if r:
+        ws.autofilter(0, 0, r, len(header) - 1)
+    workbook.close()
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename=f"{filename}.xlsx", content_type=XLSX_CONTENT_TYPE)
+
+
+def export_response(fmt: str, filename: str, header: Sequence[str], rows: Iterable[Sequence], sheet: str = "Export"):
+    if fmt == "xlsx":
+        return xlsx_response(filename, header, rows, sheet=sheet)
+    return csv_response(filename, header, rows)
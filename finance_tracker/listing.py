@@ -0,0 +1,120 @@
+"""
+Server-side filtering and sorting for list pages (expenses monthly_list, budgeting transaction_list).
+
+A ListQuery splits request filters in two:
+- pushdown(): equality predicates sent to Firestore as where() clauses. Equality-only queries are
+  served by single-field indexes, so no composite index has to be maintained.
+- apply(): the residual predicates (amount range, text substring, anything range-based passed in
+  by the view) evaluated in a single pass over the fetched rows, followed by one sort.
+  With check_equals=True the equality filters are checked there too, for rows fetched by a
+  query that could not take them (e.g. a date range, whose composite index covers no more).
+"""
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+
+def _to_float(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ListQuery:
+    """
+    equality: param name -> (model field, allowed values or None for free text).
+    sort_options: param value -> (attribute, reverse, value used for None[, label]).
+    """
+
+    def __init__(
+        self,
+        equals: Dict[str, Tuple[str, str]],
+        min_amount: Optional[float],
+        max_amount: Optional[float],
+        text: str,
+        sort: str,
+        sort_options: Dict[str, tuple],
+        amount_attr: str,
+        text_attr: str,
+    ):
+        self.equals = equals
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.text = text
+        self.sort = sort
+        self.sort_options = sort_options
+        self.amount_attr = amount_attr
+        self.text_attr = text_attr
+
+    @classmethod
+    def from_params(cls, params, equality, sort_options, default_sort, amount_attr="amount", text_attr="description"):
+        equals = {}
+        for param, (field_name, allowed) in equality.items():
+            value = (params.get(param) or "").strip()
+            if not value or (allowed is not None and value not in allowed):
+                continue
+            equals[param] = (field_name, value)
+        sort = params.get("sort") or default_sort
+        if sort not in sort_options:
+            sort = default_sort
+        return cls(
+            equals=equals,
+            min_amount=_to_float(params.get("min")),
+            max_amount=_to_float(params.get("max")),
+            text=(params.get("q") or "").strip(),
+            sort=sort,
+            sort_options=sort_options,
+            amount_attr=amount_attr,
+            text_attr=text_attr,
+        )
+
+    def value(self, param, default=""):
+        return self.equals.get(param, (None, default))[1]
+
+    def pushdown(self) -> List[tuple]:
+        return [(field_name, "==", value) for field_name, value in self.equals.values()]
+
+    def _predicates(self, extra: Optional[Callable] = None, check_equals: bool = False) -> List[Callable]:
+        preds = []
+        if extra is not None:
+            preds.append(extra)
+        if check_equals and self.equals:
+            equals = list(self.equals.values())
+            preds.append(lambda i: all(getattr(i, field_name, None) == value for field_name, value in equals))
+        amount_attr = self.amount_attr
+        if self.min_amount is not None:
+            lo = self.min_amount
+            preds.append(lambda i: float(getattr(i, amount_attr) or 0) >= lo)
+        if self.max_amount is not None:
+            hi = self.max_amount
+            preds.append(lambda i: float(getattr(i, amount_attr) or 0) <= hi)
+        if self.text:
+            needle, text_attr = self.text.lower(), self.text_attr
+            preds.append(lambda i: needle in (getattr(i, text_attr) or "").lower())
+        return preds
+
+    def iter_matching(self, items: Iterable, extra: Optional[Callable] = None, check_equals: bool = False):
+        """Lazily yield the items passing the residual predicates (plus `extra`); no sort."""
+        preds = self._predicates(extra, check_equals)
+        for i in items:
+            if all(p(i) for p in preds):
+                yield i
+
+    def apply(self, items: Iterable, extra: Optional[Callable] = None, check_equals: bool = False) -> list:
+        """Filter with the residual predicates (plus `extra`) in one pass, then sort."""
+        out = list(self.iter_matching(items, extra, check_equals))
+        attr, reverse, missing = self.sort_options[self.sort][:3]
+        out.sort(key=lambda i: (lambda v: missing if v is None else v)(getattr(i, attr, None)), reverse=reverse)
+        return out
+
+    def querystring(self) -> str:
+        """Active filter/sort parameters, for pagination and export links."""
+        params = [(param, value) for param, (_, value) in self.equals.items()]
+        if self.min_amount is not None:
+            params.append(("min", self.min_amount))
+        if self.max_amount is not None:
+            params.append(("max", self.max_amount))
+        if self.text:
+            params.append(("q", self.text))
+        params.append(("sort", self.sort))
+        return urlencode(params)
@@ -0,0 +1,348 @@
+"""
+In-memory stand-in for the Firestore client, for benchmarks and offline experiments.
+
+Covers the subset of google.cloud.firestore the models use: collection/document references,
+where (==, !=, <, <=, >, >=, in, not-in, array-contains, array-contains-any, also on
+"__name__"), order_by, select, limit, start_after, stream/get, set/update/delete, write
+batches and transactions (driven by firestore.transactional; writes are applied on commit and
+never conflict, since nothing else runs concurrently). Documents are kept as plain dicts and copied on every read, like a real client
+decoding a response. Queries have no index requirements: anything Firestore would reject for
+a missing composite index still runs here.
+
+    client = MemoryFirestore()
+    with use_memory_firestore(client):
+        ...  # every get_firestore_client() in the project returns `client`
+"""
+import copy
+import heapq
+import sys
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+NAME_FIELD = "__name__"
+
+
+def _get_field(doc_id, data, path):
+    if path == NAME_FIELD:
+        return doc_id
+    value = data
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _copy_data(data):
+    """Fresh dict per read; only nested containers need a deep copy, scalars are immutable."""
+    return {k: copy.deepcopy(v) if isinstance(v, (dict, list)) else v for k, v in data.items()}
+
+
+def _plain(value):
+    """Document references compare by id (used with "__name__" filters)."""
+    return getattr(value, "id", value)
+
+
+def _match(op, actual, expected):
+    expected = _plain(expected)
+    if op == "==":
+        return actual == expected
+    if op == "!=":
+        return actual is not None and actual != expected
+    if op == "in":
+        return actual in expected
+    if op == "not-in":
+        return actual is not None and actual not in expected
+    if op == "array-contains":
+        return isinstance(actual, list) and expected in actual
+    if op == "array-contains-any":
+        return isinstance(actual, list) and any(v in actual for v in expected)
+    if actual is None:
+        return False
+    try:
+        if op == "<":
+            return actual < expected
+        if op == "<=":
+            return actual <= expected
+        if op == ">":
+            return actual > expected
+        if op == ">=":
+            return actual >= expected
+    except TypeError:
+        return False  # Firestore never matches across value types
+    raise ValueError(f"Unsupported operator {op!r}")
+
+
+class DocumentSnapshot:
+    def __init__(self, reference, data: Optional[Dict[str, Any]]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return _copy_data(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return _get_field(self.id, self._data or {}, field_path)
+
+
+class DocumentReference:
+    def __init__(self, client, collection_name: str, doc_id: str):
+        self._client = client
+        self._collection = collection_name
+        self.id = doc_id
+
+    @property
+    def path(self):
+        return f"{self._collection}/{self.id}"
+
+    def _docs(self):
+        return self._client._store.setdefault(self._collection, {})
+
+    def get(self, field_paths=None, transaction=None):
+        self._client.reads += 1
+        data = self._docs().get(self.id)
+        if data is not None and field_paths:
+            data = {f: data[f] for f in field_paths if f in data}
+        return DocumentSnapshot(self, data)
+
+    def set(self, document_data, merge=False):
+        docs = self._docs()
+        data = _copy_data(dict(document_data))
+        if merge and self.id in docs:
+            docs[self.id].update(data)
+        else:
+            docs[self.id] = data
+        self._client.writes += 1
+
+    def update(self, field_updates):
+        docs = self._docs()
+        if self.id not in docs:
+            raise KeyError(f"No document to update: {self.path}")
+        docs[self.id].update(_copy_data(dict(field_updates)))
+        self._client.writes += 1
+
+    def delete(self):
+        self._docs().pop(self.id, None)
+        self._client.writes += 1
+
+    def collection(self, name):
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+
+class Query:
+    def __init__(self, client, collection_name, filters=(), orders=(), limit=None, cursor=None, fields=None):
+        self._client = client
+        self._collection = collection_name
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes):
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "cursor": self._cursor,
+            "fields": self._fields,
+        }
+        state.update(changes)
+        return Query(self._client, self._collection, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:  # FieldFilter(field_path, op_string, value)
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(orders=self._orders + ((field_path, direction == "DESCENDING"),))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def start_after(self, document_fields_or_snapshot):
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def _ordered(self, rows):
+        # Firestore orders by the requested fields, then by document id, and leaves out
+        # documents that lack an order_by field.
+        rows.sort(key=lambda r: r[0])
+        for field_path, descending in reversed(self._orders):
+            if field_path != NAME_FIELD:
+                rows = [r for r in rows if _get_field(r[0], r[1], field_path) is not None]
+            rows.sort(key=lambda r: _get_field(r[0], r[1], field_path), reverse=descending)
+        return rows
+
+    def _after_cursor(self, rows):
+        if self._cursor is None:
+            return rows
+        if isinstance(self._cursor, DocumentSnapshot):
+            cursor_id = self._cursor.id
+        elif isinstance(self._cursor, dict):
+            cursor_id = self._cursor.get(NAME_FIELD)
+        else:
+            cursor_id = _plain(self._cursor)
+        if cursor_id is not None:
+            for idx, (doc_id, _) in enumerate(rows):
+                if doc_id == cursor_id:
+                    return rows[idx + 1:]
+        return rows
+
+    def stream(self, transaction=None):
+        self._client.reads += 1
+        docs = self._client._store.get(self._collection, {})
+        rows = [
+            (doc_id, data) for doc_id, data in docs.items()
+            if all(_match(op, _get_field(doc_id, data, f), v) for f, op, v in self._filters)
+        ]
+        if self._limit is not None and not self._orders and self._cursor is None:
+            rows = heapq.nsmallest(self._limit, rows, key=lambda r: r[0])  # first page by id, no full sort
+        else:
+            rows = self._after_cursor(self._ordered(rows))
+            if self._limit is not None:
+                rows = rows[:self._limit]
+        out = []
+        for doc_id, data in rows:
+            if self._fields is not None:
+                data = {f: data[f] for f in self._fields if f in data}
+            out.append(DocumentSnapshot(DocumentReference(self._client, self._collection, doc_id), data))
+        return iter(out)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class CollectionReference(Query):
+    def __init__(self, client, collection_name):
+        super().__init__(client, collection_name)
+        self.id = collection_name.rsplit("/", 1)[-1]
+
+    def document(self, document_id=None):
+        return DocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:20])
+
+    def add(self, document_data, document_id=None):
+        ref = self.document(document_id)
+        ref.set(document_data)
+        return None, ref
+
+    def list_documents(self):
+        return [self.document(doc_id) for doc_id in list(self._client._store.get(self._collection, {}))]
+
+
+class WriteBatch:
+    def __init__(self, client):
+        self._client = client
+        self._ops = []
+
+    def set(self, reference, document_data, merge=False):
+        self._ops.append(lambda: reference.set(document_data, merge=merge))
+
+    def update(self, reference, field_updates):
+        self._ops.append(lambda: reference.update(field_updates))
+
+    def delete(self, reference):
+        self._ops.append(reference.delete)
+
+    def commit(self):
+        for op in self._ops:
+            op()
+        self._ops = []
+
+
+class Transaction(WriteBatch):
+    """The private surface firestore.transactional drives: _begin, _commit, _rollback, _clean_up."""
+
+    _max_attempts = 5
+    _read_only = False
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._id = None
+
+    @property
+    def in_progress(self):
+        return self._id is not None
+
+    def _begin(self, retry_id=None):
+        if self.in_progress:
+            raise ValueError("Transaction already in progress")
+        self._id = uuid.uuid4().bytes
+
+    def _clean_up(self):
+        self._ops = []
+        self._id = None
+
+    def _commit(self):
+        if not self.in_progress:
+            raise ValueError("No transaction in progress")
+        self.commit()
+        self._clean_up()
+        return []
+
+    def _rollback(self):
+        self._clean_up()
+
+
+class MemoryFirestore:
+    """Client with the google.cloud.firestore.Client surface used by the models."""
+
+    def __init__(self):
+        self._store: Dict[str, Dict[str, dict]] = {}
+        self.reads = 0  # queries and document gets
+        self.writes = 0
+
+    def collection(self, name):
+        return CollectionReference(self, name)
+
+    def document(self, path):
+        collection_name, doc_id = path.rsplit("/", 1)
+        return DocumentReference(self, collection_name, doc_id)
+
+    def batch(self):
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return Transaction(self)
+
+    def load(self, collection_name, documents):
+        """Bulk insert {doc_id: data} without counting writes (for seeding fixtures)."""
+        self._store.setdefault(collection_name, {}).update(documents)
+
+    def count(self, collection_name):
+        return len(self._store.get(collection_name, {}))
+
+
+@contextmanager
+def use_memory_firestore(client: MemoryFirestore):
+    """Make every imported get_firestore_client() in the project return `client`."""
+    import firebase_client
+
+    original = firebase_client.get_firestore_client
+
+    def get_client():
+        return client
+
+    patched = []
+    for module in list(sys.modules.values()):
+        if module is not None and getattr(module, "get_firestore_client", None) is original:
+            patched.append(module)
+            module.get_firestore_client = get_client
+    try:
+        yield client
+    finally:
+        # Modules first imported inside the block picked up get_client from firebase_client.
+        for module in list(sys.modules.values()):
+            if module is not None and getattr(module, "get_firestore_client", None) is get_client:
+                patched.append(module)
+        for module in patched:
+            module.get_firestore_client = original
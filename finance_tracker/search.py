@@ -0,0 +1,347 @@
+"""
+Per-user inverted index over consumption notes (expenses app) and transaction descriptions (budgeting).
+
+The index lives in LOCAL_DATA_DIR/search/<user>.json. It is built from Firestore on the first search
+and then kept current by the model save/delete hooks (index_consumption / index_transaction /
+remove_document). Writes that bypass the models call invalidate() so the next search rebuilds.
+Bulk flows that save many rows wrap them in `with batch():`, so the hooks' changes are applied
+with one read and one write of each user's index instead of one per row.
+
+Queries: every term must match (AND); a term matches indexed tokens that start with it (prefix),
+exact matches weighing more. Results are ranked by tf-idf, then by date (newest first), and can be
+filtered by kind, amount range and date range.
+"""
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process dev server, in-process lock is enough
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT = 1
+KIND_CONSUMPTION = "c"
+KIND_TRANSACTION = "t"
+PREFIX_WEIGHT = 0.5
+MAX_TEXT = 1000
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip accents, split on non-word characters; drop 1-letter tokens (keep digits)."""
+    if not text:
+        return []
+    norm = unicodedata.normalize("NFKD", text.lower())
+    norm = "".join(ch for ch in norm if not unicodedata.combining(ch))
+    return [t for t in _TOKEN_RE.findall(norm) if len(t) > 1 or t.isdigit()]
+
+
+class UserSearchIndex:
+    """docs: key -> [kind, doc_id, date_iso, amount, currency, text]; postings: token -> {key: tf}."""
+
+    def __init__(self, docs=None, postings=None):
+        self.docs: Dict[str, list] = docs or {}
+        self.postings: Dict[str, Dict[str, int]] = postings or {}
+        self._vocab: Optional[List[str]] = None
+
+    # --- maintenance ---
+
+    def upsert(self, kind, doc_id, text, day: Optional[date], amount, currency=""):
+        key = f"{kind}:{doc_id}"
+        self.remove(key)
+        text = (text or "")[:MAX_TEXT]
+        tokens = tokenize(text)
+        self.docs[key] = [kind, doc_id, day.isoformat() if day else None, float(amount or 0), currency or "", text]
+        counts: Dict[str, int] = {}
+        for t in tokens:
+            counts[t] = counts.get(t, 0) + 1
+        for t, tf in counts.items():
+            bucket = self.postings.get(t)
+            if bucket is None:
+                bucket = self.postings[t] = {}
+                self._vocab = None
+            bucket[key] = tf
+
+    def remove(self, key):
+        doc = self.docs.pop(key, None)
+        if doc is None:
+            return
+        for t in set(tokenize(doc[5])):
+            bucket = self.postings.get(t)
+            if bucket is None:
+                continue
+            bucket.pop(key, None)
+            if not bucket:
+                del self.postings[t]
+                self._vocab = None
+
+    # --- querying ---
+
+    def _expand(self, term):
+        """Indexed tokens starting with `term` (sorted vocabulary + bisect)."""
+        if self._vocab is None:
+            self._vocab = sorted(self.postings)
+        i = bisect_left(self._vocab, term)
+        out = []
+        while i < len(self._vocab) and self._vocab[i].startswith(term):
+            out.append(self._vocab[i])
+            i += 1
+        return out
+
+    def search(self, query, kind=None, min_amount=None, max_amount=None, date_from=None, date_to=None, limit=50):
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        n_docs = max(len(self.docs), 1)
+        scores: Optional[Dict[str, float]] = None
+        for term in terms:
+            term_scores: Dict[str, float] = {}
+            for token in self._expand(term):
+                bucket = self.postings[token]
+                idf = math.log(1 + n_docs / len(bucket))
+                weight = idf * (1.0 if token == term else PREFIX_WEIGHT)
+                for key, tf in bucket.items():
+                    s = weight * (1 + math.log(tf))
+                    if s > term_scores.get(key, 0.0):
+                        term_scores[key] = s
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {k: v + term_scores[k] for k, v in scores.items() if k in term_scores}
+            if not scores:
+                return []
+        d_from = date_from.isoformat() if date_from else None
+        d_to = date_to.isoformat() if date_to else None
+        hits = []
+        for key, score in scores.items():
+            doc = self.docs.get(key)
+            if doc is None:
+                continue
+            d_kind, doc_id, d_iso, amount, currency, text = doc
+            if kind and d_kind != kind:
+                continue
+            if min_amount is not None and amount < min_amount:
+                continue
+            if max_amount is not None and amount > max_amount:
+                continue
+            if d_from and (not d_iso or d_iso < d_from):
+                continue
+            if d_to and (not d_iso or d_iso > d_to):
+                continue
+            hits.append({
+                "kind": d_kind,
+                "id": doc_id,
+                "date": date.fromisoformat(d_iso) if d_iso else None,
+                "amount": amount,
+                "currency": currency,
+                "text": text,
+                "score": round(score, 4),
+            })
+        hits.sort(key=lambda h: (-h["score"], -(h["date"].toordinal() if h["date"] else 0)))
+        return hits[:limit]
+
+    # --- persistence ---
+
+    def to_json(self):
+        return {"format": INDEX_FORMAT, "docs": self.docs, "postings": self.postings}
+
+    @classmethod
+    def from_json(cls, payload):
+        if not payload or payload.get("format") != INDEX_FORMAT:
+            return None
+        return cls(payload.get("docs") or {}, payload.get("postings") or {})
+
+
+# --- storage ---
+
+# Lock order: a user's _FileLock first, then _lock (which only guards the in-memory state).
+_lock = threading.Lock()
+_loaded: Dict[str, tuple] = {}  # user_id -> (mtime, UserSearchIndex)
+_path_locks: Dict[str, threading.Lock] = {}
+_batches = threading.local()  # .pending: user_id -> [mutate, ...] inside batch() on this thread
+
+
+def _index_path(user_id):
+    name = hashlib.sha1(str(user_id).encode("utf-8")).hexdigest()
+    return os.path.join(settings.LOCAL_DATA_DIR, "search", f"{name}.json")
+
+
+class _FileLock:
+    """Exclusive lock on one user's index, across threads and (with fcntl) processes."""
+
+    def __init__(self, path):
+        self.path = path + ".lock"
+        self.fh = None
+        with _lock:
+            self.thread_lock = _path_locks.setdefault(self.path, threading.Lock())
+
+    def __enter__(self):
+        self.thread_lock.acquire()
+        if fcntl is not None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.fh = open(self.path, "a")
+            fcntl.flock(self.fh, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if self.fh is not None:
+            fcntl.flock(self.fh, fcntl.LOCK_UN)
+            self.fh.close()
+        self.thread_lock.release()
+
+
+def _load(user_id) -> Optional[UserSearchIndex]:
+    path = _index_path(user_id)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        _loaded.pop(str(user_id), None)
+        return None
+    cached = _loaded.get(str(user_id))
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, encoding="utf-8") as f:
+            index = UserSearchIndex.from_json(json.load(f))
+    except (OSError, ValueError):
+        index = None
+    if index is not None:
+        _loaded[str(user_id)] = (mtime, index)
+    return index
+
+
+def _store(user_id, index: UserSearchIndex):
+    path = _index_path(user_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index.to_json(), f, separators=(",", ":"))
+    os.replace(tmp, path)
+    _loaded[str(user_id)] = (os.stat(path).st_mtime_ns, index)
+
+
+def _update(user_id, mutate):
+    """Apply `mutate(index)` to an existing index. Users without an index get a full build on first search."""
+    if not user_id:
+        return
+    pending = getattr(_batches, "pending", None)
+    if pending is not None:
+        pending.setdefault(str(user_id), []).append(mutate)
+        return
+    _apply(user_id, [mutate])
+
+
+def _apply(user_id, mutations):
+    try:
+        with _FileLock(_index_path(user_id)), _lock:
+            index = _load(user_id)
+            if index is None:
+                return
+            for mutate in mutations:
+                mutate(index)
+            _store(user_id, index)
+    except Exception:
+        logger.exception("Search index update failed for user %s", user_id)
+
+
+@contextmanager
+def batch():
+    """
+    Defer the hooks' index changes made on this thread until the block ends, then apply them
+    with one load and one store per user (also when the block raises: the rows saved so far
+    are indexed). Nested blocks are applied by the outermost one.
+    """
+    if getattr(_batches, "pending", None) is not None:
+        yield
+        return
+    _batches.pending = {}
+    try:
+        yield
+    finally:
+        pending, _batches.pending = _batches.pending, None
+        for user_id, mutations in pending.items():
+            _apply(user_id, mutations)
+
+
+def build_index(user_id) -> UserSearchIndex:
+    """Full build from Firestore: the user's active consumptions and all their transactions."""
+    from expenses.firestore_models import ConsumptionFS
+    from budgeting.firestore_models import TransactionFS
+
+    index = UserSearchIndex()
+    for c in ConsumptionFS.query_by_field("created_by", "==", str(user_id)):
+        if (c.record_status or "active") == "active":
+            index.upsert(KIND_CONSUMPTION, c.pk, c.note, c.date, c.amount_usd, "USD")
+    for t in TransactionFS.query_by_field("user_id", "==", str(user_id), limit=100000):
+        index.upsert(KIND_TRANSACTION, t.pk, t.description, t.date, t.amount, "")
+    return index
+
+
+def get_index(user_id) -> UserSearchIndex:
+    index = _load(user_id)
+    if index is not None:
+        return index
+    # Build and store under the user's lock: a hook or invalidate() for a write the build did
+    # not see waits for the stored index instead of being overwritten by it.
+    with _FileLock(_index_path(user_id)):
+        with _lock:
+            index = _load(user_id)  # built meanwhile by another thread or process
+        if index is None:
+            index = build_index(user_id)
+            with _lock:
+                _store(user_id, index)
+    return index
+
+
+def search(user_id, query, **filters):
+    index = get_index(user_id)
+    # Hooks mutate cached indexes in place; don't iterate one mid-update.
+    with _lock:
+        return index.search(query, **filters)
+
+
+def invalidate(user_id):
+    """Drop a user's index (e.g. after bulk writes); the next search rebuilds it."""
+    if not user_id:
+        return
+    pending = getattr(_batches, "pending", None)
+    if pending is not None:
+        pending.pop(str(user_id), None)  # the rebuild sees those writes
+    with _FileLock(_index_path(user_id)), _lock:
+        _loaded.pop(str(user_id), None)
+        try:
+            os.remove(_index_path(user_id))
+        except OSError:
+            pass
+
+
+# --- model hooks ---
+
+def index_consumption(c):
+    if (c.record_status or "active") != "active":
+        remove_document(c.created_by, KIND_CONSUMPTION, c.pk)
+        return
+    _update(c.created_by, lambda ix: ix.upsert(KIND_CONSUMPTION, c.pk, c.note, c.date, c.amount_usd, "USD"))
+
+
+def index_transaction(t):
+    _update(t.user_id, lambda ix: ix.upsert(KIND_TRANSACTION, t.pk, t.description, t.date, t.amount, ""))
+
+
+def remove_document(user_id, kind, doc_id):
+    _update(user_id, lambda ix: ix.remove(f"{kind}:{doc_id}"))
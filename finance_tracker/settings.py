@@ -46,6 +46,44 @@ EXCHANGE_RATES = {
     "LBP": 0.01,  # 1 LBP ≈ 0.01 USD
     "SAR": 0.2667,  # 1 SAR ≈ 0.2667 USD
 }
+# Optional dated rates (CSV `currency,date,rate` or JSON); see expenses/exchange_rates.py.
+# Falls back to EXCHANGE_RATES before a currency's first dated entry.
+EXCHANGE_RATES_FEED = os.environ.get("EXCHANGE_RATES_FEED", "")
+
+# Local runtime data (cache files and other generated artifacts); not committed.
+LOCAL_DATA_DIR = Path(os.environ.get("LOCAL_DATA_DIR", BASE_DIR / "var"))
+
+# CSV uploads kept between an import preview and the import; abandoned ones are deleted after
+# IMPORT_UPLOAD_TTL seconds.
+IMPORT_UPLOAD_TTL = int(os.environ.get("IMPORT_UPLOAD_TTL", "86400"))
+
+# PDF reports are rendered inline in the request by default. With REPORT_JOBS_ENABLED=1 they are
+# queued instead and rendered by `manage.py report_worker`, which must then be running next to the
+# web process (same LOCAL_DATA_DIR and database), e.g. as its own service or supervisor program;
+# without a worker, queued reports never leave the status page. `report_worker --once` from cron
+# also works for low traffic. Finished files are kept for REPORT_JOB_TTL seconds; jobs running for
+# longer than REPORT_JOB_TIMEOUT seconds are assumed to belong to a dead worker and are retried.
+REPORT_JOBS_ENABLED = os.environ.get("REPORT_JOBS_ENABLED", "0") == "1"
+REPORT_JOB_TTL = int(os.environ.get("REPORT_JOB_TTL", "3600"))
+REPORT_JOB_TIMEOUT = int(os.environ.get("REPORT_JOB_TIMEOUT", "600"))
+
+# "vector" draws report charts with reportlab.graphics; "raster" embeds matplotlib PNGs.
+REPORT_CHART_BACKEND = os.environ.get("REPORT_CHART_BACKEND", "vector")
+# Rendered raster report charts, keyed by a hash of their data (expenses/chart_cache.py); unused
+# by the vector backend.
+CHART_CACHE_MEMORY_BYTES = int(os.environ.get("CHART_CACHE_MEMORY_BYTES", 32 * 1024 * 1024))
+CHART_CACHE_DISK_BYTES = int(os.environ.get("CHART_CACHE_DISK_BYTES", 256 * 1024 * 1024))
+# Processes used to render a report's charts in parallel; unset = min(4, CPUs), 0 or 1 = inline.
+CHART_RENDER_PROCESSES = int(os.environ["CHART_RENDER_PROCESSES"]) if os.environ.get("CHART_RENDER_PROCESSES") else None
+
+# File-based so data versions (ETag validators) are shared by all worker processes on a host.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.environ.get("DJANGO_CACHE_DIR", str(LOCAL_DATA_DIR / "cache")),
+        "OPTIONS": {"MAX_ENTRIES": 20000},
+    }
+}
 
 # Optional: self-ping URL to keep server warm
 SELF_PING_URL = os.environ.get("SELF_PING_URL", "http://127.0.0.1:8000/healthz/")
@@ -0,0 +1,33 @@
+"""
+Test helpers shared by the apps' tests.py: a local-memory cache setting, a fresh
+MemoryFirestore per test and a throwaway LOCAL_DATA_DIR.
+"""
+import shutil
+import tempfile
+
+from .memory_firestore import MemoryFirestore, use_memory_firestore
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class MemoryFirestoreMixin:
+    """Every get_firestore_client() returns a fresh MemoryFirestore (self.db) for the test."""
+
+    def setUp(self):
+        super().setUp()
+        self.db = MemoryFirestore()
+        patch = use_memory_firestore(self.db)
+        patch.__enter__()
+        self.addCleanup(patch.__exit__, None, None, None)
+
+
+class LocalDataDirMixin:
+    """LOCAL_DATA_DIR points at a temporary directory removed after the test."""
+
+    def setUp(self):
+        super().setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path, ignore_errors=True)
+        override = self.settings(LOCAL_DATA_DIR=path)
+        override.enable()
+        self.addCleanup(override.disable)